@@ -0,0 +1,119 @@
+"""Peak memory of a public message to every user: one APScheduler job each vs the streaming engine.
+
+The previous implementation loaded every user with `auth.service.read_users`
+and added one `DateTrigger` job per user. This benchmark fills a temporary
+SQLite database with --users users, then in a fresh process either schedules
+those jobs or sends the broadcast with `public_message.broadcast.BroadcastEngine`
+to a bot answering instantly, and reports the peak resident memory.
+
+Usage:
+    python benchmarks/broadcast.py [--users 20000]
+"""
+import argparse
+import json
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+
+def peak_rss_mb() -> float:
+    """Return the peak resident set size of this process in MB (Linux)."""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class NullBot:
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, user_id, message):
+        self.sent += 1
+
+
+def fill_database(path: str, users: int) -> None:
+    from sqlalchemy import create_engine, insert  # noqa: E402
+
+    from app.auth.models import User  # noqa: E402
+    from app.models import Base  # noqa: E402
+    from app.public_message.models import Broadcast  # noqa: E402
+
+    engine = create_engine(f"sqlite:///{path}")
+    Base.metadata.create_all(engine)
+    with engine.begin() as connection:
+        connection.execute(insert(User), [{"id": user_id, "lang": "en"} for user_id in range(1, users + 1)])
+        connection.execute(
+            insert(Broadcast), [{"media_type": "text", "content": "Hello", "scheduled_at": datetime.now()}]
+        )
+    engine.dispose()
+
+
+def measure(strategy: str, path: str) -> dict:
+    """Send or schedule the broadcast stored in `path` with `strategy` and measure this process."""
+    from apscheduler.schedulers.background import BackgroundScheduler  # noqa: E402
+    from apscheduler.triggers.date import DateTrigger  # noqa: E402
+    from sqlalchemy import create_engine  # noqa: E402
+    from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+    from app.auth.service import read_users  # noqa: E402
+    from app.public_message.broadcast import BroadcastEngine  # noqa: E402
+
+    session_factory = sessionmaker(bind=create_engine(f"sqlite:///{path}"))
+    bot = NullBot()
+    baseline = peak_rss_mb()
+    started = time.perf_counter()
+    if strategy == "jobs":
+        scheduler = BackgroundScheduler()
+        scheduler.start()
+        run_date = datetime.now() + timedelta(days=1)
+        with session_factory() as session:
+            for user in read_users(session):
+                run_date += timedelta(seconds=5)
+                scheduler.add_job(bot.send_message, trigger=DateTrigger(run_date=run_date), args=[user.id, "Hello"])
+        recipients = len(scheduler.get_jobs())
+        scheduler.shutdown(wait=False)
+    else:
+        BroadcastEngine(session_factory, BackgroundScheduler()).run(bot, 1)
+        recipients = bot.sent
+    return {
+        "recipients": recipients,
+        "peak_rss_mb": peak_rss_mb() - baseline,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20000)
+    parser.add_argument("--strategy", choices=["jobs", "stream"], help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.strategy:
+        print(json.dumps(measure(args.strategy, args.database)))
+        return
+
+    with tempfile.TemporaryDirectory() as directory:
+        path = f"{directory}/broadcast.db"
+        fill_database(path, args.users)
+        print(f"{args.users} users")
+        for strategy in ("jobs", "stream"):
+            output = subprocess.run(
+                [sys.executable, __file__, "--strategy", strategy, "--database", path],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            action = "scheduled" if strategy == "jobs" else "sent"
+            print(
+                f"{strategy:>6}: {result['recipients']:6d} {action:>9} | +{result['peak_rss_mb']:7.1f} MB peak RSS | "
+                f"{result['seconds']:6.1f} s"
+            )
+
+
+if __name__ == "__main__":
+    main()
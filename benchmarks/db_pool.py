@@ -0,0 +1,84 @@
+"""Per-update database latency with NullPool vs the pooled engine profile.
+
+Every update handled by the bot opens a session, reads the user, commits and
+closes. This benchmark replays that lifecycle against both pool modes.
+
+Usage:
+    python benchmarks/db_pool.py [--updates 500] [--url URL] [--connect-delay-ms 0]
+
+Without --url a temporary SQLite file is used. SQLite connections are cheap, so
+--connect-delay-ms can be used to emulate the TCP+TLS+auth handshake of a remote
+PostgreSQL server (e.g. 20-40 ms for a managed database).
+"""
+import argparse
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import event, select
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from app.auth.models import User  # noqa: E402
+from app.database.core import POOL_SETTINGS, create_db_engine  # noqa: E402
+from app.models import Base  # noqa: E402
+
+
+def run(url: str, mode: str, updates: int, connect_delay_ms: float) -> list[float]:
+    """Replay `updates` session lifecycles and return the latency of each in ms."""
+    engine = create_db_engine(url, {**POOL_SETTINGS, "mode": mode})
+    if connect_delay_ms:
+
+        @event.listens_for(engine, "do_connect")
+        def slow_connect(dialect, conn_rec, cargs, cparams):
+            time.sleep(connect_delay_ms / 1000)
+
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with session_factory() as session:
+        if session.get(User, 1) is None:
+            session.add(User(id=1, username="bench", lang="en"))
+            session.commit()
+
+    latencies = []
+    for _ in range(updates):
+        started = time.perf_counter()
+        session = session_factory()
+        session.execute(select(User).where(User.id == 1)).scalar_one()
+        session.commit()
+        session.close()
+        latencies.append((time.perf_counter() - started) * 1000)
+    engine.dispose()
+    return latencies
+
+
+def report(mode: str, latencies: list[float]):
+    """Print latency percentiles for one pool mode."""
+    ordered = sorted(latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    p99 = ordered[int(len(ordered) * 0.99) - 1]
+    print(
+        f"{mode:>6} pool: mean {statistics.mean(ordered):7.3f} ms | "
+        f"p50 {statistics.median(ordered):7.3f} ms | p95 {p95:7.3f} ms | p99 {p99:7.3f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--updates", type=int, default=500)
+    parser.add_argument("--url", default=None, help="Database URL, defaults to a temporary SQLite file")
+    parser.add_argument("--connect-delay-ms", type=float, default=0.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = args.url or f"sqlite:///{tmp_dir}/bench.db"
+        print(f"{args.updates} updates against {url.split('@')[-1]} (connect delay {args.connect_delay_ms} ms)")
+        for mode in ("null", "queue"):
+            report(mode, run(url, mode, args.updates, args.connect_delay_ms))
+
+
+if __name__ == "__main__":
+    main()
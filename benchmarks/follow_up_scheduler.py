@@ -0,0 +1,132 @@
+"""Thread count and memory of pending follow-ups: one threading.Timer each vs the follow-up dispatcher.
+
+Every event click schedules two delayed follow-up messages. This benchmark
+schedules --pending follow-ups an hour ahead with the previous
+`threading.Timer` implementation and with `events.follow_ups`, stored in a
+temporary SQLite database and polled by one `FollowUpDispatcher`, each in a
+fresh process, and reports the live threads and the resident memory. The
+dispatcher then sends the whole backlog as if the hour had passed.
+
+Usage:
+    python benchmarks/follow_up_scheduler.py [--pending 10000]
+"""
+import argparse
+import json
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+
+FOLLOW_UPS = [("email_confirmation", "Confirm your email", 3600), ("check_spam", "Check your spam folder", 3600)]
+
+
+def rss_mb() -> float:
+    """Return the resident set size of this process in MB (Linux)."""
+    with open("/proc/self/status") as status:
+        for line in status:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+class NullBot:
+    def __init__(self):
+        self.sent = 0
+
+    def send_message(self, user_id, message):
+        self.sent += 1
+
+
+def measure(strategy: str, pending: int, path: str) -> dict:
+    """Schedule `pending` follow-ups with `strategy` and measure this process."""
+    from sqlalchemy import create_engine  # noqa: E402
+    from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+    from app.events.follow_ups import FollowUpDispatcher, schedule_follow_ups  # noqa: E402
+    from app.models import Base  # noqa: E402
+
+    bot = NullBot()
+    users = pending // len(FOLLOW_UPS)
+    if strategy == "dispatcher":
+        engine = create_engine(f"sqlite:///{path}")
+        Base.metadata.create_all(engine)
+        session_factory = sessionmaker(bind=engine)
+        dispatcher = FollowUpDispatcher(session_factory)
+        dispatcher.start(bot)
+
+    baseline = rss_mb()
+    started = time.perf_counter()
+    if strategy == "timer":
+        handles = []
+        for user_id in range(users):
+            for _, text, delay_seconds in FOLLOW_UPS:
+                timer = threading.Timer(delay_seconds, bot.send_message, args=(user_id, text))
+                timer.start()
+                handles.append(timer)
+    else:
+        now = datetime.now()
+        for user_id in range(users):
+            with session_factory() as session:
+                schedule_follow_ups(session, user_id, FOLLOW_UPS, now=now)
+    elapsed = time.perf_counter() - started
+    result = {
+        "threads": threading.active_count(),
+        "rss_mb": rss_mb() - baseline,
+        "schedule_us": elapsed / pending * 1e6,
+        "sent": None,
+        "drain_s": None,
+    }
+
+    if strategy == "timer":
+        for timer in handles:
+            timer.cancel()
+    else:
+        # The hour has passed, the dispatcher claims the backlog batch by batch
+        started = time.perf_counter()
+        later = now + timedelta(hours=2)
+        while dispatcher.dispatch(now=later):
+            pass
+        result["drain_s"] = time.perf_counter() - started
+        result["sent"] = bot.sent
+        dispatcher.stop()
+        engine.dispose()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pending", type=int, default=10000)
+    parser.add_argument("--strategy", choices=["timer", "dispatcher"], help=argparse.SUPPRESS)
+    parser.add_argument("--database", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.strategy:
+        print(json.dumps(measure(args.strategy, args.pending, args.database)))
+        return
+
+    print(f"{args.pending} pending follow-ups")
+    with tempfile.TemporaryDirectory() as directory:
+        for strategy in ("timer", "dispatcher"):
+            output = subprocess.run(
+                [
+                    sys.executable, __file__, "--strategy", strategy, "--pending", str(args.pending),
+                    "--database", f"{directory}/{strategy}.db",
+                ],
+                capture_output=True, text=True, check=True,
+            ).stdout
+            result = json.loads(output.strip().splitlines()[-1])
+            drain = f" | {result['sent']:6d} sent in {result['drain_s']:5.1f} s" if result["sent"] is not None else ""
+            print(
+                f"{strategy:>10}: {result['threads']:6d} threads | +{result['rss_mb']:7.1f} MB RSS | "
+                f"{result['schedule_us']:7.1f} us/schedule{drain}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Load test of the synchronous and the asyncio runtimes on the events list hot path.
+
+Simulated users send /start, which loads the user, reads the events and sends the
+list. Telegram API calls are replaced by a sleep of --api-latency-ms, so the
+threaded runtime is bound by its worker count while the asyncio runtime keeps
+all requests in flight on one event loop.
+
+Usage:
+    python benchmarks/runtime_load.py [--users 1000] [--messages 3] [--api-latency-ms 50]
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / "src"))
+sys.path.insert(0, str(ROOT))
+
+from telebot.types import Update  # noqa: E402
+
+from app.async_main import BridgedAsyncTeleBot, _setup_async_middlewares  # noqa: E402
+from app.auth.cache import user_cache  # noqa: E402
+from app.database.async_core import AsyncSessionLocal, create_async_db_engine  # noqa: E402
+from app.database.core import POOL_SETTINGS, SessionLocal  # noqa: E402
+from app.events.async_handlers import register_async_handlers  # noqa: E402
+from app.events.models import Event  # noqa: E402
+from app.main import config, create_bot  # noqa: E402
+from app.models import Base  # noqa: E402
+
+TOKEN = "1:benchmark"
+# Polling hands updates to the bot in batches of up to 100
+BATCH_SIZE = 100
+
+
+def make_updates(users: int, messages: int) -> list:
+    """Return /start updates, `messages` per user, interleaved like concurrent users."""
+    updates = []
+    for number in range(messages):
+        for user_id in range(1, users + 1):
+            update_id = number * users + user_id
+            updates.append(Update.de_json(json.dumps({
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": 1,
+                    "chat": {"id": user_id, "type": "private"},
+                    "from": {"id": user_id, "is_bot": False, "first_name": f"user{user_id}"},
+                    "text": "/start",
+                    "entities": [{"type": "bot_command", "offset": 0, "length": 6}],
+                },
+            })))
+    return updates
+
+
+class Recorder:
+    """Collect the latency between feeding an update and the reply being sent."""
+
+    def __init__(self, expected: int) -> None:
+        self.expected = expected
+        self.fed_at = {}
+        self.latencies = []
+        self.peak_threads = 0
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def fed(self, updates) -> None:
+        now = time.perf_counter()
+        for update in updates:
+            self.fed_at[update.message.chat.id, update.message.message_id] = now
+
+    def sent(self, chat_id, message_id) -> None:
+        with self.lock:
+            self.latencies.append((time.perf_counter() - self.fed_at[chat_id, message_id]) * 1000)
+            self.peak_threads = max(self.peak_threads, threading.active_count())
+            if len(self.latencies) == self.expected:
+                self.done.set()
+
+
+def run_sync(updates: list, latency: float, shards: int) -> tuple[float, Recorder]:
+    """Feed the updates to the threaded bot and wait for every reply."""
+    config.app.workers.shards = shards
+    bot = create_bot(TOKEN)
+    recorder = Recorder(len(updates))
+    current = threading.local()
+
+    def send_message(chat_id, *args, **kwargs):
+        time.sleep(latency)
+        recorder.sent(chat_id, current.message_id)
+
+    bot.send_message = send_message
+    # Handlers do not see the update, so remember it per worker thread
+    handler = bot.message_handlers[[h["filters"].get("commands") for h in bot.message_handlers].index(["start"])]
+    original = handler["function"]
+
+    def tracked(message, data):
+        current.message_id = message.message_id
+        return original(message, data)
+
+    handler["function"] = tracked
+
+    started = time.perf_counter()
+    for offset in range(0, len(updates), BATCH_SIZE):
+        batch = updates[offset:offset + BATCH_SIZE]
+        recorder.fed(batch)
+        bot.process_new_updates(batch)
+    recorder.done.wait()
+    elapsed = time.perf_counter() - started
+    bot.worker_pool.close()
+    return elapsed, recorder
+
+
+async def run_async(updates: list, latency: float) -> tuple[float, Recorder]:
+    """Feed the updates to the asyncio bot and wait for every reply."""
+    sync_bot = create_bot(TOKEN)
+    bot = BridgedAsyncTeleBot(TOKEN, sync_bot)
+    _setup_async_middlewares(bot, sync_bot)
+    register_async_handlers(bot)
+    recorder = Recorder(len(updates))
+    message_ids = {}
+
+    async def send_message(chat_id, *args, **kwargs):
+        await asyncio.sleep(latency)
+        recorder.sent(chat_id, message_ids[chat_id].pop(0))
+
+    bot.send_message = send_message
+    for update in updates:
+        message_ids.setdefault(update.message.chat.id, []).append(update.message.message_id)
+
+    started = time.perf_counter()
+    tasks = []
+    for offset in range(0, len(updates), BATCH_SIZE):
+        batch = updates[offset:offset + BATCH_SIZE]
+        recorder.fed(batch)
+        # Polling processes each batch in its own task
+        tasks.append(asyncio.create_task(bot.process_new_updates(batch)))
+        await asyncio.sleep(0)
+    await asyncio.gather(*tasks)
+    elapsed = time.perf_counter() - started
+    sync_bot.worker_pool.close()
+    return elapsed, recorder
+
+
+def report(name: str, elapsed: float, recorder: Recorder):
+    """Print throughput, reply latency percentiles and the peak thread count."""
+    ordered = sorted(recorder.latencies)
+    p95 = ordered[int(len(ordered) * 0.95) - 1]
+    print(
+        f"{name:>7}: {len(ordered) / elapsed:8.1f} updates/s | p50 {statistics.median(ordered):8.1f} ms | "
+        f"p95 {p95:8.1f} ms | peak threads {recorder.peak_threads}"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--messages", type=int, default=3, help="/start messages sent by each user")
+    parser.add_argument("--api-latency-ms", type=float, default=50.0)
+    parser.add_argument("--shards", type=int, default=config.app.workers.shards, help="Threaded runtime workers")
+    args = parser.parse_args()
+
+    # Every user sends several messages in a row, which antiflood would reject
+    config.app.antiflood.enabled = False
+    latency = args.api_latency_ms / 1000
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = f"sqlite:///{tmp_dir}/bench.db"
+        engine = create_engine(url)
+        Base.metadata.create_all(engine)
+        SessionLocal.configure(bind=engine)
+        async_engine = create_async_db_engine(url, POOL_SETTINGS)
+        AsyncSessionLocal.configure(bind=async_engine)
+        with SessionLocal() as session:
+            session.add_all(Event(name=f"Event {number}", description="Benchmark") for number in range(10))
+            session.commit()
+
+        print(
+            f"{args.users} users x {args.messages} messages, Telegram API latency {args.api_latency_ms} ms, "
+            f"{args.shards} threaded workers"
+        )
+        report("threads", *run_sync(make_updates(args.users, args.messages), latency, args.shards))
+        # Both runtimes load the users from the database on their first message
+        user_cache.clear()
+        report("asyncio", *asyncio.run(run_async(make_updates(args.users, args.messages), latency)))
+
+        asyncio.run(async_engine.dispose())
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""Microbenchmark of `auth.service.upsert_user` against the previous three-round-trip path.
+
+The previous implementation ran a SELECT, then `update_user` ran the same SELECT
+again followed by an UPDATE and a COMMIT. The native upsert does the same work
+with one `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` statement.
+
+Usage:
+    python benchmarks/upsert_user.py [--users 200] [--rounds 5] [--url URL]
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from app.auth.models import User  # noqa: E402
+from app.auth.service import create_user, update_user, upsert_user  # noqa: E402
+from app.models import Base  # noqa: E402
+
+
+def legacy_upsert_user(db_session, id, username=None, first_name=None, last_name=None):
+    """The previous SELECT + update_user/create_user implementation of upsert_user."""
+    db_session.expire_on_commit = False
+    try:
+        user = db_session.query(User).filter(User.id == id).first()
+        if user:
+            user = update_user(db_session, id=id, username=username, first_name=first_name, last_name=last_name)
+        else:
+            user = create_user(db_session, id=id, username=username, first_name=first_name, last_name=last_name)
+    finally:
+        db_session.close()
+    return user
+
+
+def run(url: str, upsert, users: int, rounds: int) -> tuple[float, int]:
+    """Upsert every user `rounds` times and return (mean ms per call, statements per call)."""
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    statements = 0
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def count_statement(*args):
+        nonlocal statements
+        statements += 1
+
+    session_factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    session = session_factory()
+    calls = 0
+    started = time.perf_counter()
+    for round_number in range(rounds):
+        for user_id in range(1, users + 1):
+            upsert(session, id=user_id, username=f"user{user_id}", first_name=f"Name {round_number}")
+            calls += 1
+    elapsed = time.perf_counter() - started
+    session.close()
+    engine.dispose()
+    return elapsed / calls * 1000, statements / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--url", default=None, help="Database URL, defaults to a temporary SQLite file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        url = args.url or f"sqlite:///{tmp_dir}/bench.db"
+        for name, upsert in (("legacy", legacy_upsert_user), ("native", upsert_user)):
+            mean_ms, statements = run(url, upsert, args.users, args.rounds)
+            print(f"{name:>6} upsert: {mean_ms:7.3f} ms/call, {statements:4.1f} statements/call")
+
+
+if __name__ == "__main__":
+    main()
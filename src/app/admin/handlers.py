@@ -7,11 +7,19 @@ from pathlib import Path
 from typing import Any, Dict
 
 from omegaconf import OmegaConf
+from telebot import types
+from telebot.handler_backends import State, StatesGroup
 from telebot.types import CallbackQuery, Message
 
 from ..database.core import export_all_tables
-from ..events.service import read_events, remove_event
-from .markup import create_admin_menu_markup
+from ..events.render import is_image_url, sent_photo_file_id
+from ..events.service import create_event, read_catalog_page, remove_event
+from .markup import (
+    DELETE_EVENTS_PAGE_PREFIX,
+    create_admin_menu_markup,
+    create_cancel_button,
+    create_delete_events_markup,
+)
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -26,12 +34,6 @@ app_strings = config.strings
 global_config = OmegaConf.load("./src/app/config.yaml")
 
 
-from telebot import types
-from telebot.handler_backends import State, StatesGroup
-
-from ..events.service import create_event
-from .markup import create_cancel_button
-
 class CreateEventState(StatesGroup):
     title = State()
     description = State()
@@ -213,6 +215,17 @@ def register_handlers(bot):
             else:
                 image_url = message.text
 
+        # Upload an image given as a URL once, users are then sent its file id
+        image_file_id = None
+        if is_image_url(image_url) and global_config.app.event_images.prewarm:
+            try:
+                sent = bot.send_photo(
+                    user.id, image_url, caption=app_strings[user.lang].create_event.image_preview
+                )
+                image_file_id = sent_photo_file_id(sent)
+            except Exception as e:
+                logger.warning(f"Could not upload the image of the new event: {e}")
+
         # Gather all event data
         data["state"].add_data(content=image_url)
         with data["state"].data() as data_items:
@@ -222,6 +235,7 @@ def register_handlers(bot):
                 "qtickets_link": data_items.get("qtickets_link"),
                 "datetime": data_items.get("datetime"),
                 "image_url": data_items.get("content"),
+                "image_file_id": image_file_id,
             }
             try:
                 event = create_event(db_session, event_data)
@@ -243,19 +257,31 @@ def register_handlers(bot):
         """
         user = data["user"]
         db_session = data["db_session"]
-        events = read_events(db_session, skip=0, limit=100)
-        if not events:
+        page = read_catalog_page(db_session)
+        if not page.events:
             bot.send_message(user.id, "Нет мероприятий для удаления.")
             return
-        markup = types.InlineKeyboardMarkup()
-        for event in events:
-            markup.add(
-                types.InlineKeyboardButton(
-                    f"❌ {event.name}", callback_data=f"delete_event_{event.id}"
-                )
-            )
+        markup = create_delete_events_markup(user.lang, page)
         bot.send_message(user.id, "Выберите мероприятие для удаления:", reply_markup=markup)
 
+    @bot.callback_query_handler(func=lambda call: call.data.startswith(DELETE_EVENTS_PAGE_PREFIX))
+    def delete_event_page(call: types.CallbackQuery, data: Dict[str, Any]) -> None:
+        """
+        Show another page of the events to delete.
+        """
+        user = data["user"]
+        cursor = call.data[len(DELETE_EVENTS_PAGE_PREFIX):]
+        try:
+            page = read_catalog_page(data["db_session"], cursor)
+        except ValueError as e:
+            logger.warning(f"Ignoring delete list page request of user {user.id}: {e}")
+            return
+        bot.edit_message_reply_markup(
+            chat_id=user.id,
+            message_id=call.message.message_id,
+            reply_markup=create_delete_events_markup(user.lang, page),
+        )
+
     @bot.callback_query_handler(func=lambda call: call.data.startswith("delete_event_"))
     def delete_event_handler(call: types.CallbackQuery, data: Dict[str, Any]) -> None:
         """
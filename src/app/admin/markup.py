@@ -5,11 +5,17 @@ from pathlib import Path
 from omegaconf import OmegaConf
 from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
 
+from ..events.markup import create_page_buttons
+from ..events.pagination import EventPage
+
 # Load configuration
 CURRENT_DIR = Path(__file__).parent
 config = OmegaConf.load(CURRENT_DIR / "config.yaml")
 app_strings = config.strings
 
+# Callback data of the page buttons of the delete list, followed by the cursor of the page
+DELETE_EVENTS_PAGE_PREFIX = "delete_events_page:"
+
 # Set up logging
 logger = logging.getLogger(__name__)
 logging.basicConfig(
@@ -53,3 +59,18 @@ def create_event_cancel_button(lang: str) -> InlineKeyboardMarkup:
         InlineKeyboardButton(app_strings[lang].cancel, callback_data="cancel_event")
     )
     return cancel_button
+
+
+def create_delete_events_markup(lang: str, page: EventPage) -> InlineKeyboardMarkup:
+    """Create the markup of a page of the events to delete."""
+    markup = InlineKeyboardMarkup()
+    for event in page.events:
+        markup.add(
+            InlineKeyboardButton(f"❌ {event.name}", callback_data=f"delete_event_{event.id}")
+        )
+    page_buttons = create_page_buttons(
+        lang, DELETE_EVENTS_PAGE_PREFIX, page.prev_cursor, page.next_cursor
+    )
+    if page_buttons:
+        markup.row(*page_buttons)
+    return markup
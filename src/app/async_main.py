@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import os
+import signal
+import weakref
+
+from telebot.async_telebot import AsyncTeleBot
+
+from .auth.activity import activity_tracker
+from .database.async_core import async_engine
+from .database.core import create_tables, warm_up_pool
+from .events.async_handlers import register_async_handlers
+from .events.follow_ups import follow_up_dispatcher
+from .executor import update_chat_key
+from .gateway import send_gateway
+from .main import config, create_bot, main
+from .middleware.antiflood import AntifloodMiddleware
+from .middleware.async_middlewares import (
+    AsyncAntifloodMiddleware,
+    AsyncDatabaseMiddleware,
+    AsyncUserMiddleware,
+)
+from .middleware.audit import log_event_writer
+from .public_message.broadcast import broadcast_engine
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+
+class BridgedAsyncTeleBot(AsyncTeleBot):
+    """AsyncTeleBot handing the updates it has no native handler for to the synchronous bot
+
+    This is a hybrid runtime: the events list, its pages, the inline search
+    and the event details have native async handlers served from the event
+    loop. The other updates run on the sharded worker pool of the synchronous
+    bot, with its own middlewares and handlers, until they are ported.
+
+    The updates of one chat are processed one at a time and in the order they
+    were received, whichever side handles them: a per-chat lock is held until
+    the native handler returns or the synchronous bot is done with the update.
+    Different chats are processed concurrently.
+    """
+
+    def __init__(self, token: str, sync_bot, **kwargs) -> None:
+        """
+        Args:
+            token: The Telegram bot token.
+            sync_bot: The synchronous bot handling the updates without a native handler.
+        """
+        super().__init__(token, **kwargs)
+        self.sync_bot = sync_bot
+        self._chat_locks: weakref.WeakValueDictionary = weakref.WeakValueDictionary()
+        self._stats = {"native": 0, "bridged": 0}
+
+    def stats(self) -> dict:
+        """Return how many updates were handled natively and by the synchronous bot"""
+        return dict(self._stats)
+
+    async def process_new_updates(self, updates):
+        """Process a batch of updates, in order within each chat and concurrently across chats"""
+        chats: dict = {}
+        for update in updates:
+            chats.setdefault(update_chat_key(update), []).append(update)
+        await asyncio.gather(
+            *(self._process_chat_updates(key, chat_updates) for key, chat_updates in chats.items())
+        )
+
+    async def _process_chat_updates(self, key, updates) -> None:
+        # Polling processes each batch in its own task, the lock keeps the order across batches
+        lock = self._chat_locks.get(key)
+        if lock is None:
+            lock = self._chat_locks[key] = asyncio.Lock()
+        async with lock:
+            for update in updates:
+                if await self._has_native_handler(update):
+                    self._stats["native"] += 1
+                    await super().process_new_updates([update])
+                else:
+                    self._stats["bridged"] += 1
+                    await self._process_bridged_update(key, update)
+
+    async def _process_bridged_update(self, key, update) -> None:
+        """Run an update in the synchronous bot, on the shard of its chat, and wait for it"""
+        loop = asyncio.get_running_loop()
+        done = loop.create_future()
+
+        def process() -> None:
+            try:
+                # Called from the shard worker, the handlers run right away in it
+                self.sync_bot.process_new_updates([update])
+            finally:
+                loop.call_soon_threadsafe(done.set_result, None)
+
+        # Queuing blocks while the shard of the chat is full, keep it off the loop
+        await asyncio.to_thread(self.sync_bot.worker_pool.submit, key, process)
+        await done
+
+    async def _has_native_handler(self, update) -> bool:
+        if update.message is not None:
+            handlers, message = self.message_handlers, update.message
+        elif update.callback_query is not None:
+            handlers, message = self.callback_query_handlers, update.callback_query
+        elif update.inline_query is not None:
+            handlers, message = self.inline_handlers, update.inline_query
+        else:
+            return False
+        for handler in handlers:
+            if await self._test_message_handler(handler, message):
+                return True
+        return False
+
+
+async def start_async_bot():
+    """Start the bot on an event loop, with native async handlers for the hot paths."""
+    BOT_TOKEN = os.getenv("BOT_TOKEN")
+
+    if not BOT_TOKEN:
+        logging.critical("BOT_TOKEN is not set in environment variables")
+        raise ValueError("BOT_TOKEN environment variable is required")
+
+    logger.info(f"Initializing {config.app.name} v{config.app.version} in asyncio mode")
+
+    # Both bots share the buckets of the gateway, the async handlers reply to the same chats
+    if config.app.gateway.enabled:
+        send_gateway.install()
+        send_gateway.install_async()
+    sync_bot = create_bot(BOT_TOKEN)
+    bot = BridgedAsyncTeleBot(BOT_TOKEN, sync_bot)
+    _setup_async_middlewares(bot, sync_bot)
+    register_async_handlers(bot)
+
+    # Create the missing tables, and the columns and indexes added since the database was created
+    await asyncio.to_thread(create_tables)
+    await asyncio.to_thread(warm_up_pool)
+    log_event_writer.start()
+    activity_tracker.start()
+    # Follow-ups are sent by the synchronous bot, through the send gateway
+    follow_up_dispatcher.start(sync_bot)
+    broadcast_engine.resume(sync_bot)
+    # Stop gracefully on `docker stop` so queued log events and activity timestamps are flushed
+    asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, bot.stop_polling)
+
+    try:
+        logger.info("Starting async bot polling...")
+        # Polling is refused by Telegram while a webhook is set
+        await bot.delete_webhook()
+        await bot.polling(non_stop=True, interval=0, timeout=60)
+    except Exception as e:
+        logging.critical(f"Failed to start bot: {str(e)}")
+        raise
+    finally:
+        logger.info(f"Async bot stopped: {bot.stats()}")
+        await bot.close_session()
+        follow_up_dispatcher.stop()
+        broadcast_engine.stop()
+        sync_bot.worker_pool.close()
+        log_event_writer.stop()
+        activity_tracker.stop()
+        await async_engine.dispose()
+
+
+def _setup_async_middlewares(bot, sync_bot):
+    """Configure async middlewares, sharing the antiflood buckets with the synchronous bot."""
+    for middleware in sync_bot.middlewares:
+        if isinstance(middleware, AntifloodMiddleware):
+            bot.setup_middleware(AsyncAntifloodMiddleware(middleware))
+    bot.setup_middleware(AsyncDatabaseMiddleware())
+    bot.setup_middleware(AsyncUserMiddleware(bot, sync_bot))
+
+
+if __name__ == "__main__":
+    main()
+    asyncio.run(start_async_bot())
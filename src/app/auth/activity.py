@@ -0,0 +1,142 @@
+import logging
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from omegaconf import OmegaConf
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from ..database.core import SessionLocal
+from .models import User
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+
+
+class ActivityTracker:
+    """Coalesce `last_message_timestamp` writes into periodic bulk updates"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        granularity_seconds: float = 60,
+        flush_interval_seconds: float = 30,
+        max_tracked_users: int = 100000,
+    ) -> None:
+        """
+        Args:
+            session_factory: Factory producing database sessions.
+            granularity_seconds: A new timestamp is only persisted when the stored one is older.
+            flush_interval_seconds: How often pending timestamps are written.
+            max_tracked_users: Maximum number of stored timestamps remembered.
+        """
+        self.session_factory = session_factory
+        self.granularity = timedelta(seconds=granularity_seconds)
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_tracked_users = max_tracked_users
+        self._persisted: OrderedDict[int, datetime] = OrderedDict()
+        self._pending: dict[int, datetime] = {}
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats = {"touches": 0, "coalesced": 0, "written": 0, "flushes": 0}
+
+    def touch(self, user: User, now: Optional[datetime] = None) -> None:
+        """Record activity of a user, it is persisted if the stored timestamp is too old"""
+        now = now or datetime.now()
+        with self._lock:
+            self._stats["touches"] += 1
+            stored = self._persisted.get(user.id)
+            if stored is None or (
+                user.last_message_timestamp is not None and user.last_message_timestamp > stored
+            ):
+                stored = user.last_message_timestamp
+            if user.id in self._pending or (stored is not None and now - stored < self.granularity):
+                self._stats["coalesced"] += 1
+                return
+            self._pending[user.id] = now
+
+    def flush(self) -> int:
+        """Write all pending timestamps with one bulk UPDATE and return how many were written"""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return 0
+
+        session = self.session_factory()
+        try:
+            # A list of primary key parameter sets is sent as one executemany UPDATE
+            session.execute(
+                update(User),
+                [
+                    {"id": user_id, "last_message_timestamp": timestamp}
+                    for user_id, timestamp in pending.items()
+                ],
+            )
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error writing {len(pending)} activity timestamps: {e}")
+            # Keep the timestamps for the next flush unless newer ones arrived
+            with self._lock:
+                for user_id, timestamp in pending.items():
+                    self._pending.setdefault(user_id, timestamp)
+            return 0
+        finally:
+            session.close()
+
+        with self._lock:
+            for user_id, timestamp in pending.items():
+                self._persisted[user_id] = timestamp
+                self._persisted.move_to_end(user_id)
+            while len(self._persisted) > self.max_tracked_users:
+                self._persisted.popitem(last=False)
+            self._stats["written"] += len(pending)
+            self._stats["flushes"] += 1
+        return len(pending)
+
+    def start(self) -> None:
+        """Start the periodic flusher"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="activity-tracker", daemon=True)
+        self._thread.start()
+        logger.info("Activity tracker started")
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """Stop the periodic flusher and write pending timestamps"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self.flush()
+        logger.info(f"Activity tracker stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        """Return touch, coalesced and written counters and the number of pending timestamps"""
+        with self._lock:
+            return {**self._stats, "pending": len(self._pending)}
+
+    def _run(self) -> None:
+        while not self._stop_event.wait(self.flush_interval_seconds):
+            self.flush()
+
+
+activity_tracker = ActivityTracker(
+    SessionLocal,
+    granularity_seconds=config.app.activity.granularity_seconds,
+    flush_interval_seconds=config.app.activity.flush_interval_seconds,
+    max_tracked_users=config.app.activity.max_tracked_users,
+)
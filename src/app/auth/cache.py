@@ -0,0 +1,110 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from omegaconf import OmegaConf
+
+from .models import User
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+
+
+class UserCache:
+    """Bounded LRU cache of users keyed by Telegram id, with a time to live"""
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        """
+        Args:
+            max_size: Maximum number of cached users, least recently used ones are evicted.
+            ttl_seconds: Time after which a cached user is reloaded from the database.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._users: OrderedDict[int, tuple[float, User]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def get(
+        self,
+        user_id: int,
+        username: Optional[str] = None,
+        first_name: Optional[str] = None,
+        last_name: Optional[str] = None,
+    ) -> Optional[User]:
+        """
+        Return the cached user if it is fresh and matches the given profile.
+
+        Profile fields that are None are not compared, the same way `upsert_user`
+        does not overwrite them.
+        """
+        with self._lock:
+            entry = self._users.get(user_id)
+            if entry is None:
+                self._misses += 1
+                return None
+
+            cached_at, user = entry
+            if time.monotonic() - cached_at > self.ttl_seconds:
+                del self._users[user_id]
+                self._misses += 1
+                return None
+
+            profile = (("username", username), ("first_name", first_name), ("last_name", last_name))
+            if any(value is not None and getattr(user, name) != value for name, value in profile):
+                self._misses += 1
+                return None
+
+            self._users.move_to_end(user_id)
+            self._hits += 1
+            return user
+
+    def put(self, user: User) -> None:
+        """Cache a user, evicting the least recently used one if the cache is full"""
+        with self._lock:
+            self._users[user.id] = (time.monotonic(), user)
+            self._users.move_to_end(user.id)
+            while len(self._users) > self.max_size:
+                self._users.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, user_id: int) -> None:
+        """Remove a user from the cache after it was changed"""
+        with self._lock:
+            if self._users.pop(int(user_id), None) is not None:
+                self._invalidations += 1
+
+    def clear(self) -> None:
+        """Remove all users from the cache"""
+        with self._lock:
+            self._users.clear()
+
+    def stats(self) -> dict:
+        """Return hit, miss, eviction and invalidation counters"""
+        with self._lock:
+            return {
+                "size": len(self._users),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+user_cache = UserCache(
+    max_size=config.app.user_cache.max_size,
+    ttl_seconds=config.app.user_cache.ttl_seconds,
+)
@@ -1,4 +1,4 @@
-from sqlalchemy import BigInteger, Boolean, Column, DateTime, Integer, String
+from sqlalchemy import BigInteger, Boolean, Column, DateTime, Index, Integer, String
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql.schema import ForeignKey
 
@@ -30,8 +30,18 @@ class User(Base):
     lang = Column(String, default="ru")
     role_id = Column(Integer, ForeignKey("roles.id"), default=2)
     is_blocked = Column(Boolean, default=False)
+    # Set when a message is refused with 403 (bot blocked, account deleted), cleared when the user writes again
+    is_unreachable = Column(Boolean, nullable=False, default=False)
 
     role = relationship("Role", backref="users", lazy="joined")
+
+    # Broadcasts page through the reachable users of a segment in id order, with `is_unreachable = false`
+    __table_args__ = (
+        Index("ix_users_is_unreachable_id", "is_unreachable", "id"),
+        Index("ix_users_is_unreachable_lang_id", "is_unreachable", "lang", "id"),
+        Index("ix_users_is_unreachable_role_id_id", "is_unreachable", "role_id", "id"),
+        Index("ix_users_last_message_timestamp", "last_message_timestamp"),
+    )
     # events = relationship(
     #     "Event",
     #     secondary="users_events",
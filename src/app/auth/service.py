@@ -1,7 +1,10 @@
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import Optional, Sequence
 
+from sqlalchemy import bindparam, false, func, or_, select, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from .models import User
@@ -40,6 +43,44 @@ def read_users(
     return query.all()
 
 
+def read_user_ids(
+    db_session: Session,
+    after_id: Optional[int] = None,
+    limit: int = 500,
+    reachable_only: bool = False,
+    conditions: Sequence = (),
+) -> list[int]:
+    """Read one page of the ids of the users matching `conditions` in id order, starting after `after_id`"""
+    query = select(User.id).where(*conditions).order_by(User.id).limit(limit)
+    if after_id is not None:
+        query = query.where(User.id > after_id)
+    if reachable_only:
+        query = query.where(User.is_unreachable == false())
+    return list(db_session.scalars(query))
+
+
+def count_users(
+    db_session: Session, reachable_only: bool = False, conditions: Sequence = ()
+) -> int:
+    """Count the users matching `conditions`, optionally only the ones not flagged as unreachable"""
+    query = select(func.count(User.id)).where(*conditions)
+    if reachable_only:
+        query = query.where(User.is_unreachable == false())
+    return db_session.scalar(query)
+
+
+def mark_user_unreachable(db_session: Session, id: int) -> None:
+    """Flag a user messages can no longer be delivered to"""
+    try:
+        db_session.execute(update(User).where(User.id == id).values(is_unreachable=True))
+        db_session.commit()
+        logger.info(f"User with ID {id} marked as unreachable.")
+    except Exception as e:
+        db_session.rollback()
+        logger.error(f"Error marking user with ID {id} as unreachable: {e}")
+        raise
+
+
 def create_user(
     db_session: Session,
     id: int,
@@ -155,6 +196,82 @@ def update_user(
     return user
 
 
+# Dialect-specific INSERT constructs are not cached by SQLAlchemy, so each statement
+# shape is compiled once and reused as a textual statement
+_upsert_statements: dict = {}
+
+_upsert_dialects = {
+    "postgresql": (postgresql.insert, postgresql.dialect(paramstyle="named")),
+    "sqlite": (sqlite.insert, sqlite.dialect(paramstyle="named")),
+}
+
+
+def build_upsert_user_statement(dialect_name: str, columns: tuple, touch: bool = True):
+    """
+    Build a dialect-aware `INSERT ... ON CONFLICT DO UPDATE ... RETURNING` statement for a user.
+
+    An existing row is only updated, and returned, when a written column changes.
+
+    Args:
+        dialect_name: The database dialect, "postgresql" or "sqlite".
+        columns: The names of the columns to write besides the id and timestamps.
+        touch: Whether to update the last message timestamp.
+
+    Returns:
+        The ORM upsert statement returning the user row, and the defaults of the columns
+        not written, to evaluate for each execution.
+
+    Raises:
+        ValueError: If the dialect is not supported, or a column default needs the
+            execution context.
+    """
+    key = (dialect_name, columns, touch)
+    if key in _upsert_statements:
+        return _upsert_statements[key]
+
+    if dialect_name not in _upsert_dialects:
+        raise ValueError(f"Upsert is not supported for dialect {dialect_name}")
+    insert, dialect = _upsert_dialects[dialect_name]
+
+    table = User.__table__
+    inserted = ("id", "first_message_timestamp", "last_message_timestamp", *columns)
+    insert_statement = insert(User).values({name: bindparam(name) for name in inserted})
+
+    # Only overwrite the columns provided, and only when one of them changes: a skipped
+    # row is not rewritten, nor returned, the caller reads it instead
+    excluded = insert_statement.excluded
+    update_set = {name: excluded[name] for name in columns}
+    if touch:
+        update_set["last_message_timestamp"] = excluded.last_message_timestamp
+    if update_set:
+        where = or_(*(table.c[name].is_distinct_from(value) for name, value in update_set.items()))
+    else:
+        # Nothing to compare, a no-op update still returns the row
+        update_set["id"] = excluded.id
+        where = None
+    insert_statement = insert_statement.on_conflict_do_update(
+        index_elements=[User.id], set_=update_set, where=where
+    ).returning(*table.columns)
+
+    # Column defaults are rendered as extra parameters, keep them to evaluate on execution
+    compiled = insert_statement.compile(dialect=dialect)
+    defaults = {}
+    for name in compiled.params:
+        default = table.c[name].default
+        if name in inserted or default is None:
+            continue
+        # SQLAlchemy wraps the callables taking no argument, the others expect an execution context
+        if not (default.is_scalar or (default.is_callable and hasattr(default.arg, "__wrapped__"))):
+            raise ValueError(f"Default of column users.{name} is not supported by the upsert")
+        defaults[name] = default
+    textual = text(str(compiled)).bindparams(
+        *[bindparam(name, type_=table.c[name].type) for name in compiled.params]
+    )
+    statement = select(User).from_statement(textual.columns(*table.columns))
+    _upsert_statements[key] = (statement, defaults)
+    return statement, defaults
+
+
 def upsert_user(
     db_session: Session,
     id: int,
@@ -164,9 +281,11 @@ def upsert_user(
     lang: Optional[str] = None,
     role_id: Optional[str] = None,
     is_blocked: Optional[bool] = None,
+    is_unreachable: Optional[bool] = None,
+    touch: bool = True,
 ) -> User:
     """
-    Insert or update a user.
+    Insert or update a user with a single statement, the row is read back when nothing changed.
 
     Args:
         id: The user's ID.
@@ -175,38 +294,35 @@ def upsert_user(
         last_name: The user's last name.
         lang: The user's language.
         role_id: The user's role.
-        active_session_id: The user's active session ID.
         is_blocked: The user's blocked status.
+        is_unreachable: Whether messages to the user are refused.
+        touch: Whether to update the last message timestamp.
 
     Returns:
         The user object.
     """
+    values = _provided_values(
+        username=username,
+        first_name=first_name,
+        last_name=last_name,
+        lang=lang,
+        role_id=role_id,
+        is_blocked=is_blocked,
+        is_unreachable=is_unreachable,
+    )
 
     db_session.expire_on_commit = False
     try:
-        user = db_session.query(User).filter(User.id == id).first()
-        if user:
-            user = update_user(
-                db_session,
-                id=id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                lang=lang,
-                role_id=role_id,
-                is_blocked=is_blocked,
-            )
-        else:
-            user = create_user(
-                db_session,
-                id=id,
-                username=username,
-                first_name=first_name,
-                last_name=last_name,
-                lang=lang,
-                role_id=role_id,
-                is_blocked=is_blocked,
-            )
+        statement, parameters = _upsert_user_parameters(
+            db_session.get_bind().dialect.name, id, values, touch
+        )
+        user = db_session.scalars(
+            statement, parameters, execution_options={"populate_existing": True}
+        ).one_or_none()
+        if user is None:
+            # The row exists and nothing changed
+            user = db_session.get(User, id, populate_existing=True)
+        db_session.commit()
     except Exception as e:
         db_session.rollback()
         logger.error(f"Error upserting user with ID {id}: {e}")
@@ -214,3 +330,73 @@ def upsert_user(
     finally:
         db_session.close()
     return user
+
+
+async def upsert_user_async(
+    db_session: AsyncSession,
+    id: int,
+    username: Optional[str] = None,
+    first_name: Optional[str] = None,
+    last_name: Optional[str] = None,
+    is_unreachable: Optional[bool] = None,
+    touch: bool = True,
+) -> User:
+    """
+    Insert or update a user on an async session, see `upsert_user`.
+
+    Args:
+        id: The user's ID.
+        username: The user's name.
+        first_name: The user's first name.
+        last_name: The user's last name.
+        is_unreachable: Whether messages to the user are refused.
+        touch: Whether to update the last message timestamp.
+
+    Returns:
+        The user object.
+    """
+    values = _provided_values(
+        username=username,
+        first_name=first_name,
+        last_name=last_name,
+        is_unreachable=is_unreachable,
+    )
+    try:
+        statement, parameters = _upsert_user_parameters(
+            db_session.bind.dialect.name, id, values, touch
+        )
+        result = await db_session.scalars(
+            statement, parameters, execution_options={"populate_existing": True}
+        )
+        user = result.one_or_none()
+        if user is None:
+            # The row exists and nothing changed
+            user = await db_session.get(User, id, populate_existing=True)
+        await db_session.commit()
+    except Exception as e:
+        await db_session.rollback()
+        logger.error(f"Error upserting user with ID {id}: {e}")
+        raise
+    return user
+
+
+def _provided_values(**values) -> dict:
+    """Keep the columns that were given a value"""
+    return {name: value for name, value in values.items() if value is not None}
+
+
+def _upsert_user_parameters(dialect_name: str, id: int, values: dict, touch: bool):
+    """Return the cached upsert statement for `values` and its execution parameters"""
+    now = datetime.now()
+    statement, defaults = build_upsert_user_statement(dialect_name, tuple(values), touch=touch)
+    parameters = {
+        **{
+            name: default.arg(None) if default.is_callable else default.arg
+            for name, default in defaults.items()
+        },
+        "id": int(id),
+        "first_message_timestamp": now,
+        "last_message_timestamp": now,
+        **values,
+    }
+    return statement, parameters
@@ -6,6 +6,7 @@ from omegaconf import OmegaConf
 from telebot import TeleBot, types
 
 from ..auth.service import read_users
+from ..gateway import send_gateway
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -84,8 +85,10 @@ def process_message(message: types.Message, bot: TeleBot, data: Dict[str, Any]):
     )
     markup.add(reply_button)
 
-    for admin in admins:
-        bot.send_message(admin.id, feedback_message, reply_markup=markup)
+    # The fan-out waits behind interactive replies, the confirmation below does not
+    with send_gateway.broadcast():
+        for admin in admins:
+            bot.send_message(admin.id, feedback_message, reply_markup=markup)
 
     bot.send_message(user.id, strings[user.lang].message_sent)
 
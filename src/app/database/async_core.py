@@ -0,0 +1,57 @@
+import logging
+
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, NullPool
+
+from .core import DATABASE_URL, POOL_SETTINGS
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Async drivers, installed with the `async` extra
+ASYNC_DRIVERS = {"postgresql": "postgresql+asyncpg", "sqlite": "sqlite+aiosqlite"}
+
+
+def create_async_db_engine(database_url: str, pool_settings: dict) -> AsyncEngine:
+    """Create an asyncpg or aiosqlite engine for a synchronous database URL."""
+    url = make_url(database_url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f"No async driver for database backend: {backend}")
+
+    connect_args = {}
+    if backend == "postgresql":
+        # asyncpg does not understand libpq's sslmode
+        sslmode = url.query.get("sslmode")
+        if sslmode:
+            connect_args["ssl"] = sslmode
+        url = url.difference_update_query(["sslmode"])
+        connect_args["server_settings"] = {"application_name": "events-bot"}
+    url = url.set(drivername=ASYNC_DRIVERS[backend])
+
+    options = {"connect_args": connect_args, "echo": False}
+    if pool_settings["mode"] == "null":
+        options["poolclass"] = NullPool
+    elif pool_settings["mode"] == "queue":
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=pool_settings["size"],
+            max_overflow=pool_settings["max_overflow"],
+            pool_timeout=pool_settings["timeout_seconds"],
+            pool_recycle=pool_settings["recycle_seconds"],
+            pool_pre_ping=pool_settings["pre_ping"],
+        )
+    else:
+        raise ValueError(f"Unknown database pool mode: {pool_settings['mode']}")
+    return create_async_engine(url, **options)
+
+
+async_engine = create_async_db_engine(DATABASE_URL, POOL_SETTINGS)
+logger.info(f"Async database engine created with {async_engine.url.drivername}")
+
+# Objects stay usable after commit, as sessions are closed right after the update
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
@@ -2,11 +2,14 @@ import csv
 import logging
 
 import os
+from pathlib import Path
 
 from dotenv import find_dotenv, load_dotenv
+from omegaconf import OmegaConf
 from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.engine import Engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import NullPool
+from sqlalchemy.pool import NullPool, QueuePool
 
 from ..auth.models import Base
 
@@ -35,14 +38,58 @@ else:
     # Construct the database URL for PostgreSQL
     DATABASE_URL = f"postgresql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}?sslmode=require"
 
-# Replace with a unified approach:
-engine = create_engine(
-    DATABASE_URL,
-    connect_args={"connect_timeout": 5, "application_name": "events-bot"}
-    if "postgresql" in DATABASE_URL
-    else {},
-    poolclass=NullPool if "postgresql" in DATABASE_URL else None,
-    echo=False,
+# Load pool configuration, environment variables take precedence over config.yaml
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+pool_config = config.app.database.pool
+
+
+def _pool_setting(env_name: str, default):
+    """Read a pool setting from the environment, falling back to config.yaml."""
+    value = os.getenv(env_name)
+    return value if value else default
+
+
+POOL_SETTINGS = {
+    "mode": str(_pool_setting("DB_POOL_MODE", pool_config.mode)).lower(),
+    "size": int(_pool_setting("DB_POOL_SIZE", pool_config.size)),
+    "max_overflow": int(_pool_setting("DB_POOL_MAX_OVERFLOW", pool_config.max_overflow)),
+    "timeout_seconds": int(_pool_setting("DB_POOL_TIMEOUT", pool_config.timeout_seconds)),
+    "recycle_seconds": int(_pool_setting("DB_POOL_RECYCLE", pool_config.recycle_seconds)),
+    "pre_ping": str(_pool_setting("DB_POOL_PRE_PING", pool_config.pre_ping)).lower() in ("1", "true", "yes"),
+    "warmup_connections": int(_pool_setting("DB_POOL_WARMUP", pool_config.warmup_connections)),
+}
+
+
+def create_db_engine(database_url: str, pool_settings: dict) -> Engine:
+    """Create an engine for the given URL using the "queue" or "null" pool mode."""
+    is_postgres = "postgresql" in database_url
+    options = {
+        "connect_args": {"connect_timeout": 5, "application_name": "events-bot"}
+        if is_postgres
+        else {},
+        "echo": False,
+    }
+    if pool_settings["mode"] == "null":
+        options["poolclass"] = NullPool
+    elif pool_settings["mode"] == "queue":
+        options.update(
+            poolclass=QueuePool,
+            pool_size=pool_settings["size"],
+            max_overflow=pool_settings["max_overflow"],
+            pool_timeout=pool_settings["timeout_seconds"],
+            pool_recycle=pool_settings["recycle_seconds"],
+            pool_pre_ping=pool_settings["pre_ping"],
+        )
+    else:
+        raise ValueError(f"Unknown database pool mode: {pool_settings['mode']}")
+    return create_engine(database_url, **options)
+
+
+engine = create_db_engine(DATABASE_URL, POOL_SETTINGS)
+logger.info(
+    f"Database engine created with {POOL_SETTINGS['mode']} pool "
+    f"(size: {POOL_SETTINGS['size']}, max overflow: {POOL_SETTINGS['max_overflow']})"
 )
 
 # a factory that produces new Session objects (database sessions).
@@ -58,8 +105,27 @@ def get_db():
         db.close()
 
 
+def warm_up_pool(connections: int = POOL_SETTINGS["warmup_connections"]):
+    """Open connections ahead of the first updates so they skip the TCP+TLS+auth handshake."""
+    if POOL_SETTINGS["mode"] != "queue" or connections <= 0:
+        return
+    checked_out = []
+    try:
+        for _ in range(connections):
+            connection = engine.connect()
+            connection.execute(text("SELECT 1"))
+            checked_out.append(connection)
+    except Exception as e:
+        logger.warning(f"Database pool warm-up stopped early: {str(e)}")
+    finally:
+        # Returning the connections puts them back into the pool
+        for connection in checked_out:
+            connection.close()
+    logger.info(f"Database pool warmed up with {len(checked_out)} connections")
+
+
 def create_tables():
-    """Create tables in the database."""
+    """Create missing tables in the database, and the columns and indexes missing from existing ones."""
     Base.metadata.create_all(engine)
     logger.info("Tables created")
 
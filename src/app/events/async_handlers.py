@@ -0,0 +1,122 @@
+import logging
+from typing import Any, Dict
+
+from telebot import types
+from telebot.async_telebot import AsyncTeleBot
+
+from .follow_ups import schedule_follow_ups_async
+from .markup import EVENTS_PAGE_PREFIX
+from .replies import (
+    captured_image_file_id,
+    event_details_id,
+    event_details_reply,
+    event_follow_ups,
+    events_list_reply,
+    events_page_cursor,
+    events_page_reply,
+    search_config,
+    search_offset,
+    search_reply,
+    send_reply,
+)
+from .service import (
+    read_event_render_async,
+    read_events_list_keyboard_async,
+    search_events_async,
+    set_event_image_file_id_async,
+)
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+def register_async_handlers(bot: AsyncTeleBot) -> None:
+    """
+    Register the native async versions of the events handlers.
+
+    The replies are shared with the sync bot, see `app.events.replies`. The
+    session is committed before answering to return its connection to the pool
+    instead of holding it while Telegram answers.
+
+    Args:
+        bot: The async Telegram bot instance to register handlers for
+    """
+    logger.info("Registering async event handlers")
+
+    @bot.message_handler(commands=["start"])
+    async def events_list(message: types.Message, data: Dict[str, Any]) -> None:
+        """
+        Handle the events list command.
+
+        Args:
+            message: The command message
+            data: The data dictionary containing user and async database session
+        """
+        user = data["user"]
+        keyboard = await read_events_list_keyboard_async(data["db_session"], user.lang)
+        await data["db_session"].commit()
+        await send_reply(bot, events_list_reply(user, keyboard))
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith(EVENTS_PAGE_PREFIX))
+    async def events_page(call: types.CallbackQuery, data: Dict[str, Any]) -> None:
+        """
+        Show another page of the events list in place of the current one.
+
+        Args:
+            call: The callback query with the cursor of the page embedded in data
+            data: The data dictionary containing user and async database session
+        """
+        user = data["user"]
+        try:
+            keyboard = await read_events_list_keyboard_async(
+                data["db_session"], user.lang, events_page_cursor(call)
+            )
+        except ValueError as e:
+            logger.warning(f"Ignoring events page request of user {user.id}: {e}")
+            return
+        await data["db_session"].commit()
+
+        await send_reply(bot, events_page_reply(user, call, keyboard))
+
+    @bot.inline_handler(func=lambda inline_query: True)
+    async def search_events_inline(inline_query: types.InlineQuery, data: Dict[str, Any]) -> None:
+        """
+        Answer `@bot <words>` with the events matching the words, page by page.
+
+        Args:
+            inline_query: The inline query, its offset is the number of results already shown
+            data: The data dictionary containing the async database session
+        """
+        offset = search_offset(inline_query)
+        results = await search_events_async(
+            data["db_session"], inline_query.query, offset, search_config.page_size
+        )
+        await data["db_session"].commit()
+        await send_reply(bot, search_reply(inline_query, offset, results))
+
+    @bot.callback_query_handler(func=lambda call: call.data.startswith("event_"))
+    async def event_details(call: types.CallbackQuery, data: Dict[str, Any]) -> None:
+        """
+        Show details of a specific event.
+
+        Args:
+            call: The callback query with event ID embedded in data
+            data: The data dictionary containing user and async database session
+        """
+        user = data["user"]
+        db_session = data["db_session"]
+
+        # The details message is only rendered after the event changed
+        event_id = event_details_id(call)
+        render = await read_event_render_async(db_session, event_id, user.lang)
+        await db_session.commit()
+        sent = await send_reply(bot, event_details_reply(user, call, render))
+        if render is None:
+            return
+
+        file_id = captured_image_file_id(render, sent)
+        if file_id:
+            await set_event_image_file_id_async(db_session, event_id, render.photo, file_id)
+
+        # Stored in the database, repeated clicks re-arm the same messages
+        await schedule_follow_ups_async(db_session, user.id, event_follow_ups(user.lang))
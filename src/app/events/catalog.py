@@ -0,0 +1,153 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from omegaconf import OmegaConf
+from telebot.types import InlineKeyboardButton
+
+from .markup import create_events_list_markup
+from .pagination import EventPage
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+
+
+class CatalogEvent(NamedTuple):
+    """Fields of an event shown in the events list, detached from any session"""
+
+    id: int
+    name: str
+
+
+def build_events_list_keyboard(lang: str, page: EventPage) -> str:
+    """Build the keyboard of a page of the events list with the feedback button, serialized for the Bot API"""
+    markup = create_events_list_markup(lang, page.events, page.prev_cursor, page.next_cursor)
+    # Add "Обратная связь" button
+    markup.add(InlineKeyboardButton("Обратная связь", callback_data="contact"))
+    return markup.to_json()
+
+
+class EventCatalog:
+    """
+    Pages of the events list and their keyboards serialized per language.
+
+    A page is loaded from the database on first use, and every page is dropped
+    whenever an event is created or removed. The time to live bounds how long
+    another process of the bot can show a stale list.
+    """
+
+    def __init__(self, ttl_seconds: float, page_size: int, max_pages: int) -> None:
+        """
+        Args:
+            ttl_seconds: Time after which a page is reloaded from the database.
+            page_size: Number of events per page.
+            max_pages: Maximum number of cached pages, least recently used ones are evicted.
+        """
+        self.ttl_seconds = ttl_seconds
+        self.page_size = page_size
+        self.max_pages = max_pages
+        # Cursor of the page, None for the first one -> (load time, page, keyboard per language)
+        self._pages: OrderedDict[Optional[str], tuple[float, EventPage, dict[str, str]]] = OrderedDict()
+        # Incremented by every invalidation, a load started before one is discarded
+        self._version = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    @property
+    def version(self) -> int:
+        """Version to pass to `load`, read before the events are queried"""
+        with self._lock:
+            return self._version
+
+    def _entry(self, cursor: Optional[str]):
+        """Return the fresh cache entry of a page and count the lookup, the lock must be held"""
+        entry = self._pages.get(cursor)
+        if entry is not None and time.monotonic() - entry[0] > self.ttl_seconds:
+            del self._pages[cursor]
+            entry = None
+        if entry is None:
+            self._misses += 1
+            return None
+        self._pages.move_to_end(cursor)
+        self._hits += 1
+        return entry
+
+    def page(self, cursor: Optional[str] = None) -> Optional[EventPage]:
+        """Return the cached page at `cursor`, None if it must be loaded"""
+        with self._lock:
+            entry = self._entry(cursor)
+            return entry[1] if entry is not None else None
+
+    def keyboard(self, lang: str, cursor: Optional[str] = None) -> Optional[str]:
+        """Return the serialized keyboard of the page at `cursor` for `lang`, None if the page must be loaded"""
+        with self._lock:
+            entry = self._entry(cursor)
+            if entry is None:
+                return None
+
+            _, page, keyboards = entry
+            keyboard = keyboards.get(lang)
+            if keyboard is None:
+                keyboard = build_events_list_keyboard(lang, page)
+                keyboards[lang] = keyboard
+            return keyboard
+
+    def load(self, cursor: Optional[str], page: EventPage, version: int) -> EventPage:
+        """
+        Cache a page read from the database.
+
+        Args:
+            cursor: The cursor the page was read at, None for the first page.
+            page: The page read from the database.
+            version: The catalog version read before the page was queried.
+
+        Returns:
+            The cached copy of the page.
+        """
+        page = page._replace(events=[CatalogEvent(event.id, event.name) for event in page.events])
+        with self._lock:
+            if version == self._version:
+                self._pages[cursor] = (time.monotonic(), page, {})
+                self._pages.move_to_end(cursor)
+                while len(self._pages) > self.max_pages:
+                    self._pages.popitem(last=False)
+                    self._evictions += 1
+        return page
+
+    def invalidate(self) -> None:
+        """Drop the cached pages after an event was created or removed"""
+        with self._lock:
+            self._version += 1
+            self._pages.clear()
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        """Return the number of cached pages, hit, miss, eviction and invalidation counters"""
+        with self._lock:
+            return {
+                "pages": len(self._pages),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+event_catalog = EventCatalog(
+    ttl_seconds=config.app.event_catalog.ttl_seconds,
+    page_size=config.app.event_catalog.page_size,
+    max_pages=config.app.event_catalog.max_pages,
+)
@@ -0,0 +1,300 @@
+import logging
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from omegaconf import OmegaConf
+from sqlalchemy import delete, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+from ..database.core import SessionLocal
+from ..gateway import send_gateway
+from .models import FollowUp
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+
+_insert_constructs = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def build_schedule_statement(dialect_name: str):
+    """
+    Build the upsert storing a follow-up, or re-arming the pending one with the same dedup key.
+
+    Args:
+        dialect_name: The database dialect, "postgresql" or "sqlite".
+    """
+    if dialect_name not in _insert_constructs:
+        raise ValueError(f"Follow-ups are not supported for dialect {dialect_name}")
+    statement = _insert_constructs[dialect_name](FollowUp)
+    # A message being sent keeps its row, the new claim-free row is sent again later
+    return statement.on_conflict_do_update(
+        index_elements=[FollowUp.dedup_key],
+        set_={
+            "text": statement.excluded.text,
+            "due_at": statement.excluded.due_at,
+            "claim_token": None,
+            "claimed_until": None,
+            "attempts": 0,
+        },
+    )
+
+
+def _follow_up_rows(user_id: int, follow_ups: list, now: Optional[datetime]) -> list[dict]:
+    now = now or datetime.now()
+    return [
+        {
+            "user_id": user_id,
+            "template": template,
+            "dedup_key": f"{user_id}:{template}",
+            "text": text,
+            "due_at": now + timedelta(seconds=delay_seconds),
+            "attempts": 0,
+        }
+        for template, text, delay_seconds in follow_ups
+    ]
+
+
+def schedule_follow_ups(
+    db_session: Session, user_id: int, follow_ups: list, now: Optional[datetime] = None
+) -> None:
+    """
+    Store follow-up messages for a user, one pending row per (user, template).
+
+    Args:
+        user_id: The user to send the messages to.
+        follow_ups: (template, text, delay_seconds) tuples.
+        now: The time the delays are counted from.
+    """
+    statement = build_schedule_statement(db_session.get_bind().dialect.name)
+    try:
+        db_session.execute(statement, _follow_up_rows(user_id, follow_ups, now))
+        db_session.commit()
+    except Exception as e:
+        db_session.rollback()
+        logger.error(f"Error scheduling follow-ups for user {user_id}: {e}")
+        raise
+
+
+async def schedule_follow_ups_async(
+    db_session: AsyncSession, user_id: int, follow_ups: list, now: Optional[datetime] = None
+) -> None:
+    """Store follow-up messages for a user on an async session, see `schedule_follow_ups`"""
+    statement = build_schedule_statement(db_session.bind.dialect.name)
+    try:
+        await db_session.execute(statement, _follow_up_rows(user_id, follow_ups, now))
+        await db_session.commit()
+    except Exception as e:
+        await db_session.rollback()
+        logger.error(f"Error scheduling follow-ups for user {user_id}: {e}")
+        raise
+
+
+def claim_due_follow_ups(
+    db_session: Session, batch_size: int, lease_seconds: float, now: Optional[datetime] = None
+) -> list[FollowUp]:
+    """
+    Claim up to `batch_size` due follow-ups for `lease_seconds`.
+
+    Rows locked by another dispatcher are skipped on PostgreSQL. SQLite runs
+    the claim as a single write transaction, which gives the same guarantee.
+
+    Returns:
+        The claimed follow-ups, sharing one claim token.
+    """
+    now = now or datetime.now()
+    due = (
+        select(FollowUp.id)
+        .where(
+            FollowUp.due_at <= now,
+            or_(FollowUp.claimed_until.is_(None), FollowUp.claimed_until < now),
+        )
+        .order_by(FollowUp.due_at)
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+    )
+    # The claimed rows are read by the send workers after the commit
+    db_session.expire_on_commit = False
+    try:
+        claimed = db_session.scalars(
+            update(FollowUp)
+            .where(FollowUp.id.in_(due))
+            .values(
+                claim_token=uuid.uuid4().hex,
+                claimed_until=now + timedelta(seconds=lease_seconds),
+                attempts=FollowUp.attempts + 1,
+            )
+            .returning(FollowUp),
+            execution_options={"synchronize_session": False},
+        ).all()
+        db_session.commit()
+    except Exception:
+        db_session.rollback()
+        raise
+    return claimed
+
+
+class FollowUpDispatcher:
+    """Polls the follow-up table and sends the due messages
+
+    Sent rows are deleted. Failed rows are released with a delay until they
+    reach `max_attempts`, and rows of users who blocked the bot are dropped.
+    A dispatcher that dies mid-batch leaves leased rows, which are claimed
+    again once the lease expires.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        poll_interval_seconds: float = 1,
+        batch_size: int = 100,
+        lease_seconds: float = 60,
+        max_attempts: int = 3,
+        retry_delay_seconds: float = 60,
+        send_workers: int = 4,
+    ) -> None:
+        """
+        Args:
+            session_factory: Factory producing database sessions.
+            poll_interval_seconds: Time between two polls when no follow-up is due.
+            batch_size: Maximum number of follow-ups claimed at once.
+            lease_seconds: Time a claimed follow-up is reserved for this dispatcher.
+            max_attempts: Attempts before a failing follow-up is dropped.
+            retry_delay_seconds: Delay before a failed follow-up is retried.
+            send_workers: Number of threads sending a claimed batch.
+        """
+        self.session_factory = session_factory
+        self.poll_interval_seconds = poll_interval_seconds
+        self.batch_size = batch_size
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.retry_delay_seconds = retry_delay_seconds
+        self.send_workers = send_workers
+        self.bot: Optional[TeleBot] = None
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._stats = {"sent": 0, "failed": 0, "dropped": 0, "polls": 0}
+
+    def start(self, bot: TeleBot) -> None:
+        """Start polling, sending the follow-ups with `bot`"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.bot = bot
+        self._stop_event.clear()
+        self._executor = ThreadPoolExecutor(self.send_workers, thread_name_prefix="follow-up-send")
+        self._thread = threading.Thread(target=self._run, name="follow-up-dispatcher", daemon=True)
+        self._thread.start()
+        logger.info("Follow-up dispatcher started")
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """Stop polling, the follow-ups still pending are sent after the next start"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        logger.info(f"Follow-up dispatcher stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        """Return sent, failed, dropped and poll counters"""
+        with self._lock:
+            return dict(self._stats)
+
+    def dispatch(self, now: Optional[datetime] = None) -> int:
+        """Claim and send one batch of due follow-ups, return how many were claimed"""
+        session = self.session_factory()
+        try:
+            claimed = claim_due_follow_ups(session, self.batch_size, self.lease_seconds, now)
+            self._count("polls")
+            if not claimed:
+                return 0
+
+            # Sent in the calling thread when the dispatcher is not running
+            send_all = self._executor.map if self._executor is not None else map
+            results = list(send_all(self._send, claimed))
+            sent = [follow_up.id for follow_up, result in zip(claimed, results, strict=True) if result != "failed"]
+            failed = [follow_up for follow_up, result in zip(claimed, results, strict=True) if result == "failed"]
+            claim_token = claimed[0].claim_token
+
+            # Only rows still holding this claim, a re-armed row is sent again later
+            if sent:
+                session.execute(
+                    delete(FollowUp).where(FollowUp.id.in_(sent), FollowUp.claim_token == claim_token)
+                )
+            retry_at = (now or datetime.now()) + timedelta(seconds=self.retry_delay_seconds)
+            for follow_up in failed:
+                if follow_up.attempts >= self.max_attempts:
+                    statement = delete(FollowUp)
+                    self._count("dropped")
+                else:
+                    statement = update(FollowUp).values(claim_token=None, claimed_until=None, due_at=retry_at)
+                session.execute(
+                    statement.where(FollowUp.id == follow_up.id, FollowUp.claim_token == claim_token)
+                )
+            session.commit()
+            return len(claimed)
+        except Exception as e:
+            session.rollback()
+            logger.error(f"Error dispatching follow-ups: {e}")
+            return 0
+        finally:
+            session.close()
+
+    def _send(self, follow_up: FollowUp) -> str:
+        try:
+            # Follow-ups are not replies, interactive traffic goes first
+            with send_gateway.broadcast():
+                self.bot.send_message(follow_up.user_id, follow_up.text)
+            self._count("sent")
+            return "sent"
+        except ApiTelegramException as e:
+            if e.error_code == 403:
+                # The user blocked the bot, retrying would fail the same way
+                self._count("dropped")
+                return "dropped"
+            self._count("failed")
+            logger.error(f"Failed to send follow-up {follow_up.template} to user {follow_up.user_id}: {e}")
+            return "failed"
+        except Exception as e:
+            self._count("failed")
+            logger.error(f"Failed to send follow-up {follow_up.template} to user {follow_up.user_id}: {e}")
+            return "failed"
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            # Drain full batches right away, wait only when the backlog is empty
+            if self.dispatch() < self.batch_size:
+                self._stop_event.wait(self.poll_interval_seconds)
+
+
+follow_up_dispatcher = FollowUpDispatcher(
+    SessionLocal,
+    poll_interval_seconds=config.app.follow_ups.poll_interval_seconds,
+    batch_size=config.app.follow_ups.batch_size,
+    lease_seconds=config.app.follow_ups.lease_seconds,
+    max_attempts=config.app.follow_ups.max_attempts,
+    retry_delay_seconds=config.app.follow_ups.retry_delay_seconds,
+    send_workers=config.app.follow_ups.send_workers,
+)
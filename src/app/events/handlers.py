@@ -1,27 +1,39 @@
 import logging
-from pathlib import Path
 from typing import Any, Dict
 
-from omegaconf import OmegaConf
 from telebot import TeleBot, types
-from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, WebAppInfo
-from .markup import create_events_list_markup
-from .service import read_event, read_events, remove_event
-from .scheduler import schedule_message
+from .markup import EVENTS_PAGE_PREFIX
+from .replies import (
+    captured_image_file_id,
+    event_details_id,
+    event_details_reply,
+    event_follow_ups,
+    events_list_reply,
+    events_page_cursor,
+    events_page_reply,
+    search_offset,
+    search_config,
+    search_reply,
+    send_reply,
+)
+from .service import (
+    read_event_render,
+    read_events_list_keyboard,
+    search_events,
+    set_event_image_file_id,
+)
+from .follow_ups import schedule_follow_ups
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
-# Load configuration
-CURRENT_DIR = Path(__file__).parent
-config = OmegaConf.load(CURRENT_DIR / "config.yaml")
-strings = config.strings
-
 
 def register_handlers(bot: TeleBot) -> None:
     """
     Register all event-related handlers for the bot.
 
+    The replies are shared with the async bot, see `app.events.replies`.
+
     Args:
         bot: The Telegram bot instance to register handlers for
     """
@@ -33,22 +45,43 @@ def register_handlers(bot: TeleBot) -> None:
         Handle the events list command.
 
         Args:
-            call: The callback query
+            message: The command message
             data: The data dictionary containing user and state information
         """
         user = data["user"]
-        db_session = data["db_session"]
-        events = read_events(db_session)
+        keyboard = read_events_list_keyboard(data["db_session"], user.lang)
+        send_reply(bot, events_list_reply(user, keyboard))
 
-        markup = create_events_list_markup(user.lang, events)
-        # Add "Обратная связь" button
-        markup.add(InlineKeyboardButton("Обратная связь", callback_data="contact"))
+    @bot.callback_query_handler(func=lambda call: call.data.startswith(EVENTS_PAGE_PREFIX))
+    def events_page(call: types.CallbackQuery, data: Dict[str, Any]) -> None:
+        """
+        Show another page of the events list in place of the current one.
 
-        bot.send_message(
-            user.id,
-            text=strings[user.lang].events_list,
-            reply_markup=markup,
-        )
+        Args:
+            call: The callback query with the cursor of the page embedded in data
+            data: The data dictionary containing user and database session
+        """
+        user = data["user"]
+        try:
+            keyboard = read_events_list_keyboard(data["db_session"], user.lang, events_page_cursor(call))
+        except ValueError as e:
+            logger.warning(f"Ignoring events page request of user {user.id}: {e}")
+            return
+
+        send_reply(bot, events_page_reply(user, call, keyboard))
+
+    @bot.inline_handler(func=lambda inline_query: True)
+    def search_events_inline(inline_query: types.InlineQuery, data: Dict[str, Any]) -> None:
+        """
+        Answer `@bot <words>` with the events matching the words, page by page.
+
+        Args:
+            inline_query: The inline query, its offset is the number of results already shown
+            data: The data dictionary containing the database session
+        """
+        offset = search_offset(inline_query)
+        results = search_events(data["db_session"], inline_query.query, offset, search_config.page_size)
+        send_reply(bot, search_reply(inline_query, offset, results))
 
     @bot.callback_query_handler(func=lambda call: call.data.startswith("event_"))
     def event_details(call: types.CallbackQuery, data: Dict[str, Any]) -> None:
@@ -62,63 +95,16 @@ def register_handlers(bot: TeleBot) -> None:
         user = data["user"]
         db_session = data["db_session"]
 
-        # Extract event ID and fetch the event
-        event_id = int(call.data.split("_")[1])
-        event = read_event(db_session, event_id)
-
-        if not event:
-            bot.send_message(
-                user.id,
-                strings[user.lang].event_not_found,
-            )
+        # The details message is only rendered after the event changed
+        event_id = event_details_id(call)
+        render = read_event_render(db_session, event_id, user.lang)
+        sent = send_reply(bot, event_details_reply(user, call, render))
+        if render is None:
             return
 
-        # Format event details message
-        message_text = strings[user.lang].event_details.format(
-            name=event.name,
-            description=event.description
-        )
-        
-        print("event.qtickets_link:", event.qtickets_link)
-        
-        inline_keyboard_markup = InlineKeyboardMarkup()
-        inline_keyboard_markup.row(
-            InlineKeyboardButton(
-                strings[user.lang].sign_up,
-                url=event.qtickets_link
-            )
-        )
-
-        # If event has an image, send it first, then send details as a message
-        if event.image:
-            bot.send_photo(
-                user.id,
-                event.image,
-                caption=message_text,
-                parse_mode="Markdown",
-                reply_markup=inline_keyboard_markup,
-            )
-        else:
-            bot.edit_message_text(
-                chat_id=user.id,
-                message_id=call.message.message_id,
-                text=message_text,
-                parse_mode="Markdown",
-                reply_markup=inline_keyboard_markup,
-            )
-
-        # Schedule message about email confirmation in 90 seconds
-        schedule_message(
-            bot,
-            90,
-            user.id,
-            strings[user.lang].email_confirmation
-        )
-
-        # Schedule message about checking spam in 5 minutes (300 seconds)
-        schedule_message(
-            bot,
-            300,
-            user.id,
-            strings[user.lang].check_spam
-        )
+        file_id = captured_image_file_id(render, sent)
+        if file_id:
+            set_event_image_file_id(db_session, event_id, render.photo, file_id)
+
+        # Stored in the database, repeated clicks re-arm the same messages
+        schedule_follow_ups(db_session, user.id, event_follow_ups(user.lang))
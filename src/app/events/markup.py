@@ -1,5 +1,14 @@
 import logging
-from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+from pathlib import Path
+from typing import Optional
+
+from omegaconf import OmegaConf
+from telebot.types import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+)
 
 from .models import Event
 
@@ -9,13 +18,65 @@ logging.basicConfig(
     level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 )
 
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR / "config.yaml")
+strings = config.strings
+
+# Callback data of the page buttons, followed by the cursor of the page
+EVENTS_PAGE_PREFIX = "events_page:"
 
-def create_events_list_markup(lang: str, events: list[Event]) -> InlineKeyboardMarkup:
-    """Create the events menu markup"""
+
+def create_events_list_markup(
+    lang: str,
+    events: list[Event],
+    prev_cursor: Optional[str] = None,
+    next_cursor: Optional[str] = None,
+) -> InlineKeyboardMarkup:
+    """Create the events menu markup, with buttons to the neighbouring pages"""
     markup = InlineKeyboardMarkup()
     for event in events:
         markup.add(
             InlineKeyboardButton(event.name, callback_data=f"event_{event.id}")
         )
+    page_buttons = create_page_buttons(lang, EVENTS_PAGE_PREFIX, prev_cursor, next_cursor)
+    if page_buttons:
+        markup.row(*page_buttons)
     # markup.add(InlineKeyboardButton("Обратная связь", callback_data="feedback"))
     return markup
+
+
+def create_page_buttons(
+    lang: str, prefix: str, prev_cursor: Optional[str], next_cursor: Optional[str]
+) -> list[InlineKeyboardButton]:
+    """Create the previous and next page buttons of a paged list"""
+    buttons = []
+    if prev_cursor:
+        buttons.append(
+            InlineKeyboardButton(strings[lang].previous_page, callback_data=f"{prefix}{prev_cursor}")
+        )
+    if next_cursor:
+        buttons.append(
+            InlineKeyboardButton(strings[lang].next_page, callback_data=f"{prefix}{next_cursor}")
+        )
+    return buttons
+
+
+def create_event_article(lang: str, event: Event) -> InlineQueryResultArticle:
+    """Create the inline result sharing the details of an event"""
+    message_text = strings[lang].event_details.format(
+        name=event.name,
+        description=event.description or "",
+        qtickets_link=event.qtickets_link or "",
+    )
+    markup = None
+    if event.qtickets_link:
+        markup = InlineKeyboardMarkup()
+        markup.row(InlineKeyboardButton(strings[lang].sign_up, url=event.qtickets_link))
+    return InlineQueryResultArticle(
+        id=str(event.id),
+        title=event.name,
+        description=(event.description or "")[:100],
+        input_message_content=InputTextMessageContent(message_text, parse_mode="Markdown"),
+        reply_markup=markup,
+    )
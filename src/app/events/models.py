@@ -1,4 +1,4 @@
-from sqlalchemy import Column, ForeignKey, Integer, String, Table, DateTime
+from sqlalchemy import BigInteger, Column, ForeignKey, Index, Integer, String, Table, DateTime
 from sqlalchemy.orm import relationship
 
 from ..models import Base
@@ -14,11 +14,15 @@ class Event(Base):
     """Event model"""
 
     __tablename__ = "events"
+    # Keyset pagination of the events list, in datetime then id order
+    __table_args__ = (Index("ix_events_datetime_id", "datetime", "id"),)
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
     description = Column(String, nullable=True)
-    image = Column(String, nullable=True)
+    image = Column(String, nullable=True)  # Telegram file id or URL
+    # Telegram file id of an image given as a URL, captured when it is first sent
+    image_file_id = Column(String, nullable=True)
     qtickets_link = Column(String, nullable=True)
     datetime = Column(DateTime, nullable=True)
 
@@ -28,3 +32,21 @@ class Event(Base):
     #     back_populates="events",
     #     lazy="dynamic",
     # )
+
+
+class FollowUp(Base):
+    """Pending delayed message, removed once it is sent"""
+
+    __tablename__ = "follow_ups"
+
+    id = Column(Integer, primary_key=True)
+    user_id = Column(BigInteger, nullable=False)
+    template = Column(String, nullable=False)
+    # "<user_id>:<template>", repeated schedules of a template coalesce into one row
+    dedup_key = Column(String, nullable=False, unique=True)
+    text = Column(String, nullable=False)
+    due_at = Column(DateTime, nullable=False, index=True)
+    # Set while a dispatcher sends the message, an expired lease can be claimed again
+    claim_token = Column(String, nullable=True)
+    claimed_until = Column(DateTime, nullable=True)
+    attempts = Column(Integer, nullable=False, default=0)
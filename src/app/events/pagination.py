@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select, tuple_
+
+from .models import Event
+
+EPOCH = datetime(1970, 1, 1)
+FORWARD = "n"
+BACKWARD = "p"
+
+
+class EventPage(NamedTuple):
+    """Events of a page in display order, with the cursors of the neighbouring pages"""
+
+    events: list
+    prev_cursor: Optional[str]
+    next_cursor: Optional[str]
+
+
+def _base36(number: int) -> str:
+    digits = "0123456789abcdefghijklmnopqrstuvwxyz"
+    sign = "-" if number < 0 else ""
+    number = abs(number)
+    encoded = ""
+    while True:
+        number, digit = divmod(number, 36)
+        encoded = digits[digit] + encoded
+        if not number:
+            return sign + encoded
+
+
+def encode_cursor(direction: str, event_datetime: Optional[datetime], event_id: int) -> str:
+    """
+    Encode the position of an event for callback data, e.g. `n1a2b3c4d5.2s`.
+
+    The direction is followed by the event datetime in microseconds since the
+    epoch, empty for events without a date, and the event id, both in base 36.
+    """
+    timestamp = ""
+    if event_datetime is not None:
+        timestamp = _base36((event_datetime - EPOCH) // timedelta(microseconds=1))
+    return f"{direction}{timestamp}.{_base36(event_id)}"
+
+
+def decode_cursor(cursor: str) -> tuple[str, Optional[datetime], int]:
+    """
+    Decode a cursor built by `encode_cursor`.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    direction, (timestamp, separator, event_id) = cursor[:1], cursor[1:].partition(".")
+    if direction not in (FORWARD, BACKWARD) or not separator:
+        raise ValueError(f"Invalid events cursor: {cursor}")
+    try:
+        event_datetime = EPOCH + timedelta(microseconds=int(timestamp, 36)) if timestamp else None
+    except OverflowError:
+        raise ValueError(f"Invalid events cursor: {cursor}") from None
+    return direction, event_datetime, int(event_id, 36)
+
+
+def page_queries(cursor: Optional[str]) -> tuple[str, list]:
+    """
+    Build the keyset queries reading the page after or before `cursor`.
+
+    Events are ordered by datetime then id, the ones without a date last. Dated
+    and undated events are read by separate range scans of the (datetime, id)
+    index, run in order until the page is full, so any page costs the same
+    whatever its position in the catalog.
+
+    Returns:
+        The direction of the page and its queries, reading events in that direction.
+    """
+    direction, event_datetime, event_id = FORWARD, None, None
+    if cursor is not None:
+        direction, event_datetime, event_id = decode_cursor(cursor)
+    dated = select(Event).where(Event.datetime.is_not(None))
+    undated = select(Event).where(Event.datetime.is_(None))
+    position = tuple_(Event.datetime, Event.id)
+
+    if direction == FORWARD:
+        dated = dated.order_by(Event.datetime, Event.id)
+        undated = undated.order_by(Event.id)
+        if event_id is None:
+            queries = [dated, undated]
+        elif event_datetime is not None:
+            queries = [dated.where(position > (event_datetime, event_id)), undated]
+        else:
+            queries = [undated.where(Event.id > event_id)]
+    else:
+        dated = dated.order_by(Event.datetime.desc(), Event.id.desc())
+        undated = undated.order_by(Event.id.desc())
+        if event_datetime is not None:
+            queries = [dated.where(position < (event_datetime, event_id))]
+        else:
+            queries = [undated.where(Event.id < event_id), dated]
+    return direction, queries
+
+
+def build_page(cursor: Optional[str], direction: str, events: list, limit: int) -> EventPage:
+    """
+    Build a page from at most `limit + 1` events read in `direction`.
+
+    The extra event only tells whether there is a page further in that direction.
+    """
+    has_more = len(events) > limit
+    events = events[:limit]
+    if direction == BACKWARD:
+        events.reverse()
+    if not events:
+        if cursor is None:
+            return EventPage([], None, None)
+        # Every event of the page was removed, offer the way back
+        _, event_datetime, event_id = decode_cursor(cursor)
+        if direction == FORWARD:
+            return EventPage([], encode_cursor(BACKWARD, event_datetime, event_id), None)
+        return EventPage([], None, encode_cursor(FORWARD, event_datetime, event_id))
+
+    first = encode_cursor(BACKWARD, events[0].datetime, events[0].id)
+    last = encode_cursor(FORWARD, events[-1].datetime, events[-1].id)
+    if direction == FORWARD:
+        return EventPage(events, first if cursor is not None else None, last if has_more else None)
+    return EventPage(events, first if has_more else None, last)
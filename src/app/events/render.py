@@ -0,0 +1,141 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from omegaconf import OmegaConf
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+
+from .models import Event
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+strings = OmegaConf.load(CURRENT_DIR / "config.yaml").strings
+
+
+class EventRender(NamedTuple):
+    """Event details message, ready to be sent"""
+
+    text: str
+    parse_mode: str
+    reply_markup: Optional[str]  # serialized for the Bot API
+    photo: Optional[str]  # file id or URL, sent with the text as caption when set
+
+
+def render_event(lang: str, event: Event) -> EventRender:
+    """Format the details message of an event in a language"""
+    text = strings[lang].event_details.format(
+        name=event.name,
+        description=event.description or "",
+        qtickets_link=event.qtickets_link or "",
+    )
+    reply_markup = None
+    # A button without a link is refused by Telegram
+    if event.qtickets_link:
+        markup = InlineKeyboardMarkup()
+        markup.row(InlineKeyboardButton(strings[lang].sign_up, url=event.qtickets_link))
+        reply_markup = markup.to_json()
+    return EventRender(text, "Markdown", reply_markup, event.image_file_id or event.image)
+
+
+def is_image_url(image: Optional[str]) -> bool:
+    """Whether an event image is a URL Telegram has to download, instead of a file id"""
+    return bool(image) and image.startswith(("http://", "https://"))
+
+
+def sent_photo_file_id(message) -> Optional[str]:
+    """Return the file id of the photo of a sent message, the largest size"""
+    if message is None or not message.photo:
+        return None
+    return message.photo[-1].file_id
+
+
+class RenderCache:
+    """
+    Bounded LRU cache of event details messages keyed by event, language and event version.
+
+    The version of an event is bumped whenever it changes, so renders made from
+    the previous state are neither served nor stored. The time to live bounds
+    how long another process of the bot can serve a stale render.
+    """
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        """
+        Args:
+            max_size: Maximum number of cached renders, least recently used ones are evicted.
+            ttl_seconds: Time after which an event is rendered again.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._renders: OrderedDict[tuple[int, str, int], tuple[float, EventRender]] = OrderedDict()
+        self._versions: dict[int, int] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._invalidations = 0
+
+    def version(self, event_id: int) -> int:
+        """Current version of an event, to pass to `put`"""
+        with self._lock:
+            return self._versions.get(event_id, 0)
+
+    def get(self, event_id: int, lang: str) -> Optional[EventRender]:
+        """Return the render of the current version of an event if it is fresh"""
+        with self._lock:
+            key = (event_id, lang, self._versions.get(event_id, 0))
+            entry = self._renders.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self._renders.pop(key, None)
+                self._misses += 1
+                return None
+            self._renders.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, event_id: int, lang: str, render: EventRender, version: int) -> None:
+        """Cache a render, unless the event changed since `version` was read"""
+        with self._lock:
+            if version != self._versions.get(event_id, 0):
+                return
+            key = (event_id, lang, version)
+            self._renders[key] = (time.monotonic(), render)
+            self._renders.move_to_end(key)
+            while len(self._renders) > self.max_size:
+                self._renders.popitem(last=False)
+                self._evictions += 1
+
+    def invalidate(self, event_id: int) -> None:
+        """Bump the version of an event after it changed and drop its renders"""
+        with self._lock:
+            version = self._versions.get(event_id, 0)
+            self._versions[event_id] = version + 1
+            for key in [key for key in self._renders if key[0] == event_id]:
+                del self._renders[key]
+            self._invalidations += 1
+
+    def stats(self) -> dict:
+        """Return the number of cached renders, hit, miss, eviction and invalidation counters"""
+        with self._lock:
+            return {
+                "size": len(self._renders),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "invalidations": self._invalidations,
+            }
+
+
+render_cache = RenderCache(
+    max_size=config.app.event_render_cache.max_size,
+    ttl_seconds=config.app.event_render_cache.ttl_seconds,
+)
@@ -0,0 +1,138 @@
+import logging
+from pathlib import Path
+from typing import Any, NamedTuple, Optional
+
+from omegaconf import OmegaConf
+from telebot import types
+
+from ..auth.cache import user_cache
+from .markup import EVENTS_PAGE_PREFIX, create_event_article
+from .render import EventRender, is_image_url, sent_photo_file_id
+from .search import SearchResult, next_offset
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+strings = OmegaConf.load(CURRENT_DIR / "config.yaml").strings
+search_config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml").app.inline_search
+
+
+class Reply(NamedTuple):
+    """A Bot API call answering an update, made the same way by the sync and the async bot"""
+
+    method: str
+    args: tuple
+    kwargs: dict
+
+
+def send_reply(bot, reply: Reply) -> Any:
+    """Make the call of a reply, the async bot returns a coroutine to await"""
+    return getattr(bot, reply.method)(*reply.args, **reply.kwargs)
+
+
+def events_list_reply(user, keyboard: str) -> Reply:
+    """Send the events list"""
+    return Reply(
+        "send_message",
+        (user.id,),
+        {"text": strings[user.lang].events_list, "reply_markup": keyboard},
+    )
+
+
+def events_page_cursor(call: types.CallbackQuery) -> str:
+    """Return the cursor of the events page requested by a callback query"""
+    return call.data[len(EVENTS_PAGE_PREFIX):]
+
+
+def events_page_reply(user, call: types.CallbackQuery, keyboard: str) -> Reply:
+    """Show another page of the events list in place of the current one"""
+    return Reply(
+        "edit_message_reply_markup",
+        (),
+        {"chat_id": user.id, "message_id": call.message.message_id, "reply_markup": keyboard},
+    )
+
+
+def search_offset(inline_query: types.InlineQuery) -> int:
+    """Return the number of results already shown for an inline query"""
+    return int(inline_query.offset) if inline_query.offset.isdigit() else 0
+
+
+def search_reply(inline_query: types.InlineQuery, offset: int, results: list[SearchResult]) -> Reply:
+    """Answer an inline query with a page of the events found"""
+    # Inline queries skip the user middleware, the language is known if the user wrote recently
+    cached_user = user_cache.get(inline_query.from_user.id)
+    lang = cached_user.lang if cached_user is not None and cached_user.lang in strings else "ru"
+
+    return Reply(
+        "answer_inline_query",
+        (inline_query.id, [create_event_article(lang, event) for event in results]),
+        {
+            "cache_time": search_config.cache_time,
+            # Results are written in the language of the user
+            "is_personal": True,
+            "next_offset": next_offset(
+                offset, len(results), search_config.page_size, search_config.max_results
+            ),
+        },
+    )
+
+
+def event_details_id(call: types.CallbackQuery) -> int:
+    """Return the id of the event whose details are requested by a callback query"""
+    return int(call.data.split("_")[1])
+
+
+def event_details_reply(user, call: types.CallbackQuery, render: Optional[EventRender]) -> Reply:
+    """Show the details of an event, with its image as a new message when it has one"""
+    if render is None:
+        return Reply("send_message", (user.id, strings[user.lang].event_not_found), {})
+
+    if render.photo:
+        return Reply(
+            "send_photo",
+            (user.id, render.photo),
+            {
+                "caption": render.text,
+                "parse_mode": render.parse_mode,
+                "reply_markup": render.reply_markup,
+            },
+        )
+    return Reply(
+        "edit_message_text",
+        (),
+        {
+            "chat_id": user.id,
+            "message_id": call.message.message_id,
+            "text": render.text,
+            "parse_mode": render.parse_mode,
+            "reply_markup": render.reply_markup,
+        },
+    )
+
+
+def captured_image_file_id(render: Optional[EventRender], sent) -> Optional[str]:
+    """
+    Return the file id to persist after the details of an event were sent.
+
+    Telegram downloads an image given as a URL, later sends reuse the uploaded file.
+    """
+    if render is None or not is_image_url(render.photo):
+        return None
+    return sent_photo_file_id(sent)
+
+
+def event_follow_ups(lang: str) -> list[tuple[str, str, int]]:
+    """
+    Return the follow-ups of the event details: email confirmation reminder in
+    90 seconds, spam folder reminder in 5 minutes.
+    """
+    return [
+        ("email_confirmation", strings[lang].email_confirmation, 90),
+        ("check_spam", strings[lang].check_spam, 300),
+    ]
@@ -0,0 +1,210 @@
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import NamedTuple, Optional
+
+from omegaconf import OmegaConf
+from sqlalchemy import column, or_, select, table, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.event import listens_for
+
+from ..models import Base
+from .models import Event
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+
+# Document of an event on Postgres, queries must repeat the indexed expression to use the index
+POSTGRES_DOCUMENT = (
+    "to_tsvector('simple', coalesce(events.name, '') || ' ' || coalesce(events.description, ''))"
+)
+
+SQLITE_SEARCH_INDEX = [
+    "CREATE VIRTUAL TABLE events_fts USING fts5(name, description, content='events', content_rowid='id')",
+    # External content tables are kept in sync by triggers
+    """CREATE TRIGGER events_fts_insert AFTER INSERT ON events BEGIN
+        INSERT INTO events_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    """CREATE TRIGGER events_fts_delete AFTER DELETE ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+    END""",
+    """CREATE TRIGGER events_fts_update AFTER UPDATE ON events BEGIN
+        INSERT INTO events_fts(events_fts, rowid, name, description)
+        VALUES ('delete', old.id, old.name, old.description);
+        INSERT INTO events_fts(rowid, name, description) VALUES (new.id, new.name, new.description);
+    END""",
+    "INSERT INTO events_fts(events_fts) VALUES ('rebuild')",
+]
+events_fts = table("events_fts", column("rowid"), column("rank"))
+
+
+class SearchResult(NamedTuple):
+    """Fields of an event shown in the inline results, detached from any session"""
+
+    id: int
+    name: str
+    description: Optional[str]
+    qtickets_link: Optional[str]
+
+
+@listens_for(Base.metadata, "after_create")
+def create_search_index(target, connection: Connection, **kwargs) -> None:
+    """
+    Create the full-text index of the events if it is missing.
+
+    Runs after every `create_all`, so databases created before the index get it
+    on the next one. SQLite uses an FTS5 table, Postgres a GIN index on the
+    tsvector of the events, other databases are searched without an index.
+    """
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        exists = connection.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'events_fts'")
+        ).first()
+        if exists is None:
+            for statement in SQLITE_SEARCH_INDEX:
+                connection.execute(text(statement))
+            logger.info("Events search index created")
+    elif dialect == "postgresql":
+        connection.execute(
+            text(
+                "CREATE INDEX IF NOT EXISTS ix_events_search ON events "
+                f"USING GIN (({POSTGRES_DOCUMENT.replace('events.', '')}))"
+            )
+        )
+
+
+def search_terms(query: str) -> tuple[str, ...]:
+    """Split a search query in lowercase words, the last one may be incomplete"""
+    return tuple(re.findall(r"\w+", query.lower()))[:10]
+
+
+def search_statement(dialect: str, terms: tuple[str, ...], offset: int, limit: int):
+    """
+    Build the query of the events matching every term, the best matches first.
+
+    Terms match word prefixes, so results are shown while the user is typing.
+    Without terms, every event is returned in the order of the events list.
+    """
+    statement = select(Event)
+    if not terms:
+        return statement.order_by(Event.datetime.is_(None), Event.datetime, Event.id).offset(offset).limit(limit)
+
+    if dialect == "sqlite":
+        match = " ".join(f'"{term}"*' for term in terms)
+        statement = (
+            statement.join(events_fts, events_fts.c.rowid == Event.id)
+            .where(text("events_fts MATCH :match").bindparams(match=match))
+            .order_by(events_fts.c.rank, Event.id)
+        )
+    elif dialect == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        statement = statement.where(
+            text(f"{POSTGRES_DOCUMENT} @@ to_tsquery('simple', :tsquery)").bindparams(tsquery=tsquery)
+        ).order_by(
+            text(f"ts_rank({POSTGRES_DOCUMENT}, to_tsquery('simple', :tsquery)) DESC").bindparams(
+                tsquery=tsquery
+            ),
+            Event.id,
+        )
+    else:
+        for term in terms:
+            statement = statement.where(
+                or_(Event.name.ilike(f"%{term}%"), Event.description.ilike(f"%{term}%"))
+            )
+        statement = statement.order_by(Event.id)
+    return statement.offset(offset).limit(limit)
+
+
+def next_offset(offset: int, found: int, page_size: int, max_results: int) -> str:
+    """Return the offset of the next page of results for Telegram, empty when there is none"""
+    if found < page_size or offset + found >= max_results:
+        return ""
+    return str(offset + found)
+
+
+class SearchCache:
+    """Bounded LRU cache of search results keyed by terms and offset, dropped when events change"""
+
+    def __init__(self, max_size: int, ttl_seconds: float) -> None:
+        """
+        Args:
+            max_size: Maximum number of cached result pages, least recently used ones are evicted.
+            ttl_seconds: Time after which a result page is searched again.
+        """
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._results: OrderedDict[tuple, tuple[float, list[SearchResult]]] = OrderedDict()
+        # Incremented by every invalidation, results searched before one are discarded
+        self._version = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+
+    @property
+    def version(self) -> int:
+        """Version to pass to `put`, read before the events are searched"""
+        with self._lock:
+            return self._version
+
+    def get(self, terms: tuple[str, ...], offset: int) -> Optional[list[SearchResult]]:
+        """Return the cached results if they are fresh"""
+        key = (terms, offset)
+        with self._lock:
+            entry = self._results.get(key)
+            if entry is None or time.monotonic() - entry[0] > self.ttl_seconds:
+                self._results.pop(key, None)
+                self._misses += 1
+                return None
+            self._results.move_to_end(key)
+            self._hits += 1
+            return entry[1]
+
+    def put(self, terms: tuple[str, ...], offset: int, events: list, version: int) -> list[SearchResult]:
+        """Cache the events found, unless events changed since `version` was read"""
+        results = [
+            SearchResult(event.id, event.name, event.description, event.qtickets_link) for event in events
+        ]
+        key = (terms, offset)
+        with self._lock:
+            if version == self._version:
+                self._results[key] = (time.monotonic(), results)
+                self._results.move_to_end(key)
+                while len(self._results) > self.max_size:
+                    self._results.popitem(last=False)
+                    self._evictions += 1
+        return results
+
+    def invalidate(self) -> None:
+        """Drop the cached results after an event was created or removed"""
+        with self._lock:
+            self._version += 1
+            self._results.clear()
+
+    def stats(self) -> dict:
+        """Return the number of cached result pages, hit, miss and eviction counters"""
+        with self._lock:
+            return {
+                "size": len(self._results),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+            }
+
+
+search_cache = SearchCache(
+    max_size=config.app.inline_search.cache_size,
+    ttl_seconds=config.app.inline_search.cache_ttl_seconds,
+)
@@ -1,9 +1,16 @@
 import logging
 from datetime import datetime
+from typing import Optional
 
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
+from .catalog import build_events_list_keyboard, event_catalog
 from .models import Event
+from .pagination import EventPage, build_page, page_queries
+from .render import EventRender, render_cache, render_event
+from .search import SearchResult, search_cache, search_statement, search_terms
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -17,9 +24,147 @@ def read_event(db_session: Session, event_id: int):
     return db_session.query(Event).filter(Event.id == event_id).first()
 
 
-def read_events(db_session: Session, skip: int = 0, limit: int = 10):
-    """Get all events"""
-    return db_session.query(Event).offset(skip).limit(limit).all()
+def read_event_render(db_session: Session, event_id: int, lang: str) -> Optional[EventRender]:
+    """Return the details message of an event, from the render cache when possible, None if it does not exist"""
+    render = render_cache.get(event_id, lang)
+    if render is None:
+        version = render_cache.version(event_id)
+        event = read_event(db_session, event_id)
+        if event is None:
+            return None
+        render = render_event(lang, event)
+        render_cache.put(event_id, lang, render, version)
+    return render
+
+
+def read_events_page(db_session: Session, cursor: Optional[str] = None, limit: int = 10) -> EventPage:
+    """
+    Read the page of events after or before a cursor, the first page without one.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    direction, queries = page_queries(cursor)
+    events = []
+    for query in queries:
+        events.extend(db_session.scalars(query.limit(limit + 1 - len(events))))
+        if len(events) > limit:
+            break
+    return build_page(cursor, direction, events, limit)
+
+
+def read_catalog_page(db_session: Session, cursor: Optional[str] = None) -> EventPage:
+    """Read a page of the events list, from the event catalog when it is cached"""
+    page = event_catalog.page(cursor)
+    if page is None:
+        version = event_catalog.version
+        page = event_catalog.load(
+            cursor, read_events_page(db_session, cursor, event_catalog.page_size), version
+        )
+    return page
+
+
+def read_events_list_keyboard(db_session: Session, lang: str, cursor: Optional[str] = None) -> str:
+    """
+    Return the serialized keyboard of a page of the events list.
+
+    Answered from the catalog, the database is only read after an event changed.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    keyboard = event_catalog.keyboard(lang, cursor)
+    if keyboard is None:
+        keyboard = build_events_list_keyboard(lang, read_catalog_page(db_session, cursor))
+    return keyboard
+
+
+async def read_event_async(db_session: AsyncSession, event_id: int):
+    """Get an event by ID on an async session"""
+    return await db_session.get(Event, event_id)
+
+
+async def read_event_render_async(
+    db_session: AsyncSession, event_id: int, lang: str
+) -> Optional[EventRender]:
+    """Return the details message of an event on an async session, None if it does not exist"""
+    render = render_cache.get(event_id, lang)
+    if render is None:
+        version = render_cache.version(event_id)
+        event = await read_event_async(db_session, event_id)
+        if event is None:
+            return None
+        render = render_event(lang, event)
+        render_cache.put(event_id, lang, render, version)
+    return render
+
+
+async def read_events_page_async(
+    db_session: AsyncSession, cursor: Optional[str] = None, limit: int = 10
+) -> EventPage:
+    """
+    Read the page of events after or before a cursor on an async session.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    direction, queries = page_queries(cursor)
+    events = []
+    for query in queries:
+        events.extend(await db_session.scalars(query.limit(limit + 1 - len(events))))
+        if len(events) > limit:
+            break
+    return build_page(cursor, direction, events, limit)
+
+
+async def read_catalog_page_async(db_session: AsyncSession, cursor: Optional[str] = None) -> EventPage:
+    """Read a page of the events list on an async session, from the event catalog when it is cached"""
+    page = event_catalog.page(cursor)
+    if page is None:
+        version = event_catalog.version
+        page = event_catalog.load(
+            cursor, await read_events_page_async(db_session, cursor, event_catalog.page_size), version
+        )
+    return page
+
+
+async def read_events_list_keyboard_async(
+    db_session: AsyncSession, lang: str, cursor: Optional[str] = None
+) -> str:
+    """
+    Return the serialized keyboard of a page of the events list on an async session.
+
+    Raises:
+        ValueError: If the cursor is malformed.
+    """
+    keyboard = event_catalog.keyboard(lang, cursor)
+    if keyboard is None:
+        keyboard = build_events_list_keyboard(lang, await read_catalog_page_async(db_session, cursor))
+    return keyboard
+
+
+def search_events(db_session: Session, query: str, offset: int = 0, limit: int = 20) -> list[SearchResult]:
+    """Search events by name and description, from the search cache when the query was recently made"""
+    terms = search_terms(query)
+    results = search_cache.get(terms, offset)
+    if results is None:
+        version = search_cache.version
+        statement = search_statement(db_session.get_bind().dialect.name, terms, offset, limit)
+        results = search_cache.put(terms, offset, db_session.scalars(statement).all(), version)
+    return results
+
+
+async def search_events_async(
+    db_session: AsyncSession, query: str, offset: int = 0, limit: int = 20
+) -> list[SearchResult]:
+    """Search events by name and description on an async session, from the search cache when possible"""
+    terms = search_terms(query)
+    results = search_cache.get(terms, offset)
+    if results is None:
+        version = search_cache.version
+        statement = search_statement(db_session.bind.dialect.name, terms, offset, limit)
+        results = search_cache.put(terms, offset, (await db_session.scalars(statement)).all(), version)
+    return results
 
 
 def create_event(db_session: Session, event_data: dict) -> Event:
@@ -28,22 +173,57 @@ def create_event(db_session: Session, event_data: dict) -> Event:
         name=event_data["name"],
         description=event_data.get("description"),
         image=event_data.get("image_url"),
+        image_file_id=event_data.get("image_file_id"),
         qtickets_link=event_data.get("qtickets_link"),
         datetime=event_data.get("datetime"),
     )
     db_session.add(new_event)
     db_session.commit()
     db_session.refresh(new_event)
+    event_catalog.invalidate()
+    search_cache.invalidate()
+    # SQLite may reuse the id of a removed event
+    render_cache.invalidate(new_event.id)
     logger.info(f"Event created: {new_event.name}")
     return new_event
 
 
+def _image_file_id_statement(event_id: int, image_url: str, file_id: str):
+    # Keep the first captured id, and ignore it if the image was changed meanwhile
+    return (
+        update(Event)
+        .where(Event.id == event_id, Event.image == image_url, Event.image_file_id.is_(None))
+        .values(image_file_id=file_id)
+    )
+
+
+def set_event_image_file_id(db_session: Session, event_id: int, image_url: str, file_id: str) -> None:
+    """Persist the Telegram file id of an event image given as a URL, so later sends skip the download"""
+    db_session.execute(_image_file_id_statement(event_id, image_url, file_id))
+    db_session.commit()
+    render_cache.invalidate(event_id)
+    logger.info(f"Image file id captured for event {event_id}")
+
+
+async def set_event_image_file_id_async(
+    db_session: AsyncSession, event_id: int, image_url: str, file_id: str
+) -> None:
+    """Persist the Telegram file id of an event image given as a URL on an async session"""
+    await db_session.execute(_image_file_id_statement(event_id, image_url, file_id))
+    await db_session.commit()
+    render_cache.invalidate(event_id)
+    logger.info(f"Image file id captured for event {event_id}")
+
+
 def remove_event(db_session: Session, event_id: int) -> bool:
     """Remove an event by ID. Returns True if deleted, False if not found."""
     event = db_session.query(Event).filter(Event.id == event_id).first()
     if event:
         db_session.delete(event)
         db_session.commit()
+        event_catalog.invalidate()
+        search_cache.invalidate()
+        render_cache.invalidate(event_id)
         logger.info(f"Event removed: {event.name}")
         return True
     return False
\ No newline at end of file
@@ -0,0 +1,189 @@
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from typing import Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Number of recent tasks used for the latency percentiles of a shard
+LATENCY_SAMPLES = 1000
+
+
+def chat_key(update) -> Optional[int]:
+    """Return the chat an update belongs to, or None when it has no chat or user"""
+    chat = getattr(update, "chat", None)
+    if chat is not None:
+        return chat.id
+    # Callback queries carry the message they were attached to
+    message = getattr(update, "message", None)
+    if message is not None and getattr(message, "chat", None) is not None:
+        return message.chat.id
+    from_user = getattr(update, "from_user", None)
+    if from_user is not None:
+        return from_user.id
+    return None
+
+
+def update_chat_key(update) -> Optional[int]:
+    """Return the chat of a raw `Update`, from the message, query or member change it carries"""
+    for name, value in vars(update).items():
+        if name != "update_id" and value is not None:
+            return chat_key(value)
+    return None
+
+
+class _Shard:
+    def __init__(self, index: int, max_queue_size: int) -> None:
+        self.index = index
+        self.queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self.latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        self.processed = 0
+        self.failed = 0
+        self.thread: Optional[threading.Thread] = None
+
+
+class ShardedExecutor:
+    """Worker pool running the updates of a chat in order, one worker per shard
+
+    Updates are routed to a shard by chat id, so the updates of one chat are
+    processed sequentially while different chats run in parallel. It replaces
+    `bot.worker_pool` and keeps the interface of telebot's ThreadPool.
+    """
+
+    def __init__(self, telebot=None, shards: int = 8, max_queue_size: int = 1000) -> None:
+        """
+        Args:
+            telebot: The bot whose `exception_handler` is given the errors of the tasks.
+            shards: Number of worker threads, each owning a queue.
+            max_queue_size: Maximum number of tasks waiting in one shard.
+        """
+        self.telebot = telebot
+        self.shards = [_Shard(index, max_queue_size) for index in range(shards)]
+        self.exception_event = threading.Event()
+        self.exception_info: Optional[Exception] = None
+        self._stats_lock = threading.Lock()
+        self._rejected = 0
+        self._running = False
+
+    def start(self) -> None:
+        """Start one worker thread per shard"""
+        self._running = True
+        for shard in self.shards:
+            shard.thread = threading.Thread(
+                target=self._run, args=(shard,), name=f"shard-worker-{shard.index}", daemon=True
+            )
+            shard.thread.start()
+        logger.info(f"Sharded executor started with {len(self.shards)} shards")
+
+    def put(self, func, *args, **kwargs) -> None:
+        """Queue a task on the shard of the update in `args[0]`, blocking while the shard is full
+
+        A task queued by a worker, e.g. a handler of an update given to
+        `try_submit`, runs right away in that worker: it belongs to the update
+        being processed, so the order of the chat is kept and the worker never
+        waits for its own queue.
+        """
+        if threading.current_thread() in self._threads:
+            func(*args, **kwargs)
+            return
+        self.submit(chat_key(args[0]) if args else None, func, *args, **kwargs)
+
+    def submit(self, key: Optional[int], func, *args, **kwargs) -> None:
+        """Queue a task on the shard of chat `key`, blocking while the shard is full"""
+        self._shard(key).queue.put((func, args, kwargs, time.perf_counter()))
+
+    def try_submit(self, key: Optional[int], func, *args, **kwargs) -> bool:
+        """Queue a task on the shard of chat `key` without blocking, return False if the shard is full"""
+        try:
+            self._shard(key).queue.put_nowait((func, args, kwargs, time.perf_counter()))
+        except queue.Full:
+            with self._stats_lock:
+                self._rejected += 1
+            return False
+        return True
+
+    def raise_exceptions(self) -> None:
+        """Raise the last unhandled error of a task, for the polling loop"""
+        if self.exception_event.is_set():
+            raise self.exception_info
+
+    def clear_exceptions(self) -> None:
+        """Forget the last unhandled error once the polling loop dealt with it"""
+        self.exception_event.clear()
+
+    def close(self, timeout: Optional[float] = 10) -> None:
+        """Process the queued tasks and stop the worker threads"""
+        if not self._running:
+            return
+        self._running = False
+        for shard in self.shards:
+            shard.queue.put(None)
+        for shard in self.shards:
+            shard.thread.join(timeout)
+        logger.info(f"Sharded executor stopped: {self.stats()}")
+
+    def stats(self) -> dict:
+        """Return the queue depth, counters and latency percentiles (ms) of each shard"""
+        with self._stats_lock:
+            shards = []
+            for shard in self.shards:
+                latencies = sorted(shard.latencies)
+                shards.append({
+                    "queued": shard.queue.qsize(),
+                    "processed": shard.processed,
+                    "failed": shard.failed,
+                    "p50_ms": _percentile(latencies, 0.50),
+                    "p95_ms": _percentile(latencies, 0.95),
+                })
+            return {
+                "queued": sum(shard["queued"] for shard in shards),
+                "rejected": self._rejected,
+                "shards": shards,
+            }
+
+    @property
+    def _threads(self) -> list:
+        return [shard.thread for shard in self.shards]
+
+    def _shard(self, key: Optional[int]) -> _Shard:
+        return self.shards[hash(key) % len(self.shards)]
+
+    def _run(self, shard: _Shard) -> None:
+        while True:
+            task = shard.queue.get()
+            if task is None:
+                return
+            func, args, kwargs, queued_at = task
+            failed = False
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                failed = True
+                logger.error(f"Error processing update on shard {shard.index}: {e}")
+                # Given to the exception handler of the bot, or reported to the polling loop,
+                # like telebot's ThreadPool does
+                if self.telebot is not None and self.telebot.exception_handler is not None:
+                    handled = self.telebot.exception_handler.handle(e)
+                else:
+                    handled = False
+                if not handled:
+                    self.exception_info = e
+                    self.exception_event.set()
+            # Latency includes the time spent waiting in the queue
+            latency_ms = (time.perf_counter() - queued_at) * 1000
+            with self._stats_lock:
+                shard.latencies.append(latency_ms)
+                shard.processed += 1
+                shard.failed += failed
+
+
+def _percentile(values: list, fraction: float) -> float:
+    if not values:
+        return 0.0
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 2)
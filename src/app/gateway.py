@@ -0,0 +1,332 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+
+from omegaconf import OmegaConf
+from telebot import apihelper, asyncio_helper
+from telebot.apihelper import ApiTelegramException
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR / "config.yaml")
+
+INTERACTIVE = "interactive"
+BROADCAST = "broadcast"
+LANES = (INTERACTIVE, BROADCAST)
+
+# API methods delivering a message, the ones counted by Telegram's flood limits
+LIMITED_METHOD_PREFIXES = ("send", "copyMessage", "forwardMessage", "editMessage")
+
+
+class _Bucket:
+    __slots__ = ("tokens", "updated", "paused_until")
+
+    def __init__(self, tokens: float, now: float) -> None:
+        self.tokens = tokens
+        self.updated = now
+        self.paused_until = 0.0
+
+    def wait_time(self, burst: float, rate: float, now: float) -> float:
+        """Refill the bucket and return how long to wait for one token"""
+        self.tokens = min(burst, self.tokens + (now - self.updated) * rate)
+        self.updated = now
+        if now < self.paused_until:
+            return self.paused_until - now
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / rate
+
+
+class SendGateway:
+    """Central gate for outbound Telegram API calls
+
+    Message deliveries wait for a token from a global bucket and from the
+    bucket of their chat, and 429 responses pause the chat for `retry_after`
+    seconds before the call is retried. Calls made in the broadcast lane leave
+    a global token to every interactive reply waiting for one.
+    """
+
+    def __init__(
+        self,
+        global_rate_per_second: float = 30,
+        global_burst: float = 30,
+        chat_rate_per_second: float = 1,
+        chat_burst: float = 3,
+        max_chats: int = 100000,
+        max_retries: int = 3,
+        max_retry_after_seconds: float = 30,
+    ) -> None:
+        """
+        Args:
+            global_rate_per_second: Message deliveries per second for the whole bot.
+            global_burst: Deliveries the bot can make in a row.
+            chat_rate_per_second: Message deliveries per second to one chat.
+            chat_burst: Deliveries one chat can receive in a row.
+            max_chats: Maximum number of chat buckets kept in memory.
+            max_retries: Retries of a call answered with 429.
+            max_retry_after_seconds: Longer `retry_after` values are returned to the caller instead of waited.
+        """
+        self.global_rate_per_second = global_rate_per_second
+        self.global_burst = global_burst
+        self.chat_rate_per_second = chat_rate_per_second
+        self.chat_burst = chat_burst
+        self.max_chats = max_chats
+        self.max_retries = max_retries
+        self.max_retry_after_seconds = max_retry_after_seconds
+
+        self._condition = threading.Condition()
+        self._global = _Bucket(global_burst, time.monotonic())
+        self._chats: OrderedDict = OrderedDict()
+        self._waiting = {lane: 0 for lane in LANES}
+        self._local = threading.local()
+        self._sender = None
+        self._async_sender = None
+        self._stats = {
+            **{f"{lane}_sent": 0 for lane in LANES},
+            **{f"{lane}_throttled": 0 for lane in LANES},
+            **{f"{lane}_wait_ms": 0.0 for lane in LANES},
+            "rate_limited": 0,
+            "retries": 0,
+        }
+
+    def install(self) -> None:
+        """Route every request of the synchronous API helper through the gateway"""
+        self._sender = apihelper.CUSTOM_REQUEST_SENDER
+        apihelper.CUSTOM_REQUEST_SENDER = self.request
+        logger.info(
+            f"Send gateway installed (global: {self.global_rate_per_second}/s, "
+            f"per chat: {self.chat_rate_per_second}/s)"
+        )
+
+    def install_async(self) -> None:
+        """Route every request of the asyncio API helper through the gateway, sharing its buckets"""
+        self._async_sender = asyncio_helper._process_request
+        asyncio_helper._process_request = self.request_async
+        logger.info("Send gateway installed for the asyncio API helper")
+
+    @contextmanager
+    def broadcast(self):
+        """Send the calls made in this block, in this thread, in the broadcast lane
+
+        Yields a dict counting the retries of these calls, shared with the enclosing block if nested.
+        """
+        previous_lane = getattr(self._local, "lane", INTERACTIVE)
+        previous_calls = getattr(self._local, "calls", None)
+        self._local.lane = BROADCAST
+        if previous_calls is None:
+            self._local.calls = {"retries": 0}
+        try:
+            yield self._local.calls
+        finally:
+            self._local.lane = previous_lane
+            self._local.calls = previous_calls
+
+    def request(self, method, url, params=None, files=None, timeout=None, proxies=None):
+        """Send an API request, waiting for the rate limits and retrying on 429"""
+        method_name = url.rsplit("/", 1)[-1]
+        if not method_name.startswith(LIMITED_METHOD_PREFIXES):
+            return self._send(method, url, params=params, files=files, timeout=timeout, proxies=proxies)
+
+        lane = getattr(self._local, "lane", INTERACTIVE)
+        chat_id = params.get("chat_id") if params else None
+        chat_id = str(chat_id) if chat_id is not None else None
+        # Uploaded files are read by every attempt, a call is only retried if they can be rewound
+        positions = _stream_positions(files)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                for stream, position in positions:
+                    stream.seek(position)
+            self._acquire(lane, chat_id)
+            response = self._send(method, url, params=params, files=files, timeout=timeout, proxies=proxies)
+            if response.status_code != 429:
+                with self._condition:
+                    self._stats[f"{lane}_sent"] += 1
+                return response
+
+            retry_after = _retry_after(response)
+            self._pause(method_name, chat_id, retry_after)
+            if attempt == self.max_retries or retry_after > self.max_retry_after_seconds or positions is None:
+                return response
+            with self._condition:
+                self._stats["retries"] += 1
+            calls = getattr(self._local, "calls", None)
+            if calls is not None:
+                calls["retries"] += 1
+        return response
+
+    async def request_async(self, token, url, method="get", params=None, files=None, **kwargs):
+        """Send a request of the asyncio API helper, waiting for the rate limits and retrying on 429
+
+        Calls made from the event loop are interactive replies.
+        """
+        if not url.startswith(LIMITED_METHOD_PREFIXES):
+            return await self._async_sender(token, url, method, params, files, **kwargs)
+
+        chat_id = params.get("chat_id") if params else None
+        chat_id = str(chat_id) if chat_id is not None else None
+        positions = _stream_positions(files)
+        for attempt in range(self.max_retries + 1):
+            if attempt:
+                for stream, position in positions:
+                    stream.seek(position)
+            await self._acquire_async(INTERACTIVE, chat_id)
+            try:
+                # The helper pops the timeout from the parameters, every attempt gets its own copy
+                result = await self._async_sender(
+                    token, url, method, dict(params) if params else params, files, **kwargs
+                )
+            except ApiTelegramException as e:
+                if e.error_code != 429:
+                    raise
+                retry_after = _retry_after_of(e.result_json)
+                self._pause(url, chat_id, retry_after)
+                if attempt == self.max_retries or retry_after > self.max_retry_after_seconds or positions is None:
+                    raise
+                with self._condition:
+                    self._stats["retries"] += 1
+                continue
+            with self._condition:
+                self._stats[f"{INTERACTIVE}_sent"] += 1
+            return result
+
+    def stats(self) -> dict:
+        """Return the waiting calls per lane, sent, throttled and rate limited counters"""
+        with self._condition:
+            return {
+                **{f"{lane}_waiting": self._waiting[lane] for lane in LANES},
+                **{name: round(value, 1) for name, value in self._stats.items()},
+                "tracked_chats": len(self._chats),
+            }
+
+    def _send(self, method, url, **kwargs):
+        if self._sender is not None:
+            return self._sender(method, url, **kwargs)
+        return apihelper._get_req_session().request(method, url, **kwargs)
+
+    def _acquire(self, lane: str, chat_id) -> None:
+        """Block until a global and a chat token are available for `lane`"""
+        started = time.monotonic()
+        with self._condition:
+            self._waiting[lane] += 1
+            try:
+                while True:
+                    wait = self._take(lane, chat_id, started)
+                    if wait <= 0:
+                        break
+                    self._condition.wait(wait)
+            finally:
+                self._waiting[lane] -= 1
+                self._condition.notify_all()
+
+    async def _acquire_async(self, lane: str, chat_id) -> None:
+        """Wait on the event loop until a global and a chat token are available for `lane`"""
+        started = time.monotonic()
+        with self._condition:
+            self._waiting[lane] += 1
+        try:
+            while True:
+                with self._condition:
+                    wait = self._take(lane, chat_id, started)
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+        finally:
+            with self._condition:
+                self._waiting[lane] -= 1
+                self._condition.notify_all()
+
+    def _take(self, lane: str, chat_id, started: float) -> float:
+        """Take a global and a chat token for `lane`, or return how long to wait for them
+
+        Called with the condition held.
+        """
+        now = time.monotonic()
+        wait = self._global.wait_time(self.global_burst, self.global_rate_per_second, now)
+        if chat_id is not None:
+            chat_bucket = self._chat_bucket(chat_id, now)
+            wait = max(wait, chat_bucket.wait_time(self.chat_burst, self.chat_rate_per_second, now))
+        # Interactive replies go first, broadcasts leave one global token per waiting reply
+        if lane == BROADCAST and self._waiting[INTERACTIVE]:
+            reserved = self._global.tokens - self._waiting[INTERACTIVE]
+            wait = max(wait, (1 - reserved) / self.global_rate_per_second)
+        if wait > 0:
+            return wait
+
+        self._global.tokens -= 1
+        if chat_id is not None:
+            chat_bucket.tokens -= 1
+        waited = now - started
+        if waited > 0.001:
+            self._stats[f"{lane}_throttled"] += 1
+            self._stats[f"{lane}_wait_ms"] += waited * 1000
+        return 0.0
+
+    def _pause(self, method_name: str, chat_id, retry_after: float) -> None:
+        """Count a 429 and keep every lane away from the chat, or from the API if the chat is unknown"""
+        with self._condition:
+            self._stats["rate_limited"] += 1
+            bucket = self._chat_bucket(chat_id, time.monotonic()) if chat_id is not None else self._global
+            bucket.paused_until = max(bucket.paused_until, time.monotonic() + retry_after)
+        logger.warning(f"Telegram rate limit on {method_name} for chat {chat_id}, retry after {retry_after}s")
+
+    def _chat_bucket(self, chat_id, now: float) -> _Bucket:
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            bucket = self._chats[chat_id] = _Bucket(self.chat_burst, now)
+            if len(self._chats) > self.max_chats:
+                self._chats.popitem(last=False)
+        else:
+            self._chats.move_to_end(chat_id)
+        return bucket
+
+
+def _stream_positions(files):
+    """Return the file streams of a request with their positions, None if one cannot be rewound"""
+    positions = []
+    for value in (files or {}).values():
+        # Files are given as streams, (file name, stream) tuples, or bytes
+        stream = value[1] if isinstance(value, tuple) else value
+        if not hasattr(stream, "read"):
+            continue
+        seekable = getattr(stream, "seekable", None)
+        if seekable is None or not seekable():
+            return None
+        positions.append((stream, stream.tell()))
+    return positions
+
+
+def _retry_after(response) -> float:
+    """Read `retry_after` from a 429 response, 1 second if it is missing"""
+    try:
+        return _retry_after_of(json.loads(response.text))
+    except ValueError:
+        return 1.0
+
+
+def _retry_after_of(result: dict) -> float:
+    """Read `retry_after` from the decoded body of a 429 response, 1 second if it is missing"""
+    try:
+        return float(result["parameters"]["retry_after"])
+    except (ValueError, KeyError, TypeError):
+        return 1.0
+
+
+gateway_config = config.app.gateway
+send_gateway = SendGateway(
+    global_rate_per_second=gateway_config.global_rate_per_second,
+    global_burst=gateway_config.global_burst,
+    chat_rate_per_second=gateway_config.chat_rate_per_second,
+    chat_burst=gateway_config.chat_burst,
+    max_chats=gateway_config.max_chats,
+    max_retries=gateway_config.max_retries,
+    max_retry_after_seconds=gateway_config.max_retry_after_seconds,
+)
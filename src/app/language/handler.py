@@ -7,6 +7,7 @@ from telebot.states import State, StatesGroup
 from telebot.types import CallbackQuery, Message
 
 from .markup import create_lang_menu_markup
+from ..auth.cache import user_cache
 from ..auth.service import update_user
 
 logger = logging.getLogger(__name__)
@@ -46,6 +47,7 @@ def register_handlers(bot: TeleBot):
         db_session = data["db_session"]
         
         update_user(db_session, user.id, lang=new_lang)
+        user_cache.invalidate(user.id)
 
         bot.edit_message_text(
             chat_id=call.message.chat.id,
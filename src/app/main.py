@@ -1,25 +1,36 @@
 import logging
 import os
+import signal
+import threading
 from pathlib import Path
 
 import telebot
 from dotenv import find_dotenv, load_dotenv
 from omegaconf import OmegaConf
 from telebot.states.sync.middleware import StateMiddleware
+from telebot.storage import StateMemoryStorage, StatePickleStorage, StateRedisStorage
 
 from .admin.handlers import register_handlers as admin_handlers
+from .auth.activity import activity_tracker
 from .auth.data import init_roles_table, init_superuser
-from .database.core import SessionLocal, create_tables, drop_tables
+from .database.core import SessionLocal, create_tables, drop_tables, warm_up_pool
 from .events.handlers import register_handlers as events_handlers
 from .events.data import init_events_table
+from .events.follow_ups import follow_up_dispatcher
+from .executor import ShardedExecutor
+from .gateway import send_gateway
 from .contact.handlers import register_handlers as contact_handlers
 from .menu.handlers import register_handlers as menu_handlers
 from .language.handler import register_handlers as language_handlers
 from .middleware.antiflood import AntifloodMiddleware
+from .middleware.audit import log_event_writer
 from .middleware.database import DatabaseMiddleware
+from .middleware.limiter_storage import create_limiter_storage
 from .middleware.user import UserCallbackMiddleware, UserMessageMiddleware
+from .public_message.broadcast import broadcast_engine
 from .public_message.handlers import register_handlers as public_message_handlers
 from .users.handlers import register_handlers as users_handlers
+from .webhook import UpdateDispatcher
 from src.health_check import start_health_check_server
 
 # Set up logging
@@ -36,8 +47,11 @@ load_dotenv(find_dotenv(usecwd=True))
 SUPERUSER_USERNAME = os.getenv("SUPERUSER_USERNAME")
 SUPERUSER_USER_ID = os.getenv("SUPERUSER_USER_ID")
 
+# Set when the bot has to stop, e.g. on `docker stop`
+stop_event = threading.Event()
 
-def start_bot():
+
+def start_bot(health_server=None):
     """Start the Telegram bot with configuration, middlewares, and handlers."""
     BOT_TOKEN = os.getenv("BOT_TOKEN")
 
@@ -45,34 +59,122 @@ def start_bot():
         logging.critical("BOT_TOKEN is not set in environment variables")
         raise ValueError("BOT_TOKEN environment variable is required")
 
-    logger.info(f"Initializing {config.app.name} v{config.app.version}")
+    mode = os.getenv("BOT_MODE") or config.app.mode
+    logger.info(f"Initializing {config.app.name} v{config.app.version} in {mode} mode")
 
+    bot = None
     try:
-        bot = telebot.TeleBot(BOT_TOKEN, use_class_middlewares=True)
-        _setup_middlewares(bot)
-        _register_handlers(bot)
-        bot.add_custom_filter(telebot.custom_filters.StateFilter(bot))
+        if config.app.gateway.enabled:
+            send_gateway.install()
+        bot = create_bot(BOT_TOKEN)
+
+        # Create the missing tables, and the columns and indexes added since the database was created
+        create_tables()
+        warm_up_pool()
 
         bot_info = bot.get_me()
         logger.info(
             f"Bot {bot_info.username} (ID: {bot_info.id}) initialized successfully"
         )
 
-        _start_polling_loop(bot)
+        log_event_writer.start()
+        activity_tracker.start()
+        follow_up_dispatcher.start(bot)
+        # Broadcasts scheduled or cut by the previous run
+        broadcast_engine.resume(bot)
+        # Stop gracefully on `docker stop` so queued log events and activity timestamps are flushed
+        signal.signal(signal.SIGTERM, lambda signum, frame: _stop(bot))
+
+        if mode == "webhook":
+            _start_webhook_loop(bot, health_server or start_health_check_server(port=8080))
+        elif mode == "polling":
+            _start_polling_loop(bot)
+        else:
+            raise ValueError(f"Unknown bot mode: {mode}")
 
     except Exception as e:
         logging.critical(f"Failed to start bot: {str(e)}")
         raise
+    finally:
+        if bot is not None and isinstance(bot.worker_pool, ShardedExecutor):
+            bot.worker_pool.close()
+        logger.info(f"Send gateway stopped: {send_gateway.stats()}")
+        follow_up_dispatcher.stop()
+        broadcast_engine.stop()
+        log_event_writer.stop()
+        activity_tracker.stop()
+
+
+def create_bot(token):
+    """Create the bot with its worker pool, middlewares, handlers and filters."""
+    bot = telebot.TeleBot(
+        token,
+        use_class_middlewares=True,
+        state_storage=_create_state_storage(),
+    )
+    _setup_worker_pool(bot)
+    _setup_middlewares(bot)
+    _register_handlers(bot)
+    bot.add_custom_filter(telebot.custom_filters.StateFilter(bot))
+    return bot
+
+
+def _stop(bot):
+    """Stop receiving updates."""
+    stop_event.set()
+    bot.stop_polling()
+
+
+def _setup_worker_pool(bot):
+    """Replace the default pool so the updates of a chat are processed in order."""
+    workers_config = config.app.workers
+    # The default pool threads are already running
+    bot.worker_pool.close()
+    bot.worker_pool = ShardedExecutor(
+        bot, shards=workers_config.shards, max_queue_size=workers_config.max_queue_size
+    )
+    bot.worker_pool.start()
+
+
+def _create_state_storage():
+    """Create the dialog state storage, shared between replicas with the redis backend."""
+    backend = os.getenv("STATE_STORAGE") or config.app.state_storage.backend
+    logger.info(f"Using {backend} state storage")
+    if backend == "memory":
+        return StateMemoryStorage()
+    if backend == "pickle":
+        return StatePickleStorage(file_path=config.app.state_storage.pickle_path)
+    if backend == "redis":
+        redis_url = os.getenv("REDIS_URL") or config.app.rate_limit_storage.redis_url
+        return StateRedisStorage(redis_url=redis_url)
+    raise ValueError(f"Unknown state storage backend: {backend}")
 
 
 def _setup_middlewares(bot):
     """Configure bot middlewares."""
     if config.app.antiflood.enabled:
+        storage_config = config.app.rate_limit_storage
+        backend = os.getenv("RATE_LIMIT_STORAGE") or storage_config.backend
         logger.info(
-            f"Enabling antiflood (window: {config.app.antiflood.time_window_seconds}s)"
+            f"Enabling antiflood (window: {config.app.antiflood.time_window_seconds}s, "
+            f"burst: {config.app.antiflood.burst}, storage: {backend})"
+        )
+        limiter_storage = create_limiter_storage(
+            backend,
+            max_keys=config.app.antiflood.max_users,
+            sqlite_path=storage_config.sqlite_path,
+            redis_url=os.getenv("REDIS_URL") or storage_config.redis_url,
         )
         bot.setup_middleware(
-            AntifloodMiddleware(bot, config.app.antiflood.time_window_seconds)
+            AntifloodMiddleware(
+                bot,
+                config.app.antiflood.time_window_seconds,
+                burst=config.app.antiflood.burst,
+                max_users=config.app.antiflood.max_users,
+                idle_ttl_seconds=config.app.antiflood.idle_ttl_seconds,
+                warning_interval_seconds=config.app.antiflood.warning_interval_seconds,
+                storage=limiter_storage,
+            )
         )
 
     bot.setup_middleware(StateMiddleware(bot))
@@ -99,9 +201,32 @@ def _register_handlers(bot):
 def _start_polling_loop(bot):
     """Start the main bot polling loop with error handling."""
     logger.info("Starting bot polling...")
+    # Polling is refused by Telegram while a webhook is set
+    bot.remove_webhook()
     bot.polling(none_stop=True, interval=0, timeout=60, long_polling_timeout=60)
 
 
+def _start_webhook_loop(bot, health_server):
+    """Receive updates on the health check server until the bot is stopped."""
+    webhook_config = config.app.webhook
+    webhook_url = os.getenv("WEBHOOK_URL") or webhook_config.url
+    secret_token = os.getenv("WEBHOOK_SECRET_TOKEN") or None
+    if not webhook_url:
+        raise ValueError("WEBHOOK_URL is required in webhook mode")
+
+    dispatcher = UpdateDispatcher(bot, bot.worker_pool)
+    health_server.set_webhook_handler(webhook_config.path, dispatcher.submit, secret_token)
+
+    bot.set_webhook(
+        url=webhook_url.rstrip("/") + webhook_config.path,
+        secret_token=secret_token,
+        max_connections=webhook_config.max_connections,
+    )
+    logger.info(f"Receiving updates on webhook path {webhook_config.path}")
+    stop_event.wait()
+    logger.info(f"Webhook dispatcher stopped: {dispatcher.stats()}")
+
+
 def init_db():
     """Initialize the database for applications."""
     # Create tables
@@ -125,13 +250,13 @@ def init_db():
 
 def main():
     """Main entry point for the application."""
-    # Start health check server
-    start_health_check_server(port=8080)
+    # Start health check server, it also receives updates in webhook mode
+    return start_health_check_server(port=8080)
 
 
 if __name__ == "__main__":
     # drop_tables()
     # init_db()
-    main()
-    start_bot()
+    health_server = main()
+    start_bot(health_server)
 
@@ -1,30 +1,145 @@
+import logging
+import threading
+from typing import Optional
+
 from telebot import TeleBot
 from telebot.handler_backends import BaseMiddleware, CancelUpdate
+from telebot.types import CallbackQuery
+
+from .limiter_storage import BucketRequest, LimiterStorage, MemoryLimiterStorage
+
+logger = logging.getLogger(__name__)
+
+# Time during which the items of an album are let through once its first item was charged
+ALBUM_WINDOW_SECONDS = 60
+
+
+class TokenBucketLimiter:
+    """Per-key token buckets kept in a limiter storage
+
+    The default in-memory storage drops buckets that were not used for
+    `idle_ttl_seconds` and evicts the least recently used bucket when more
+    than `max_keys` are tracked.
+    """
+
+    def __init__(
+        self,
+        burst: float,
+        refill_per_second: float,
+        max_keys: int = 100000,
+        idle_ttl_seconds: float = 600,
+        storage: Optional[LimiterStorage] = None,
+        prefix: str = "",
+    ) -> None:
+        self.burst = burst
+        self.refill_per_second = refill_per_second
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.storage = storage if storage is not None else MemoryLimiterStorage(max_keys)
+        self.prefix = prefix
+
+    def request(self, key) -> BucketRequest:
+        """Build the storage request taking one token from the bucket of `key`"""
+        return BucketRequest(
+            f"{self.prefix}{key}", self.burst, self.refill_per_second, self.idle_ttl_seconds
+        )
+
+    def consume(self, key, now: Optional[float] = None) -> bool:
+        """Take one token from the bucket of `key`, return False if it is empty"""
+        return self.storage.consume(self.request(key), now)
+
+    @property
+    def evictions(self) -> int:
+        return self.storage.evictions
+
+    def __len__(self) -> int:
+        return len(self.storage)
 
 
 class AntifloodMiddleware(BaseMiddleware):
-    def __init__(self, bot: TeleBot, limit: int) -> None:
-        """Middleware to prevent flooding
+    def __init__(
+        self,
+        bot: TeleBot,
+        limit: float,
+        burst: int = 1,
+        max_users: int = 100000,
+        idle_ttl_seconds: float = 600,
+        warning_interval_seconds: float = 10,
+        storage: Optional[LimiterStorage] = None,
+    ) -> None:
+        """Middleware to prevent flooding with per-user token buckets
         Args:
             bot (TeleBot): TeleBot instance
-            limit (int): Limit in seconds
+            limit (float): Seconds needed to refill one request
+            burst (int): Number of requests a user can make in a row
+            max_users (int): Maximum number of users tracked in memory
+            idle_ttl_seconds (float): Time after which an idle user is forgotten
+            warning_interval_seconds (float): Minimum time between two warnings to the same user
+            storage (LimiterStorage): Shared bucket storage, in-memory by default
         """
         self.bot = bot
-        self.last_time: dict[str, str] = {}
-        self.limit = limit
-        self.update_types = ["message"]
+        storage = storage if storage is not None else MemoryLimiterStorage(max_users)
+        self.limiter = TokenBucketLimiter(
+            burst=burst,
+            refill_per_second=1 / limit,
+            idle_ttl_seconds=idle_ttl_seconds,
+            storage=storage,
+            prefix="antiflood:",
+        )
+        # One warning token per interval, so a flood produces at most one notice per window
+        self.warnings = TokenBucketLimiter(
+            burst=1,
+            refill_per_second=1 / warning_interval_seconds,
+            idle_ttl_seconds=warning_interval_seconds,
+            storage=storage,
+            prefix="antiflood_warning:",
+        )
+        # Telegram sends each item of an album as its own message in the same second,
+        # only the first item of an album is charged to the user
+        self.albums = TokenBucketLimiter(
+            burst=1,
+            refill_per_second=1 / ALBUM_WINDOW_SECONDS,
+            idle_ttl_seconds=ALBUM_WINDOW_SECONDS,
+            storage=storage,
+            prefix="antiflood_album:",
+        )
+        self._stats_lock = threading.Lock()
+        self._stats = {"rejected_message": 0, "rejected_callback_query": 0, "warnings_sent": 0}
+        self.update_types = ["message", "callback_query"]
         # Always specify update types, otherwise middlewares won't work
 
-    def pre_process(self, message, data):
-        if message.from_user.id not in self.last_time:
-            # User is not in a dict, so lets add and cancel this function
-            self.last_time[message.from_user.id] = message.date
+    def stats(self) -> dict:
+        """Return rejected update and warning counters, tracked users and evictions"""
+        with self._stats_lock:
+            return {
+                **self._stats,
+                "tracked_users": len(self.limiter),
+                "evictions": self.limiter.evictions,
+            }
+
+    def pre_process(self, update, data):
+        user_id = update.from_user.id
+        media_group_id = getattr(update, "media_group_id", None)
+        if media_group_id is not None and not self.albums.consume(media_group_id):
+            return
+        if self.limiter.consume(user_id):
             return
-        if message.date - self.last_time[message.from_user.id] < self.limit:
-            # User is flooding
-            self.bot.send_message(message.chat.id, "You are making request too often")
-            return CancelUpdate()
-        self.last_time[message.from_user.id] = message.date
 
-    def post_process(self, message, data, exception):
+        # User is flooding
+        update_type = "callback_query" if isinstance(update, CallbackQuery) else "message"
+        with self._stats_lock:
+            self._stats[f"rejected_{update_type}"] += 1
+
+        if self.warnings.consume(user_id):
+            with self._stats_lock:
+                self._stats["warnings_sent"] += 1
+            try:
+                if update_type == "callback_query":
+                    self.bot.answer_callback_query(update.id, "You are making request too often")
+                else:
+                    self.bot.send_message(update.chat.id, "You are making request too often")
+            except Exception as e:
+                logger.warning(f"Failed to send antiflood warning to user {user_id}: {e}")
+        return CancelUpdate()
+
+    def post_process(self, update, data, exception):
         pass
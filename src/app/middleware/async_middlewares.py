@@ -0,0 +1,155 @@
+import asyncio
+import logging
+
+from sqlalchemy.exc import SQLAlchemyError
+from telebot import TeleBot
+from telebot.async_telebot import AsyncTeleBot
+from telebot.asyncio_handler_backends import BaseMiddleware, CancelUpdate
+from telebot.states.sync.context import StateContext
+from telebot.types import CallbackQuery
+
+from ..auth.activity import activity_tracker
+from ..auth.cache import user_cache
+from ..auth.models import User
+from ..auth.service import upsert_user_async
+from ..database.async_core import AsyncSessionLocal
+from .antiflood import AntifloodMiddleware
+from .audit import log_event_writer
+
+logger = logging.getLogger(__name__)
+logger.setLevel(logging.INFO)
+
+
+class AsyncAntifloodMiddleware(BaseMiddleware):
+    """Runs the synchronous antiflood middleware off the event loop
+
+    Sharing the instance keeps a single set of token buckets and counters for
+    updates handled natively and updates handed to the synchronous bot.
+    """
+
+    def __init__(self, antiflood: AntifloodMiddleware) -> None:
+        """
+        Args:
+            antiflood: The antiflood middleware of the synchronous bot.
+        """
+        self.antiflood = antiflood
+        self.update_types = antiflood.update_types
+
+    async def pre_process(self, update, data):
+        """Cancel the update when the user is flooding"""
+        # The storage may be SQLite or Redis, and warnings are sent with the synchronous bot
+        if await asyncio.to_thread(self.antiflood.pre_process, update, data) is not None:
+            return CancelUpdate()
+
+    async def post_process(self, update, data, exception):
+        """Nothing to do after the handlers"""
+        pass
+
+
+class AsyncDatabaseMiddleware(BaseMiddleware):
+    """Middleware adding an async database session to the data dictionary
+
+    An `AsyncSession` only connects on first use, so it needs no lazy proxy.
+    """
+
+    def __init__(self) -> None:
+        """Handle the updates of the native handlers and of the user middleware"""
+        self.update_types = ["message", "callback_query", "inline_query", "edited_message"]
+
+    async def pre_process(self, update, data):
+        """Add an async database session to the data dictionary"""
+        data["db_session"] = AsyncSessionLocal()
+
+    async def post_process(self, update, data, exception):
+        """Commit the session, or roll it back after an exception, and close it"""
+        session = data.get("db_session")
+        if session is None:
+            return
+        try:
+            if not session.in_transaction():
+                return
+            if exception:
+                logger.warning(f"Rolling back database session due to exception: {str(exception)}")
+                await session.rollback()
+            else:
+                await session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Error during session commit/rollback: {str(e)}")
+            await session.rollback()
+        finally:
+            await session.close()
+
+
+class AsyncUserMiddleware(BaseMiddleware):
+    """Middleware loading the user and logging messages and callbacks
+
+    Dialog states live in the storage of the synchronous bot, which still runs
+    the handlers that set them.
+    """
+
+    def __init__(self, bot: AsyncTeleBot, state_bot: TeleBot) -> None:
+        """
+        Args:
+            bot: The async bot, answering blocked users.
+            state_bot: The synchronous bot owning the dialog states.
+        """
+        self.bot = bot
+        self.state_bot = state_bot
+        self.update_types = ["message", "callback_query"]
+
+    async def pre_process(self, update, data):
+        """Add the user to the data dictionary and log the update, cancel it for blocked users"""
+        user = await self._load_user(data, update.from_user)
+
+        is_callback = isinstance(update, CallbackQuery)
+        if user.is_blocked:
+            await self.bot.send_message(user.id, "You have been blocked from using this bot.")
+            if is_callback:
+                await self.bot.answer_callback_query(
+                    update.id, "You have been blocked from using this bot."
+                )
+            # Cancelled updates skip post_process, so the session is closed here
+            await data["db_session"].close()
+            return CancelUpdate()
+
+        state = await asyncio.to_thread(StateContext(update, self.state_bot).get)
+        # Queue the event, it is written to the database in batches
+        event = log_event_writer.submit(
+            user_id=user.id,
+            content=update.data if is_callback else update.text,
+            content_type="callback_data" if is_callback else update.content_type,
+            event_type="callback" if is_callback else "message",
+            state=state,
+        )
+        logger.info(event)
+
+        data["user"] = user
+
+    async def post_process(self, update, data, exception):
+        """Nothing to do after the handlers"""
+        pass
+
+    async def _load_user(self, data, from_user) -> User:
+        """Return the cached user, or upsert it when the cache misses or the profile changed"""
+        user = user_cache.get(
+            from_user.id,
+            username=from_user.username,
+            first_name=from_user.first_name,
+            last_name=from_user.last_name,
+        )
+        if user is None:
+            user = await upsert_user_async(
+                data["db_session"],
+                id=from_user.id,
+                username=from_user.username,
+                first_name=from_user.first_name,
+                last_name=from_user.last_name,
+                # A user writing to the bot can be messaged again
+                is_unreachable=False,
+                touch=False,
+            )
+            user_cache.put(user)
+
+        # The activity timestamp is written in bulk, at most once per granularity
+        activity_tracker.touch(user)
+        return user
@@ -0,0 +1,197 @@
+import logging
+import queue
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Optional
+
+from omegaconf import OmegaConf
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from ..database.core import SessionLocal
+from .models import LogEvent
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR.parent / "config.yaml")
+
+OVERFLOW_POLICIES = ("drop_oldest", "drop_newest", "block")
+
+
+class LogEventWriter:
+    """Write-behind writer that bulk-inserts log events from a bounded queue"""
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        batch_size: int = 200,
+        flush_interval_seconds: float = 1.0,
+        max_queue_size: int = 10000,
+        overflow_policy: str = "drop_oldest",
+        block_timeout_seconds: float = 0.05,
+    ) -> None:
+        """
+        Args:
+            session_factory: Factory producing database sessions.
+            batch_size: Number of events that triggers a flush.
+            flush_interval_seconds: Maximum time an event waits in the queue.
+            max_queue_size: Maximum number of queued events.
+            overflow_policy: What to do when the queue is full: drop the oldest event,
+                drop the new event, or block the caller up to `block_timeout_seconds`.
+            block_timeout_seconds: How long the "block" policy waits before dropping.
+        """
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow_policy}")
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval_seconds = flush_interval_seconds
+        self.overflow_policy = overflow_policy
+        self.block_timeout_seconds = block_timeout_seconds
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue_size)
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._stats = {"submitted": 0, "written": 0, "dropped": 0, "failed": 0, "flushes": 0}
+
+    def start(self) -> None:
+        """Start the background flusher"""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="log-event-writer", daemon=True)
+        self._thread.start()
+        logger.info("Log event writer started")
+
+    def stop(self, timeout: Optional[float] = 10) -> None:
+        """Stop the background flusher and write all queued events"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join(timeout)
+        self._thread = None
+        logger.info(f"Log event writer stopped: {self.stats()}")
+
+    def submit(
+        self,
+        user_id: int,
+        content_type: str,
+        content: Optional[str],
+        event_type: str,
+        state: Optional[str] = None,
+    ) -> dict:
+        """Queue an event for writing and return its dictionary representation"""
+        now = datetime.now()
+        row = {
+            "user_id": user_id,
+            "content_type": content_type,
+            "content": content,
+            "event_type": event_type,
+            "state": state,
+            "created_at": now,
+            "updated_at": now,
+        }
+        self._count("submitted")
+        if not self._enqueue(row):
+            self._count("dropped")
+        return row
+
+    def stats(self) -> dict:
+        """Return the writer counters and the current queue depth"""
+        with self._stats_lock:
+            return {**self._stats, "queued": self._queue.qsize()}
+
+    def _enqueue(self, row: dict) -> bool:
+        try:
+            if self.overflow_policy == "block":
+                self._queue.put(row, timeout=self.block_timeout_seconds)
+            else:
+                self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            if self.overflow_policy != "drop_oldest":
+                return False
+
+        # Make room by dropping the oldest queued event
+        try:
+            self._queue.get_nowait()
+            self._count("dropped")
+        except queue.Empty:
+            pass
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            return False
+
+    def _run(self) -> None:
+        while not self._stop_event.is_set():
+            batch = self._collect_batch()
+            if batch:
+                self._write(batch)
+
+        # Flush whatever is left on shutdown
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+            if len(batch) >= self.batch_size:
+                self._write(batch)
+                batch = []
+        if batch:
+            self._write(batch)
+
+    def _collect_batch(self) -> list[dict]:
+        """Wait for the first event, then collect until the batch is full or the interval elapsed"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval_seconds)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval_seconds
+        while len(batch) < self.batch_size and not self._stop_event.is_set():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: list[dict]) -> None:
+        session = self.session_factory()
+        try:
+            # A list of parameter sets is sent with executemany
+            session.execute(insert(LogEvent), batch)
+            session.commit()
+            self._count("written", len(batch))
+            self._count("flushes")
+        except Exception as e:
+            session.rollback()
+            self._count("failed", len(batch))
+            logger.error(f"Error writing {len(batch)} log events: {e}")
+        finally:
+            session.close()
+
+    def _count(self, name: str, value: int = 1) -> None:
+        with self._stats_lock:
+            self._stats[name] += value
+
+
+log_event_writer = LogEventWriter(
+    SessionLocal,
+    batch_size=config.app.audit.batch_size,
+    flush_interval_seconds=config.app.audit.flush_interval_seconds,
+    max_queue_size=config.app.audit.max_queue_size,
+    overflow_policy=config.app.audit.overflow_policy,
+    block_timeout_seconds=config.app.audit.block_timeout_seconds,
+)
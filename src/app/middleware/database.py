@@ -1,7 +1,10 @@
 import logging
 import os
+import threading
 
+from sqlalchemy import event
 from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.orm import sessionmaker
 from telebot import TeleBot
 from telebot.handler_backends import BaseMiddleware
 
@@ -12,18 +15,41 @@ log_level = os.environ.get("LOG_LEVEL", "INFO").upper()
 logging.basicConfig(level=getattr(logging, log_level, None))
 logger = logging.getLogger(__name__)
 
+# Connections checked out by each thread, counted by one listener per engine
+_thread_checkouts = threading.local()
+_listen_lock = threading.Lock()
+
+
+def _count_checkout(dbapi_connection, connection_record, connection_proxy) -> None:
+    _thread_checkouts.count = _checkouts() + 1
+
+
+def _checkouts() -> int:
+    """Number of connections checked out by the current thread"""
+    return getattr(_thread_checkouts, "count", 0)
+
+
+def _watch_checkouts(engine) -> None:
+    """Count the checkouts of `engine`, the listener is added once however many middlewares use it"""
+    with _listen_lock:
+        if not event.contains(engine, "checkout", _count_checkout):
+            event.listen(engine, "checkout", _count_checkout)
+
 
 class DatabaseMiddleware(BaseMiddleware):
-    def __init__(self, bot: TeleBot) -> None:
+    def __init__(self, bot: TeleBot, session_factory: sessionmaker = SessionLocal) -> None:
         """Middleware to manage database sessions
 
-        This middleware creates a database session for each update,
-        adds it to the data dictionary, and ensures it's properly closed afterward.
+        This middleware adds a database session to the data dictionary for each update.
+        The session only checks out a connection when a handler or middleware uses it,
+        and is properly closed afterward.
 
         Args:
             bot (TeleBot): TeleBot instance
+            session_factory (sessionmaker): Factory of the sessions, bound to an engine
         """
         self.bot = bot
+        self.session_factory = session_factory
         # Set update types to handle various types of updates
         self.update_types = [
             "message",
@@ -31,39 +57,57 @@ class DatabaseMiddleware(BaseMiddleware):
             "inline_query",
             "edited_message",
         ]
+        self._stats_lock = threading.Lock()
+        self._stats = {"updates": 0, "updates_without_connection": 0, "checkouts": 0}
+        # An update is processed by one thread, from pre_process to post_process
+        _watch_checkouts(session_factory.kw["bind"])
         logger.info("Database middleware initialized")
 
+    def stats(self) -> dict:
+        """Return how many updates were processed, how many never used the database, and their pool checkouts"""
+        with self._stats_lock:
+            return dict(self._stats)
+
     def pre_process(self, message, data):
-        """Create a database session and add it to the data dictionary"""
-        try:
-            # Create a new database session directly using SessionLocal
-            session = SessionLocal()
-            data["db_session"] = session
-            return True
-        except SQLAlchemyError as e:
-            logger.error(f"Error creating database session: {str(e)}")
-            return False
+        """Add a database session to the data dictionary"""
+        data["db_session"] = self.session_factory()
+        data["db_checkouts"] = _checkouts()
+        return True
 
     def post_process(self, message, data, exception):
         """Close the database session"""
         # Get the session from the data dictionary
         session = data.get("db_session")
-        if session:
-            try:
-                # If there was an exception, rollback the session
-                if exception:
-                    logger.warning(
-                        f"Rolling back database session due to exception: {str(exception)}"
-                    )
-                    session.rollback()
-                # Otherwise commit any pending changes
-                else:
-                    session.commit()
-            except SQLAlchemyError as e:
-                logger.error(f"Error during session commit/rollback: {str(e)}")
-                session.rollback()
-            finally:
-                # Always close the session, matching the finally block in get_db()
-                session.close()
-        else:
+        if session is None:
             logger.warning("No database session found in post_process")
+            return
+
+        checkouts = _checkouts() - data["db_checkouts"]
+        used = checkouts > 0
+        with self._stats_lock:
+            self._stats["updates"] += 1
+            self._stats["checkouts"] += checkouts
+            if not used:
+                self._stats["updates_without_connection"] += 1
+
+        # Nothing to commit or rollback if the session never checked out a connection
+        if not used:
+            session.close()
+            return
+
+        try:
+            # If there was an exception, rollback the session
+            if exception:
+                logger.warning(
+                    f"Rolling back database session due to exception: {str(exception)}"
+                )
+                session.rollback()
+            # Otherwise commit any pending changes
+            else:
+                session.commit()
+        except SQLAlchemyError as e:
+            logger.error(f"Error during session commit/rollback: {str(e)}")
+            session.rollback()
+        finally:
+            # Always close the session, matching the finally block in get_db()
+            session.close()
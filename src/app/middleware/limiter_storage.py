@@ -0,0 +1,327 @@
+"""Token bucket storage backends shared by the rate limiters.
+
+Every backend implements the same atomic operation: refill the bucket of a key
+according to the elapsed time, then take `cost` tokens if enough are available.
+`consume_many` applies several operations in one batch (one transaction or one
+network round trip), so a limiter adds a single storage call per update.
+"""
+import abc
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+try:
+    import redis
+except ImportError:  # Only the redis backend needs it
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+
+class BucketRequest:
+    """A request to take tokens from the bucket of a key"""
+
+    __slots__ = ("key", "burst", "refill_per_second", "idle_ttl_seconds", "cost")
+
+    def __init__(
+        self,
+        key: str,
+        burst: float,
+        refill_per_second: float,
+        idle_ttl_seconds: float,
+        cost: float = 1,
+    ) -> None:
+        """
+        Args:
+            key: Key of the bucket.
+            burst: Capacity of the bucket.
+            refill_per_second: Tokens added back per second.
+            idle_ttl_seconds: Time after which an unused bucket is dropped.
+            cost: Tokens taken by the request.
+        """
+        self.key = key
+        self.burst = burst
+        self.refill_per_second = refill_per_second
+        self.idle_ttl_seconds = idle_ttl_seconds
+        self.cost = cost
+
+
+class LimiterStorage(abc.ABC):
+    """Base class of token bucket storages"""
+
+    evictions = 0
+
+    def consume(self, request: BucketRequest, now: Optional[float] = None) -> bool:
+        """Take tokens for one request, return False if the bucket does not have enough"""
+        return self.consume_many([request], now)[0]
+
+    @abc.abstractmethod
+    def consume_many(self, requests: list[BucketRequest], now: Optional[float] = None) -> list[bool]:
+        """Take tokens for several requests atomically and in one batch"""
+
+    @abc.abstractmethod
+    def __len__(self) -> int:
+        """Number of buckets currently stored"""
+
+    @abc.abstractmethod
+    def close(self) -> None:
+        """Release the resources held by the storage"""
+
+
+class MemoryLimiterStorage(LimiterStorage):
+    """In-process storage with LRU and idle eviction, for a single bot replica"""
+
+    def __init__(self, max_keys: int = 100000) -> None:
+        """
+        Args:
+            max_keys: Maximum number of buckets kept, the least recently used are evicted.
+        """
+        self.max_keys = max_keys
+        # key -> (tokens, last update time, expiry time), least recently used first
+        self._buckets: OrderedDict[str, tuple[float, float, float]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def consume_many(self, requests: list[BucketRequest], now: Optional[float] = None) -> list[bool]:
+        """Refill and take from the buckets under the lock, on the monotonic clock"""
+        now = time.monotonic() if now is None else now
+        results = []
+        with self._lock:
+            self._evict_expired(now)
+            for request in requests:
+                tokens, updated_at, _ = self._buckets.pop(request.key, (request.burst, now, now))
+                tokens = min(request.burst, tokens + (now - updated_at) * request.refill_per_second)
+                allowed = tokens >= request.cost
+                if allowed:
+                    tokens -= request.cost
+                self._buckets[request.key] = (tokens, now, now + request.idle_ttl_seconds)
+                results.append(allowed)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+                self.evictions += 1
+        return results
+
+    def __len__(self) -> int:
+        """Number of buckets in memory, expired ones included until the next call"""
+        return len(self._buckets)
+
+    def close(self) -> None:
+        """Nothing to release, the buckets live in the process"""
+        pass
+
+    def _evict_expired(self, now: float) -> None:
+        # Buckets are ordered by last use, so expired ones are at the front
+        while self._buckets:
+            _, (_, _, expires_at) = next(iter(self._buckets.items()))
+            if now < expires_at:
+                break
+            self._buckets.popitem(last=False)
+            self.evictions += 1
+
+
+class SQLiteLimiterStorage(LimiterStorage):
+    """Storage in a SQLite file, shared by bot replicas running on the same host"""
+
+    # SET expressions all read the row as it was before the update
+    CONSUME_SQL = """
+        INSERT INTO rate_limit_buckets (key, tokens, updated_at, expires_at, allowed)
+        VALUES (:key, CASE WHEN :burst >= :cost THEN :burst - :cost ELSE :burst END, :now, :now + :ttl, :burst >= :cost)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = CASE
+                WHEN MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate) >= :cost
+                THEN MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate) - :cost
+                ELSE MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate)
+            END,
+            allowed = MIN(:burst, tokens + MAX(:now - updated_at, 0) * :rate) >= :cost,
+            updated_at = :now,
+            expires_at = :now + :ttl
+        RETURNING allowed
+    """
+
+    def __init__(self, path: str, purge_every: int = 1000) -> None:
+        """
+        Args:
+            path: Path of the SQLite file shared by the replicas.
+            purge_every: Number of batches between two deletions of expired buckets.
+        """
+        self.path = path
+        self.purge_every = purge_every
+        self._local = threading.local()
+        self._batches = 0
+        self.evictions = 0
+        connection = self._connection()
+        connection.execute(
+            """
+            CREATE TABLE IF NOT EXISTS rate_limit_buckets (
+                key TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                expires_at REAL NOT NULL,
+                allowed INTEGER NOT NULL
+            )
+            """
+        )
+        connection.execute(
+            "CREATE INDEX IF NOT EXISTS ix_rate_limit_buckets_expires_at ON rate_limit_buckets (expires_at)"
+        )
+
+    def consume_many(self, requests: list[BucketRequest], now: Optional[float] = None) -> list[bool]:
+        """Run the batch as one write transaction, on the wall clock shared by the replicas"""
+        # Wall clock time, since monotonic clocks are not shared between processes
+        now = time.time() if now is None else now
+        connection = self._connection()
+        results = []
+        # BEGIN IMMEDIATE takes the write lock once for the whole batch
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            for request in requests:
+                row = connection.execute(
+                    self.CONSUME_SQL,
+                    {
+                        "key": request.key,
+                        "burst": request.burst,
+                        "rate": request.refill_per_second,
+                        "ttl": request.idle_ttl_seconds,
+                        "cost": request.cost,
+                        "now": now,
+                    },
+                ).fetchone()
+                results.append(bool(row[0]))
+            self._batches += 1
+            if self._batches % self.purge_every == 0:
+                deleted = connection.execute(
+                    "DELETE FROM rate_limit_buckets WHERE expires_at <= ?", (now,)
+                ).rowcount
+                self.evictions += deleted
+            connection.execute("COMMIT")
+        except Exception:
+            connection.execute("ROLLBACK")
+            raise
+        return results
+
+    def __len__(self) -> int:
+        """Number of rows in the bucket table, expired ones included until the next purge"""
+        return self._connection().execute("SELECT COUNT(*) FROM rate_limit_buckets").fetchone()[0]
+
+    def close(self) -> None:
+        """Close the connection of the current thread"""
+        connection = getattr(self._local, "connection", None)
+        if connection is not None:
+            connection.close()
+            self._local.connection = None
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            # Autocommit mode, transactions are managed explicitly
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self._local.connection = connection
+        return connection
+
+
+class RedisLimiterStorage(LimiterStorage):
+    """Storage in a Redis server, shared by all replicas
+
+    Requires the redis package. Each bucket is updated atomically by a Lua
+    script and a batch is sent as one pipeline.
+    """
+
+    CONSUME_SCRIPT = """
+        local burst = tonumber(ARGV[1])
+        local rate = tonumber(ARGV[2])
+        local now = tonumber(ARGV[3])
+        local ttl_ms = tonumber(ARGV[4])
+        local cost = tonumber(ARGV[5])
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+        local tokens = tonumber(bucket[1])
+        local updated_at = tonumber(bucket[2])
+        if tokens == nil then
+            tokens = burst
+            updated_at = now
+        end
+        tokens = math.min(burst, tokens + math.max(now - updated_at, 0) * rate)
+        local allowed = 0
+        if tokens >= cost then
+            tokens = tokens - cost
+            allowed = 1
+        end
+        -- tostring() keeps only 14 significant digits, not enough for epoch timestamps
+        redis.call('HSET', KEYS[1], 'tokens', string.format('%.17g', tokens), 'updated_at', string.format('%.17g', now))
+        redis.call('PEXPIRE', KEYS[1], ttl_ms)
+        return allowed
+    """
+
+    def __init__(
+        self,
+        url: str = "redis://localhost:6379/0",
+        prefix: str = "ratelimit:",
+        timeout: float = 1.0,
+        client=None,
+    ) -> None:
+        """
+        Args:
+            url: URL of the Redis server.
+            prefix: Prefix of the bucket keys.
+            timeout: Connection and socket timeout in seconds.
+            client: Redis client to use instead of connecting to `url`.
+        """
+        if client is None:
+            if redis is None:
+                raise ImportError("The redis rate limit storage requires the redis package")
+            client = redis.Redis.from_url(url, socket_timeout=timeout, socket_connect_timeout=timeout)
+        self.client = client
+        self.prefix = prefix
+        # The SHA1 of the script is computed locally, the script is loaded on the first NOSCRIPT
+        self._script = client.register_script(self.CONSUME_SCRIPT)
+
+    def consume_many(self, requests: list[BucketRequest], now: Optional[float] = None) -> list[bool]:
+        """Send the batch as one pipeline of script calls, on the wall clock shared by the replicas"""
+        now = time.time() if now is None else now
+        pipeline = self.client.pipeline(transaction=False)
+        for request in requests:
+            pipeline.evalsha(
+                self._script.sha,
+                1,
+                self.prefix + request.key,
+                repr(float(request.burst)),
+                repr(float(request.refill_per_second)),
+                repr(now),
+                int(request.idle_ttl_seconds * 1000),
+                repr(float(request.cost)),
+            )
+        try:
+            replies = pipeline.execute()
+        except redis.exceptions.NoScriptError:
+            # The server was restarted or flushed its script cache
+            self.client.script_load(self.CONSUME_SCRIPT)
+            return self.consume_many(requests, now)
+        return [reply == 1 for reply in replies]
+
+    def __len__(self) -> int:
+        """Number of bucket keys on the server, Redis expires the idle ones"""
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*", count=1000))
+
+    def close(self) -> None:
+        """Close the connections of the client"""
+        self.client.close()
+
+
+def create_limiter_storage(
+    backend: str,
+    max_keys: int = 100000,
+    sqlite_path: str = "rate_limits.db",
+    redis_url: str = "redis://localhost:6379/0",
+) -> LimiterStorage:
+    """Create the limiter storage for the configured backend"""
+    if backend == "memory":
+        return MemoryLimiterStorage(max_keys=max_keys)
+    if backend == "sqlite":
+        return SQLiteLimiterStorage(sqlite_path)
+    if backend == "redis":
+        return RedisLimiterStorage(redis_url)
+    raise ValueError(f"Unknown rate limit storage backend: {backend}")
@@ -1,4 +1,6 @@
-from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import BigInteger, Column, DateTime, ForeignKey, Index, Integer, String, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.event import listens_for
 from sqlalchemy.orm import DeclarativeBase, relationship
 
 from ..auth.models import User
@@ -17,6 +19,19 @@ class LogEvent(Base, TimeStampMixin):
     content_type = Column(String)
     content = Column(String, nullable=True)
 
+    # Broadcast segments look up the users who sent a callback, e.g. opened an event. Only
+    # callbacks are indexed: their data is at most 64 bytes, while message texts can exceed
+    # the size of a btree index row on Postgres
+    __table_args__ = (
+        Index(
+            "ix_log_events_callback_content_user_id",
+            "content",
+            "user_id",
+            postgresql_where=text("event_type = 'callback'"),
+            sqlite_where=text("event_type = 'callback'"),
+        ),
+    )
+
     def dict(self) -> dict:
         """Return a dictionary representation of the event"""
         return {
@@ -27,3 +42,9 @@ class LogEvent(Base, TimeStampMixin):
             "content": self.content,
             "content_type": self.content_type,
         }
+
+
+@listens_for(Base.metadata, "after_create")
+def drop_log_events_content_index(target, connection: Connection, **kwargs) -> None:
+    """Drop the index of every log event content, replaced by the index of the callbacks"""
+    connection.execute(text("DROP INDEX IF EXISTS ix_log_events_content_user_id"))
@@ -3,14 +3,44 @@ import logging
 from telebot import TeleBot
 from telebot.handler_backends import BaseMiddleware
 from telebot.types import CallbackQuery, Message
+from telebot.types import User as TelegramUser
 
+from ..auth.activity import activity_tracker
+from ..auth.cache import user_cache
+from ..auth.models import User
 from ..auth.service import upsert_user
-from .service import create_event
+from .audit import log_event_writer
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
 
 
+def load_user(data: dict, from_user: TelegramUser) -> User:
+    """Return the cached user, or upsert it when the cache misses or the profile changed"""
+    user = user_cache.get(
+        from_user.id,
+        username=from_user.username,
+        first_name=from_user.first_name,
+        last_name=from_user.last_name,
+    )
+    if user is None:
+        user = upsert_user(
+            data["db_session"],
+            id=from_user.id,
+            username=from_user.username,
+            first_name=from_user.first_name,
+            last_name=from_user.last_name,
+            # A user writing to the bot can be messaged again
+            is_unreachable=False,
+            touch=False,
+        )
+        user_cache.put(user)
+
+    # The activity timestamp is written in bulk, at most once per granularity
+    activity_tracker.touch(user)
+    return user
+
+
 class UserMessageMiddleware(BaseMiddleware):
     """Middleware to log user messages"""
 
@@ -21,14 +51,7 @@ class UserMessageMiddleware(BaseMiddleware):
     def pre_process(self, message: Message, data: dict):
         """Pre-process the message"""
 
-        db_session = data["db_session"]
-        user = upsert_user(
-            db_session,
-            id=message.from_user.id,
-            username=message.from_user.username,
-            first_name=message.from_user.first_name,
-            last_name=message.from_user.last_name,
-        )
+        user = load_user(data, message.from_user)
 
         # Check if user is blocked
         if user.is_blocked:
@@ -38,8 +61,8 @@ class UserMessageMiddleware(BaseMiddleware):
             )
             return
 
-        event = create_event(
-            db_session,
+        # Queue the event, it is written to the database in batches
+        event = log_event_writer.submit(
             user_id=user.id,
             content=message.text,
             content_type=message.content_type,
@@ -48,7 +71,7 @@ class UserMessageMiddleware(BaseMiddleware):
         )
 
         # Log event to the console
-        logger.info(event.dict())
+        logger.info(event)
 
         # Set the user data to the data dictionary
         data["user"] = user
@@ -66,14 +89,7 @@ class UserCallbackMiddleware(BaseMiddleware):
 
     def pre_process(self, callback_query: CallbackQuery, data: dict):
         """Pre-process the callback query"""
-        db_session = data["db_session"]
-        user = upsert_user(
-            db_session,
-            id=callback_query.from_user.id,
-            username=callback_query.from_user.username,
-            first_name=callback_query.from_user.first_name,
-            last_name=callback_query.from_user.last_name,
-        )
+        user = load_user(data, callback_query.from_user)
 
         # Check if user is blocked
         if user.is_blocked:
@@ -83,8 +99,8 @@ class UserCallbackMiddleware(BaseMiddleware):
             )
             return
 
-        event = create_event(
-            db_session,
+        # Queue the event, it is written to the database in batches
+        event = log_event_writer.submit(
             user_id=user.id,
             content=callback_query.data,
             content_type="callback_data",
@@ -93,7 +109,7 @@ class UserCallbackMiddleware(BaseMiddleware):
         )
 
         # Log event to the console
-        logger.info(event.dict())
+        logger.info(event)
 
         # Set the user data to the data dictionary
         data["user"] = user
@@ -4,8 +4,12 @@ from sqlalchemy import (
     Column,
     DateTime,
     event,
+    inspect,
+    literal,
+    text,
 )
 from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.schema import CreateColumn
 
 
 class Base(DeclarativeBase):
@@ -14,6 +18,41 @@ class Base(DeclarativeBase):
     pass
 
 
+@event.listens_for(Base.metadata, "after_create")
+def add_missing_columns(target, connection, **kwargs):
+    """
+    Add the columns and indexes declared after their table was created.
+
+    `create_all` only creates missing tables, so this runs after it and brings
+    existing databases up to date without a migration tool. A column that is
+    not nullable is added with its scalar default as the server default.
+    """
+    dialect = connection.dialect
+    inspector = inspect(connection)
+    existing_tables = set(inspector.get_table_names())
+    for table in target.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+
+        existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing_columns:
+                continue
+            ddl = str(CreateColumn(column).compile(dialect=dialect))
+            if not column.nullable and column.server_default is None:
+                if column.default is None or not column.default.is_scalar:
+                    raise ValueError(f"Cannot add column {table.name}.{column.name} without a scalar default")
+                default = literal(column.default.arg, column.type)
+                ddl += f" DEFAULT {default.compile(dialect=dialect, compile_kwargs={'literal_binds': True})}"
+            table_name = dialect.identifier_preparer.format_table(table)
+            connection.execute(text(f"ALTER TABLE {table_name} ADD COLUMN {ddl}"))
+
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing_indexes:
+                index.create(connection)
+
+
 class TimeStampMixin(object):
     """Timestamping mixin"""
 
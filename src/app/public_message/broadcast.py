@@ -0,0 +1,361 @@
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from functools import partial
+from pathlib import Path
+from typing import Callable, Optional
+
+import pytz
+from apscheduler.jobstores.base import JobLookupError
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.date import DateTrigger
+from omegaconf import OmegaConf
+from sqlalchemy import func, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from telebot import TeleBot
+from telebot.apihelper import ApiTelegramException
+
+from ..auth.cache import user_cache
+from ..auth.service import count_users, mark_user_unreachable, read_user_ids
+from ..database.core import SessionLocal
+from ..gateway import send_gateway
+from .models import (
+    CANCELLED,
+    DONE,
+    MISSED,
+    PENDING_STATUSES,
+    SCHEDULED,
+    SENDING,
+    Broadcast,
+    BroadcastRecipient,
+)
+from .segments import load_segment, segment_conditions
+from .service import copy_scheduled_message, send_scheduled_message
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+# Load configuration
+CURRENT_DIR = Path(__file__).parent
+config = OmegaConf.load(CURRENT_DIR / "config.yaml")
+
+# Recipient outcomes
+PENDING = "pending"
+SENT = "sent"
+FAILED = "failed"
+FORBIDDEN = "forbidden"
+INTERRUPTED = "interrupted"
+
+# Number of recent deliveries used for the latency percentiles of a broadcast
+LATENCY_SAMPLES = 1000
+
+_insert_constructs = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+def _job_id(broadcast_id: int) -> str:
+    return f"broadcast-{broadcast_id}"
+
+
+def _percentile(values: list, fraction: float) -> Optional[float]:
+    if not values:
+        return None
+    return round(values[min(len(values) - 1, int(len(values) * fraction))], 2)
+
+
+class BroadcastEngine:
+    """Sends a broadcast to the users of its segment, streaming the recipients page by page
+
+    Only one page of user ids is held at a time, whatever the number of users.
+    Each page is sent by a small pool of workers in the broadcast lane of the
+    send gateway, which spaces the deliveries to the Telegram limits. The
+    message of the admin is copied, so its media is uploaded only once.
+
+    Every recipient is recorded before its message is sent, and the last user
+    id of each completed page is saved on the broadcast. A broadcast stopped
+    midway resumes after that checkpoint and skips the recorded recipients, so
+    nobody gets the message twice.
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable[[], Session],
+        scheduler: BackgroundScheduler,
+        page_size: int = 100,
+        send_workers: int = 8,
+        misfire_grace_time_seconds: float = 600,
+    ) -> None:
+        """
+        Args:
+            session_factory: Factory producing database sessions.
+            scheduler: Scheduler starting the broadcasts at their time.
+            page_size: Number of user ids read at once, a cancellation is noticed between pages.
+            send_workers: Number of threads sending one page.
+            misfire_grace_time_seconds: Broadcasts not started this long after their time are skipped.
+        """
+        self.session_factory = session_factory
+        self.scheduler = scheduler
+        self.page_size = page_size
+        self.send_workers = send_workers
+        self.misfire_grace_time_seconds = misfire_grace_time_seconds
+        self._stop_event = threading.Event()
+
+    def schedule(self, bot: TeleBot, broadcast_id: int, run_date: datetime) -> None:
+        """Start sending the broadcast at `run_date`, a timezone-aware datetime"""
+        self.scheduler.add_job(
+            self.run,
+            trigger=DateTrigger(run_date=run_date),
+            args=[bot, broadcast_id],
+            id=_job_id(broadcast_id),
+            replace_existing=True,
+            misfire_grace_time=self.misfire_grace_time_seconds,
+        )
+
+    def cancel(self, broadcast_id: int) -> bool:
+        """Cancel a scheduled broadcast or stop one being sent, return False if it is not pending"""
+        with self.session_factory() as session:
+            result = session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status.in_(PENDING_STATUSES))
+                .values(status=CANCELLED)
+            )
+            session.commit()
+        if result.rowcount == 0:
+            return False
+        try:
+            self.scheduler.remove_job(_job_id(broadcast_id))
+        except JobLookupError:
+            # Already started, the sender stops at the next page
+            pass
+        logger.info(f"Broadcast {broadcast_id} cancelled")
+        return True
+
+    def resume(self, bot: TeleBot) -> int:
+        """Schedule the broadcasts left pending by a previous run, return how many were scheduled"""
+        now = datetime.now(pytz.utc)
+        with self.session_factory() as session:
+            pending = session.execute(
+                select(Broadcast.id, Broadcast.status, Broadcast.scheduled_at).where(
+                    Broadcast.status.in_(PENDING_STATUSES)
+                )
+            ).all()
+            missed = [
+                broadcast_id
+                for broadcast_id, status, scheduled_at in pending
+                if status == SCHEDULED
+                and pytz.utc.localize(scheduled_at) + timedelta(seconds=self.misfire_grace_time_seconds) < now
+            ]
+            if missed:
+                session.execute(update(Broadcast).where(Broadcast.id.in_(missed)).values(status=MISSED))
+                session.commit()
+                logger.warning(f"Broadcasts {missed} were due while the bot was stopped and are skipped")
+
+        resumed = 0
+        for broadcast_id, _status, scheduled_at in pending:
+            if broadcast_id in missed:
+                continue
+            self.schedule(bot, broadcast_id, max(pytz.utc.localize(scheduled_at), now))
+            resumed += 1
+        if resumed:
+            logger.info(f"Resumed {resumed} pending broadcasts")
+        return resumed
+
+    def stop(self) -> None:
+        """Stop sending after the current page, the broadcasts being sent are resumed on the next start"""
+        self._stop_event.set()
+        self.scheduler.shutdown(wait=False)
+
+    def run(self, bot: TeleBot, broadcast_id: int) -> None:
+        """Send the broadcast to every user not handled yet, return when all are done or it is cancelled"""
+        with self.session_factory() as session:
+            broadcast = session.get(Broadcast, broadcast_id)
+            if broadcast is None or broadcast.status not in PENDING_STATUSES:
+                logger.info(f"Broadcast {broadcast_id} is not pending, skipping it")
+                return
+            if broadcast.source_message_ids:
+                send = partial(
+                    copy_scheduled_message,
+                    from_chat_id=broadcast.source_chat_id,
+                    message_ids=broadcast.message_ids,
+                )
+            else:
+                send = partial(
+                    send_scheduled_message,
+                    media_type=broadcast.media_type,
+                    message_text=broadcast.content,
+                    message_photo=broadcast.photo,
+                )
+            media_bytes = broadcast.media_bytes or 0
+            last_id = broadcast.last_user_id
+            retried = broadcast.retried_count or 0
+            conditions = segment_conditions(load_segment(broadcast.segment))
+            total = broadcast.recipient_count or count_users(
+                session, reachable_only=True, conditions=conditions
+            )
+
+            # Deliveries cut by a stop may or may not have reached the user, they are not sent again
+            session.execute(
+                update(BroadcastRecipient)
+                .where(BroadcastRecipient.broadcast_id == broadcast_id, BroadcastRecipient.status == PENDING)
+                .values(status=INTERRUPTED)
+            )
+            outcomes = dict(
+                session.execute(
+                    select(BroadcastRecipient.status, func.count())
+                    .where(BroadcastRecipient.broadcast_id == broadcast_id)
+                    .group_by(BroadcastRecipient.status)
+                ).all()
+            )
+            session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id)
+                .values(status=SENDING, recipient_count=total)
+            )
+            session.commit()
+
+        counters = {
+            "sent": outcomes.get(SENT, 0),
+            "failed": outcomes.get(FAILED, 0) + outcomes.get(INTERRUPTED, 0),
+            "forbidden": outcomes.get(FORBIDDEN, 0),
+            "retried": retried,
+        }
+        # Recent send latencies, the percentiles are saved with every checkpoint
+        latencies: deque = deque(maxlen=LATENCY_SAMPLES)
+        logger.info(f"Broadcast {broadcast_id} sending to {total} users, resuming after user {last_id}")
+        started = time.monotonic()
+
+        with ThreadPoolExecutor(self.send_workers, thread_name_prefix=f"broadcast-{broadcast_id}") as executor:
+            while not self._stop_event.is_set():
+                with self.session_factory() as session:
+                    user_ids = read_user_ids(
+                        session,
+                        after_id=last_id,
+                        limit=self.page_size,
+                        reachable_only=True,
+                        conditions=conditions,
+                    )
+                if not user_ids:
+                    break
+
+                results = executor.map(lambda user_id: self._deliver(bot, broadcast_id, user_id, send), user_ids)
+                page_sent = 0
+                for result in results:
+                    if result is None:
+                        continue
+                    status, retries, latency_ms = result
+                    counters[status] += 1
+                    counters["retried"] += retries
+                    if status == SENT:
+                        page_sent += 1
+                        latencies.append(latency_ms)
+                last_id = user_ids[-1]
+                if not self._checkpoint(broadcast_id, last_id, counters, sorted(latencies)):
+                    logger.info(f"Broadcast {broadcast_id} stopped, it was cancelled")
+                    return
+                logger.info(
+                    f"Broadcast {broadcast_id}: {counters} of {total} users, "
+                    f"{page_sent / (time.monotonic() - started):.1f} msg/s"
+                )
+                started = time.monotonic()
+
+        if self._stop_event.is_set():
+            logger.info(f"Broadcast {broadcast_id} interrupted after user {last_id}")
+            return
+        self._finish(broadcast_id)
+        logger.info(
+            f"Broadcast {broadcast_id} done: {counters}, "
+            f"{media_bytes * counters['sent'] / 1024 / 1024:.1f} MB of media not uploaded"
+        )
+
+    def _deliver(self, bot: TeleBot, broadcast_id: int, user_id: int, send: Callable) -> Optional[tuple]:
+        """Record and send the message to one user
+
+        Returns:
+            The outcome, the number of retries and the latency (ms), or None if the user was already handled.
+        """
+        with self.session_factory() as session:
+            insert = _insert_constructs[session.get_bind().dialect.name]
+            reserved = session.execute(
+                insert(BroadcastRecipient)
+                .values(broadcast_id=broadcast_id, user_id=user_id, status=PENDING)
+                .on_conflict_do_nothing()
+            )
+            session.commit()
+        if reserved.rowcount == 0:
+            return None
+
+        status, error = SENT, None
+        started = time.perf_counter()
+        with send_gateway.broadcast() as calls:
+            try:
+                send(bot, user_id)
+            except ApiTelegramException as e:
+                # Blocked by the user or deleted account, later broadcasts skip the user
+                status = FORBIDDEN if e.error_code == 403 else FAILED
+                error = str(e)[:255]
+                if status == FAILED:
+                    logger.error(f"Error sending broadcast {broadcast_id} to {user_id}: {e}")
+            except Exception as e:
+                status, error = FAILED, str(e)[:255]
+                logger.error(f"Error sending broadcast {broadcast_id} to {user_id}: {e}")
+        latency_ms = (time.perf_counter() - started) * 1000
+
+        with self.session_factory() as session:
+            session.execute(
+                update(BroadcastRecipient)
+                .where(BroadcastRecipient.broadcast_id == broadcast_id, BroadcastRecipient.user_id == user_id)
+                .values(status=status, error=error)
+            )
+            session.commit()
+            if status == FORBIDDEN:
+                mark_user_unreachable(session, user_id)
+                # The next message of the user reloads it and clears the flag
+                user_cache.invalidate(user_id)
+        return status, calls["retries"], latency_ms
+
+    def _checkpoint(self, broadcast_id: int, last_user_id: int, counters: dict, latencies: list) -> bool:
+        """Save the progress of a broadcast being sent, return False if it is no longer being sent"""
+        with self.session_factory() as session:
+            result = session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status == SENDING)
+                .values(
+                    last_user_id=last_user_id,
+                    sent_count=counters["sent"],
+                    failed_count=counters["failed"],
+                    forbidden_count=counters["forbidden"],
+                    retried_count=counters["retried"],
+                    latency_p50_ms=_percentile(latencies, 0.50),
+                    latency_p95_ms=_percentile(latencies, 0.95),
+                )
+            )
+            session.commit()
+        return result.rowcount == 1
+
+    def _finish(self, broadcast_id: int) -> None:
+        with self.session_factory() as session:
+            session.execute(
+                update(Broadcast)
+                .where(Broadcast.id == broadcast_id, Broadcast.status == SENDING)
+                .values(status=DONE)
+            )
+            session.commit()
+
+
+# Broadcasts are started at their time by this scheduler, and resumed by `BroadcastEngine.resume`
+scheduler = BackgroundScheduler(timezone=pytz.timezone(config.app.timezone))
+scheduler.start()
+
+broadcast_engine = BroadcastEngine(
+    SessionLocal,
+    scheduler,
+    page_size=config.app.broadcast.page_size,
+    send_workers=config.app.broadcast.send_workers,
+    misfire_grace_time_seconds=config.app.broadcast.misfire_grace_time_seconds,
+)
@@ -1,24 +1,27 @@
 import logging
-import random
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import datetime
 from pathlib import Path
 from typing import Any
 
 import pytz
-from apscheduler.schedulers.background import BackgroundScheduler
-from apscheduler.triggers.date import DateTrigger
 from omegaconf import OmegaConf
 from telebot import TeleBot
 from telebot.types import CallbackQuery, Message
 
 from ..admin.markup import create_admin_menu_markup
-from ..auth.service import read_users
+from ..auth.service import count_users
 from ..markup import create_cancel_button
+from .broadcast import broadcast_engine
 from .markup import create_keyboard_markup
+from .segments import parse_segment, segment_conditions
 from .service import (
+    CANCEL_BROADCAST_PREFIX,
+    add_album_message,
     cancel_scheduled_message,
+    create_broadcast,
     list_scheduled_messages,
-    send_scheduled_message,
+    message_media_size,
 )
 
 # Load configuration
@@ -29,15 +32,12 @@ strings = config.strings
 # Define timezone
 timezone = pytz.timezone(config.app.timezone)
 
-# Initialize and start scheduler
-scheduler = BackgroundScheduler(timezone=timezone)
-scheduler.start()
-
 # Dictionary to store user data during message scheduling
 user_data: dict[str, Any] = {}
 
-# Data structure to store scheduled messages
-scheduled_messages: dict[str, dict] = {}
+# Broadcast of each album being recorded, by media group id
+album_broadcasts: OrderedDict = OrderedDict()
+MAX_PENDING_ALBUMS = 100
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -67,6 +67,18 @@ def register_handlers(bot: TeleBot):
             reply_markup=create_admin_menu_markup(user.lang),
         )
 
+    @bot.message_handler(
+        content_types=["photo", "video", "document", "audio"],
+        func=lambda message: message.media_group_id in album_broadcasts,
+    )
+    def album_message_handler(message: Message, data: dict):
+        add_album_message(
+            data["db_session"],
+            album_broadcasts[message.media_group_id],
+            message.message_id,
+            message_media_size(message),
+        )
+
     @bot.callback_query_handler(func=lambda call: call.data == "public_message")
     def query_handler(call: CallbackQuery, data: dict):
         user = data["user"]
@@ -104,14 +116,33 @@ def register_handlers(bot: TeleBot):
     )
     def list_scheduled_messages_handler(call: CallbackQuery, data: dict):
         user = data["user"]
-        list_scheduled_messages(bot, user, scheduled_messages)
+        list_scheduled_messages(bot, user, data["db_session"])
 
     @bot.callback_query_handler(
         func=lambda call: call.data == "cancel_scheduled_message"
     )
     def cancel_scheduled_message_handler(call: CallbackQuery, data: dict):
         user = data["user"]
-        cancel_scheduled_message(bot, user, scheduled_messages)
+        cancel_scheduled_message(bot, user, data["db_session"])
+
+    @bot.callback_query_handler(
+        func=lambda call: call.data.startswith(CANCEL_BROADCAST_PREFIX)
+    )
+    def cancel_broadcast_handler(call: CallbackQuery, data: dict):
+        """Cancel the broadcast picked in the cancel menu"""
+        user = data["user"]
+        message_id = call.data[len(CANCEL_BROADCAST_PREFIX):]
+
+        # One update by primary key, also stops the broadcast if it is already being sent
+        if message_id.isdigit() and broadcast_engine.cancel(int(message_id)):
+            bot.send_message(
+                call.message.chat.id,
+                strings[user.lang].cancel_message_confirmation.format(
+                    message_id=message_id
+                ),
+            )
+        else:
+            bot.send_message(call.message.chat.id, strings[user.lang].message_not_found)
 
     def get_datetime_input(message: Message, bot: TeleBot, data: dict):
         user = data["user"]
@@ -141,10 +172,15 @@ def register_handlers(bot: TeleBot):
 
             user_data[user.id] = {"datetime": user_datetime_localized}
             sent_message = bot.send_message(
-                user.id, strings[user.lang].record_message_prompt
+                user.id,
+                strings[user.lang].segment_prompt.format(
+                    n_users=count_users(data["db_session"], reachable_only=True)
+                ),
+                reply_markup=create_cancel_button(user.lang),
+                parse_mode="Markdown",
             )
             bot.register_next_step_handler(
-                sent_message, get_message_content, bot, data, user_data, scheduler
+                sent_message, get_segment_input, bot, data, user_data
             )
 
         except ValueError:
@@ -161,79 +197,92 @@ def register_handlers(bot: TeleBot):
             bot.register_next_step_handler(sent_message, get_datetime_input, bot, data)
 
 
+def get_segment_input(
+    message: Message,
+    bot: TeleBot,
+    data: dict,
+    user_data: dict[int, dict],
+):
+    """Get the filters selecting the recipients and show how many users they match"""
+    user = data["user"]
+    try:
+        segment = parse_segment(message.text or "")
+    except ValueError as e:
+        sent_message = bot.send_message(
+            user.id,
+            strings[user.lang].invalid_segment.format(token=e),
+            reply_markup=create_cancel_button(user.lang),
+        )
+        bot.register_next_step_handler(
+            sent_message, get_segment_input, bot, data, user_data
+        )
+        return
+
+    # Counted on the same indexes the broadcast pages through
+    n_users = count_users(
+        data["db_session"], reachable_only=True, conditions=segment_conditions(segment)
+    )
+    user_data[user.id]["segment"] = segment
+    sent_message = bot.send_message(
+        user.id,
+        strings[user.lang].segment_count.format(n_users=n_users)
+        + "\n\n"
+        + strings[user.lang].record_message_prompt,
+        reply_markup=create_cancel_button(user.lang),
+    )
+    bot.register_next_step_handler(
+        sent_message, get_message_content, bot, data, user_data
+    )
+
+
 def get_message_content(
     message: Message,
     bot: TeleBot,
     data: dict,
     user_data: dict[int, dict],
-    scheduler: Any,
 ):
     """Get the message content and schedule the message"""
     user = data["user"]
     db_session = data["db_session"]
     try:
-        media_type = "text" if message.text else "photo"
+        media_type = "album" if message.media_group_id else message.content_type
         content = message.text or message.caption or ""
         photo = message.photo[-1].file_id if message.photo else None
 
         scheduled_datetime = user_data[user.id]["datetime"]
+        segment = user_data[user.id].get("segment", {})
+
+        # One record and one job per broadcast, the recipients are read when it is sent.
+        # The message is copied to them, its media is never uploaded again.
+        broadcast = create_broadcast(
+            db_session,
+            media_type,
+            content,
+            photo,
+            scheduled_datetime,
+            created_by=user.id,
+            source_chat_id=message.chat.id,
+            source_message_ids=[message.message_id],
+            media_bytes=message_media_size(message),
+            segment=segment,
+        )
+        if message.media_group_id:
+            # The other messages of the album arrive as separate updates
+            album_broadcasts[message.media_group_id] = broadcast.id
+            while len(album_broadcasts) > MAX_PENDING_ALBUMS:
+                album_broadcasts.popitem(last=False)
+        broadcast_engine.schedule(bot, broadcast.id, scheduled_datetime)
 
-        message_id = str(random.randint(100, 999))
-        scheduled_messages[message_id] = {
-            "id": message_id,
-            "datetime": scheduled_datetime,
-            "content": content,
-            "media_type": media_type,
-            "photo": photo,
-            "jobs": [],
-        }
-        print(f"Created message: {message_id}")
-
-        target_users = read_users(db_session)
-        for target_user in target_users:
-            # add random delay to avoid spamming
-            scheduled_datetime += timedelta(seconds=random.randint(5, 30))
-
-            job = scheduler.add_job(
-                send_scheduled_message,
-                trigger=DateTrigger(run_date=scheduled_datetime),
-                args=[bot, target_user.id, media_type, content, photo],
-                misfire_grace_time=10,
-            )
-
-            scheduled_messages[message_id]["jobs"].append(job)
         bot.send_message(
             user.id,
             strings[user.lang].message_scheduled_confirmation.format(
-                message_id=message_id,
-                n_users=len(target_users),
+                message_id=broadcast.id,
+                n_users=count_users(
+                    db_session, reachable_only=True, conditions=segment_conditions(segment)
+                ),
                 send_datetime=scheduled_datetime.strftime("%Y-%m-%d %H:%M"),
                 timezone=config.app.timezone,
             ),
         )
     finally:
         user_data.pop(user.id, None)
-
-    @bot.callback_query_handler(func=lambda call: call.data.startswith("cancel_"))
-    def handle_cancel_callback(call: CallbackQuery, data: dict):
-        """Handle cancel callback"""
-        user = data["user"]
-        callback_data = call.data
-
-        message_id = callback_data.replace("cancel_", "")
-        if message_id in scheduled_messages:
-            message_data = scheduled_messages[message_id]
-            for job_id in message_data["jobs"]:
-                try:
-                    scheduler.remove_job(job_id)
-                except Exception as e:
-                    logger.error(f"Error removing job {job_id}: {e}")
-            del scheduled_messages[message_id]
-            bot.send_message(
-                call.message.chat.id,
-                strings[user.lang].cancel_message_confirmation.format(
-                    message_id=message_id
-                ),
-            )
-        else:
-            bot.send_message(call.message.chat.id, strings[user.lang].message_not_found)
@@ -0,0 +1,62 @@
+from sqlalchemy import BigInteger, Column, DateTime, Float, ForeignKey, Integer, String
+
+from ..models import Base, TimeStampMixin
+
+# Broadcast statuses, the pending ones are resumed on startup
+SCHEDULED = "scheduled"
+SENDING = "sending"
+DONE = "done"
+CANCELLED = "cancelled"
+MISSED = "missed"
+PENDING_STATUSES = (SCHEDULED, SENDING)
+
+
+class Broadcast(Base, TimeStampMixin):
+    """Public message sent to every user"""
+
+    __tablename__ = "broadcasts"
+
+    id = Column(Integer, primary_key=True)
+    media_type = Column(String, nullable=False)
+    content = Column(String, nullable=True)
+    photo = Column(String, nullable=True)
+    scheduled_at = Column(DateTime, nullable=False)  # UTC
+    # Messages of the admin copied to every recipient, several for an album
+    source_chat_id = Column(BigInteger, nullable=True)
+    source_message_ids = Column(String, nullable=True)  # comma-separated
+    media_bytes = Column(BigInteger, default=0)  # size of the media in the source messages
+    created_by = Column(BigInteger, nullable=True)
+    # Filters selecting the recipients as JSON, every user when empty
+    segment = Column(String, nullable=True)
+    status = Column(String, nullable=False, default=SCHEDULED, index=True)
+    # Every user up to this id has been handled, sending resumes after it
+    last_user_id = Column(BigInteger, nullable=True)
+    recipient_count = Column(Integer, nullable=True)
+    sent_count = Column(Integer, default=0)
+    failed_count = Column(Integer, default=0)
+    # Refused with 403, the users are flagged as unreachable and skipped by later broadcasts
+    forbidden_count = Column(Integer, default=0)
+    # Deliveries retried after a 429, by the send gateway
+    retried_count = Column(Integer, default=0)
+    # Send latency of the recent deliveries, waiting for the rate limits included
+    latency_p50_ms = Column(Float, nullable=True)
+    latency_p95_ms = Column(Float, nullable=True)
+
+    @property
+    def message_ids(self) -> list[int]:
+        """Ids of the source messages, in the order they were sent"""
+        if not self.source_message_ids:
+            return []
+        return sorted(int(message_id) for message_id in self.source_message_ids.split(","))
+
+
+class BroadcastRecipient(Base):
+    """Outcome of a broadcast for one user, written before the message is sent"""
+
+    __tablename__ = "broadcast_recipients"
+
+    broadcast_id = Column(Integer, ForeignKey(Broadcast.id, ondelete="CASCADE"), primary_key=True)
+    user_id = Column(BigInteger, primary_key=True)
+    # "pending" while sending, then "sent", "failed" or "forbidden", "interrupted" if the bot stopped meanwhile
+    status = Column(String, nullable=False)
+    error = Column(String, nullable=True)
@@ -0,0 +1,74 @@
+import json
+from datetime import datetime, timedelta
+from typing import Optional
+
+from sqlalchemy import false, literal_column, select
+
+from ..auth.models import Role, User
+from ..middleware.models import LogEvent
+
+# Filters of a segment, written `name=value` or `name` for flags
+SEGMENT_FILTERS = ("lang", "role", "active", "event", "not_blocked")
+
+
+def parse_segment(text: str) -> dict:
+    """
+    Parse the filters of a segment, e.g. `lang=ru active=30`, "all" for every user.
+
+    Raises:
+        ValueError: With the filter that could not be parsed.
+    """
+    segment: dict = {}
+    for token in text.replace(",", " ").split():
+        if token.lower() == "all":
+            continue
+        name, _, value = token.partition("=")
+        name = name.lower()
+        if name == "not_blocked" and not value:
+            segment[name] = True
+        elif name in ("lang", "role") and value:
+            segment[name] = value.lower()
+        elif name in ("active", "event") and value.isdigit() and int(value) > 0:
+            segment[name] = int(value)
+        else:
+            raise ValueError(token)
+    return segment
+
+
+def dump_segment(segment: dict) -> Optional[str]:
+    """Serialize a segment for the broadcast record, None for every user"""
+    return json.dumps(segment, sort_keys=True) if segment else None
+
+
+def load_segment(value: Optional[str]) -> dict:
+    return json.loads(value) if value else {}
+
+
+def segment_conditions(segment: dict, now: Optional[datetime] = None) -> list:
+    """
+    Compile a segment to conditions on users.
+
+    Language and role filters are served by the (is_unreachable, lang, id) and
+    (is_unreachable, role_id, id) indexes, activity by the last message
+    timestamp index and event clicks by the (content, user_id) index of the
+    log events.
+    """
+    conditions = []
+    if "lang" in segment:
+        conditions.append(User.lang == segment["lang"])
+    if "role" in segment:
+        role_id = select(Role.id).where(Role.name == segment["role"]).scalar_subquery()
+        conditions.append(User.role_id == role_id)
+    if "active" in segment:
+        since = (now or datetime.now()) - timedelta(days=segment["active"])
+        conditions.append(User.last_message_timestamp >= since)
+    if "event" in segment:
+        clicked = select(LogEvent.user_id).where(
+            LogEvent.content == f"event_{segment['event']}",
+            # A literal, so cached plans still match the predicate of the partial index
+            LogEvent.event_type == literal_column("'callback'"),
+        )
+        conditions.append(User.id.in_(clicked))
+    if segment.get("not_blocked"):
+        conditions.append(User.is_blocked == false())
+    return conditions
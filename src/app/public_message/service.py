@@ -1,18 +1,29 @@
 import logging
+from datetime import datetime
 from pathlib import Path
 from typing import Optional
 
+import pytz
 from omegaconf import OmegaConf
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
 from telebot import TeleBot
-from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup
+from telebot.types import InlineKeyboardButton, InlineKeyboardMarkup, Message
 
 from ..auth.models import User
+from ..gateway import send_gateway
+from .models import PENDING_STATUSES, SENDING, Broadcast
+from .segments import dump_segment
 
 
 # Load configuration
 CURRENT_DIR = Path(__file__).parent
 config = OmegaConf.load(CURRENT_DIR / "config.yaml")
 strings = config.strings
+timezone = pytz.timezone(config.app.timezone)
+
+# Callback data of the buttons of the cancel menu, followed by the broadcast id
+CANCEL_BROADCAST_PREFIX = "cancel_broadcast:"
 
 # Logging
 # Set up logging
@@ -48,47 +59,198 @@ def send_scheduled_message(
     message_photo: Optional[str] = None,
 ):
     """Send a scheduled message to a user"""
-    if media_type == "text":
-        print(f"Sending scheduled message: {message_text}")
-        bot.send_message(user_id, message_text)
-    if media_type == "photo":
-        bot.send_photo(
-            chat_id=user_id,
-            caption=message_text or "",
-            photo=message_photo,
-            disable_notification=False,
-        )
+    # Scheduled messages go to every user, keep them behind interactive replies
+    with send_gateway.broadcast():
+        if media_type == "text":
+            bot.send_message(user_id, message_text)
+        if media_type == "photo":
+            bot.send_photo(
+                chat_id=user_id,
+                caption=message_text or "",
+                photo=message_photo,
+                disable_notification=False,
+            )
 
 
-def list_scheduled_messages(
-    bot: TeleBot, user: User, scheduled_messages: dict[str, dict]
+def copy_scheduled_message(
+    bot: TeleBot, user_id: int, from_chat_id: int, message_ids: list[int]
 ):
-    """List all scheduled messages"""
-    if not scheduled_messages:
+    """Send a scheduled message to a user as a copy of the source messages"""
+    # The media is already stored by Telegram, copies reuse it instead of uploading it again
+    with send_gateway.broadcast():
+        if len(message_ids) == 1:
+            bot.copy_message(user_id, from_chat_id, message_ids[0])
+        else:
+            bot.copy_messages(user_id, from_chat_id, message_ids)
+
+
+def message_media_size(message: Message) -> int:
+    """Return the size in bytes of the media attached to a message, 0 for text"""
+    if message.photo:
+        return message.photo[-1].file_size or 0
+    for content_type in ("document", "video", "audio", "voice", "animation", "video_note"):
+        media = getattr(message, content_type, None)
+        if media is not None:
+            return media.file_size or 0
+    return 0
+
+
+def create_broadcast(
+    db_session: Session,
+    media_type: str,
+    content: Optional[str],
+    photo: Optional[str],
+    scheduled_at: datetime,
+    created_by: Optional[int] = None,
+    source_chat_id: Optional[int] = None,
+    source_message_ids: Optional[list[int]] = None,
+    media_bytes: int = 0,
+    segment: Optional[dict] = None,
+) -> Broadcast:
+    """
+    Store a public message to be sent to every user.
+
+    Args:
+        media_type: The content type of the message, "album" for a media group.
+        content: The message text or caption.
+        photo: The file id of the photo.
+        scheduled_at: The timezone-aware time the sending starts.
+        created_by: The id of the admin who created the message.
+        source_chat_id: The chat of the messages copied to the users.
+        source_message_ids: The messages copied to the users.
+        media_bytes: The size of the media in the source messages.
+        segment: The filters selecting the recipients, every user if empty.
+
+    Returns:
+        The created broadcast.
+    """
+    db_session.expire_on_commit = False
+    try:
+        broadcast = Broadcast(
+            media_type=media_type,
+            content=content,
+            photo=photo,
+            scheduled_at=scheduled_at.astimezone(pytz.utc).replace(tzinfo=None),
+            created_by=created_by,
+            source_chat_id=source_chat_id,
+            source_message_ids=",".join(map(str, source_message_ids or [])) or None,
+            media_bytes=media_bytes,
+            segment=dump_segment(segment or {}),
+        )
+        db_session.add(broadcast)
+        db_session.commit()
+        logger.info(f"Broadcast {broadcast.id} created for {scheduled_at}")
+    except Exception as e:
+        db_session.rollback()
+        logger.error(f"Error creating broadcast: {e}")
+        raise
+    return broadcast
+
+
+def add_album_message(
+    db_session: Session, broadcast_id: int, message_id: int, media_bytes: int
+) -> None:
+    """Add a message of an album to the source messages of a broadcast"""
+    try:
+        db_session.execute(
+            update(Broadcast)
+            .where(Broadcast.id == broadcast_id)
+            .values(
+                source_message_ids=Broadcast.source_message_ids + f",{message_id}",
+                media_bytes=Broadcast.media_bytes + media_bytes,
+            )
+        )
+        db_session.commit()
+    except Exception as e:
+        db_session.rollback()
+        logger.error(f"Error adding message {message_id} to broadcast {broadcast_id}: {e}")
+        raise
+
+
+def read_pending_broadcasts(db_session: Session) -> list[Broadcast]:
+    """Read the broadcasts scheduled or being sent, in the order they start"""
+    return db_session.scalars(
+        select(Broadcast)
+        .where(Broadcast.status.in_(PENDING_STATUSES))
+        .order_by(Broadcast.scheduled_at)
+    ).all()
+
+
+def read_recent_broadcasts(db_session: Session, limit: int = 5) -> list[Broadcast]:
+    """Read the last broadcasts that are no longer pending"""
+    return db_session.scalars(
+        select(Broadcast)
+        .where(Broadcast.status.not_in(PENDING_STATUSES))
+        .order_by(Broadcast.id.desc())
+        .limit(limit)
+    ).all()
+
+
+def _local_time(broadcast: Broadcast) -> str:
+    scheduled_at = pytz.utc.localize(broadcast.scheduled_at).astimezone(timezone)
+    return scheduled_at.strftime("%Y-%m-%d %H:%M")
+
+
+def _delivery_stats(broadcast: Broadcast, lang: str) -> str:
+    stats = strings[lang].broadcast_progress.format(
+        status=broadcast.status,
+        sent=broadcast.sent_count,
+        failed=broadcast.failed_count,
+        forbidden=broadcast.forbidden_count,
+        retried=broadcast.retried_count,
+        total=broadcast.recipient_count,
+    )
+    if broadcast.latency_p50_ms is not None:
+        stats += strings[lang].broadcast_latency.format(
+            p50_ms=broadcast.latency_p50_ms, p95_ms=broadcast.latency_p95_ms
+        )
+    if broadcast.media_bytes and broadcast.source_message_ids:
+        # Every copy reuses the media stored by Telegram instead of uploading it
+        stats += strings[lang].broadcast_upload_avoided.format(
+            megabytes=broadcast.media_bytes * broadcast.sent_count / 1024 / 1024
+        )
+    return stats
+
+
+def list_scheduled_messages(bot: TeleBot, user: User, db_session: Session):
+    """List the pending scheduled messages and the last sent ones, with their delivery counters"""
+    broadcasts = read_pending_broadcasts(db_session)
+    recent = read_recent_broadcasts(db_session)
+    if not broadcasts and not recent:
         bot.send_message(user.id, strings[user.lang].no_scheduled_messages)
         return
 
     response = strings[user.lang].list_public_messages + "\n"
-    for message_id, message_data in scheduled_messages.items():
-        scheduled_time = message_data["datetime"].strftime("%Y-%m-%d %H:%M")
-        response += f"- {message_id}: {scheduled_time} ({config.app.timezone})\n"
+    for broadcast in broadcasts:
+        response += f"- {broadcast.id}: {_local_time(broadcast)} ({config.app.timezone})"
+        if broadcast.status == SENDING:
+            response += _delivery_stats(broadcast, user.lang)
+        response += "\n"
+    if recent:
+        response += "\n" + strings[user.lang].recent_public_messages + "\n"
+        for broadcast in recent:
+            response += f"- {broadcast.id}: {_local_time(broadcast)}"
+            if broadcast.recipient_count is not None:
+                response += _delivery_stats(broadcast, user.lang)
+            else:
+                response += f" — {broadcast.status}"
+            response += "\n"
     bot.send_message(user.id, response)
 
 
-def cancel_scheduled_message(
-    bot: TeleBot, user: User, scheduled_messages: dict[str, dict]
-):
+def cancel_scheduled_message(bot: TeleBot, user: User, db_session: Session):
     """Cancel a scheduled message"""
-    if not scheduled_messages:
+    broadcasts = read_pending_broadcasts(db_session)
+    if not broadcasts:
         bot.send_message(user.id, strings[user.lang].no_scheduled_messages)
         return
 
     # Create keyboard for cancel options
     keyboard = InlineKeyboardMarkup()
-    for message_id, message in scheduled_messages.items():
-        job_label = f"{message_id}: {message['datetime'].strftime('%Y-%m-%d %H:%M')}"
+    for broadcast in broadcasts:
+        job_label = f"{broadcast.id}: {_local_time(broadcast)}"
         keyboard.add(
-            InlineKeyboardButton(job_label, callback_data=f"cancel_{message_id}")
+            InlineKeyboardButton(job_label, callback_data=f"{CANCEL_BROADCAST_PREFIX}{broadcast.id}")
         )
 
     bot.send_message(
@@ -9,6 +9,7 @@ from omegaconf import OmegaConf
 from telebot.states import State, StatesGroup
 from telebot.types import CallbackQuery, Message
 
+from ..auth.cache import user_cache
 from ..auth.service import read_user, upsert_user
 from ..database.core import export_all_tables
 from .markup import create_cancel_button, create_users_menu_markup
@@ -104,6 +105,7 @@ def register_handlers(bot):
         grant_admin_user_id = call.data.split("_")[2]
         db_session = data["db_session"]
         upsert_user(db_session, id=grant_admin_user_id, role_id=0)
+        user_cache.invalidate(grant_admin_user_id)
         bot.send_message(
             user.id,
             app_strings[user.lang].add_admin_confirm.format(
@@ -118,6 +120,7 @@ def register_handlers(bot):
         block_user_id = call.data.split("_")[2]
         db_session = data["db_session"]
         upsert_user(db_session, id=block_user_id, is_blocked=True)
+        user_cache.invalidate(block_user_id)
         bot.send_message(
             user.id,
             app_strings[user.lang].block_user_confirm.format(user_id=block_user_id),
@@ -131,6 +134,7 @@ def register_handlers(bot):
         block_user_id = call.data.split("_")[2]
         db_session = data["db_session"]
         upsert_user(db_session, id=block_user_id, is_blocked=False)
+        user_cache.invalidate(block_user_id)
         bot.send_message(
             user.id,
             app_strings[user.lang].unblock_user_confirm.format(user_id=block_user_id),
@@ -144,6 +148,7 @@ def register_handlers(bot):
         revoke_admin_user_id = call.data.split("_")[2]
         db_session = data["db_session"]
         upsert_user(db_session, id=revoke_admin_user_id, role_id=1)
+        user_cache.invalidate(revoke_admin_user_id)
         bot.send_message(
             user.id,
             app_strings[user.lang].revoke_admin_confirm.format(
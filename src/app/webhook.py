@@ -0,0 +1,54 @@
+import logging
+import threading
+
+from telebot import TeleBot
+from telebot.types import Update
+
+from .executor import ShardedExecutor, update_chat_key
+
+# Set up logging
+logger = logging.getLogger(__name__)
+logging.basicConfig(
+    level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
+)
+
+
+class UpdateDispatcher:
+    """Hands webhook updates to the sharded worker pool of the bot"""
+
+    def __init__(self, bot: TeleBot, executor: ShardedExecutor) -> None:
+        """
+        Args:
+            bot: The threaded Telegram bot instance processing the updates.
+            executor: The bot worker pool, used to reject updates when a shard is full.
+        """
+        self.bot = bot
+        self.executor = executor
+        self._stats_lock = threading.Lock()
+        self._stats = {"accepted": 0, "rejected": 0, "failed": 0}
+
+    def submit(self, payload: bytes) -> bool:
+        """Route a raw update to its chat shard, return False if the shard is full"""
+        try:
+            update = Update.de_json(payload.decode("utf-8"))
+        except Exception as e:
+            self._count("failed")
+            logger.error(f"Error parsing webhook update: {e}")
+            # Telegram would send the same broken update again
+            return True
+
+        # The update is dispatched to its handlers by the worker of its chat
+        if not self.executor.try_submit(update_chat_key(update), self.bot.process_new_updates, [update]):
+            self._count("rejected")
+            return False
+        self._count("accepted")
+        return True
+
+    def stats(self) -> dict:
+        """Return accepted, rejected and failed counters and the pool queue depth"""
+        with self._stats_lock:
+            return {**self._stats, "queued": self.executor.stats()["queued"]}
+
+    def _count(self, name: str) -> None:
+        with self._stats_lock:
+            self._stats[name] += 1
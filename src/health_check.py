@@ -1,11 +1,39 @@
+import hmac
 import threading
-from http.server import HTTPServer, BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
 import logging
+from typing import Callable, Optional
 
 logger = logging.getLogger(__name__)
 
+# Telegram never sends updates bigger than a few hundred kilobytes
+MAX_WEBHOOK_BODY_SIZE = 1024 * 1024
+
+
+class HealthCheckServer(ThreadingHTTPServer):
+    """Threaded HTTP server for the health check, which can also receive webhook updates"""
+
+    daemon_threads = True
+
+    def __init__(self, server_address):
+        """Listen on `server_address`, without webhook handler until one is set"""
+        super().__init__(server_address, HealthCheckHandler)
+        self.webhook_path: Optional[str] = None
+        self.webhook_secret_token: Optional[str] = None
+        self.webhook_handler: Optional[Callable[[bytes], bool]] = None
+
+    def set_webhook_handler(self, path: str, handler: Callable[[bytes], bool], secret_token: Optional[str] = None):
+        """Route POST requests on `path` to `handler`, which returns False when it is overloaded"""
+        self.webhook_path = path
+        self.webhook_secret_token = secret_token
+        self.webhook_handler = handler
+
+
 class HealthCheckHandler(BaseHTTPRequestHandler):
+    """Request handler of the health check and webhook paths"""
+
     def do_GET(self):
+        """Answer OK on the health check paths"""
         if self.path in ['/health', '/']:
             self.send_response(200)
             self.send_header('Content-type', 'text/plain')
@@ -14,14 +42,42 @@ class HealthCheckHandler(BaseHTTPRequestHandler):
         else:
             self.send_response(404)
             self.end_headers()
-    
+
+    def do_POST(self):
+        """Hand a webhook update to the handler of the server, after checking its secret token"""
+        server = self.server
+        if server.webhook_handler is None or self.path != server.webhook_path:
+            self._reply(404)
+            return
+
+        if server.webhook_secret_token:
+            secret_token = self.headers.get('X-Telegram-Bot-Api-Secret-Token', '')
+            if not hmac.compare_digest(secret_token, server.webhook_secret_token):
+                self._reply(403)
+                return
+
+        length = int(self.headers.get('Content-Length', 0))
+        if length <= 0 or length > MAX_WEBHOOK_BODY_SIZE:
+            self._reply(400)
+            return
+
+        # Answer right away, the update is processed by the bot worker pool.
+        # Telegram retries the update later when the pool is full.
+        accepted = server.webhook_handler(self.rfile.read(length))
+        self._reply(200 if accepted else 503)
+
+    def _reply(self, status):
+        self.send_response(status)
+        self.send_header('Content-Length', '0')
+        self.end_headers()
+
     def log_message(self, format, *args):
-        # Suppress default HTTP server logs
+        """Suppress default HTTP server logs"""
         pass
 
 def start_health_check_server(port=8080):
     """Start health check server in a separate thread"""
-    server = HTTPServer(('0.0.0.0', port), HealthCheckHandler)
+    server = HealthCheckServer(('0.0.0.0', port))
     thread = threading.Thread(target=server.serve_forever, daemon=True)
     thread.start()
     logger.info(f"Health check server started on port {port}")
@@ -0,0 +1,50 @@
+from app.auth.cache import UserCache
+from app.auth.models import User
+
+
+def test_user_cache_hit_and_profile_change():
+    # Arrange
+    cache = UserCache(max_size=10, ttl_seconds=60)
+    cache.put(User(id=1, username="alice", first_name="Alice", lang="en"))
+
+    # Act
+    hit = cache.get(1, username="alice", first_name="Alice")
+    renamed = cache.get(1, username="alice_new", first_name="Alice")
+
+    # Assert
+    assert hit.lang == "en"
+    assert renamed is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_user_cache_evicts_least_recently_used():
+    # Arrange
+    cache = UserCache(max_size=2, ttl_seconds=60)
+    cache.put(User(id=1))
+    cache.put(User(id=2))
+    cache.get(1)
+
+    # Act
+    cache.put(User(id=3))
+
+    # Assert
+    assert cache.get(2) is None
+    assert cache.get(1) is not None
+    assert cache.stats()["evictions"] == 1
+
+
+def test_user_cache_ttl_and_invalidation():
+    # Arrange
+    cache = UserCache(max_size=10, ttl_seconds=0)
+    cache.put(User(id=1))
+    fresh_cache = UserCache(max_size=10, ttl_seconds=60)
+    fresh_cache.put(User(id=2))
+
+    # Act
+    fresh_cache.invalidate("2")
+
+    # Assert
+    assert cache.get(1) is None
+    assert fresh_cache.get(2) is None
+    assert fresh_cache.stats()["invalidations"] == 1
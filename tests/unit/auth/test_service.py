@@ -0,0 +1,50 @@
+import pytest
+from sqlalchemy import event
+from sqlalchemy.schema import ColumnDefault
+
+from app.auth import service
+from app.auth.models import User
+from app.auth.service import upsert_user
+
+
+def test_upsert_user_rewrites_the_row_only_when_a_provided_column_changes(db_engine, session_factory):
+    # Arrange
+    statements = []
+    event.listen(db_engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    created = upsert_user(session_factory(), id=1, username="ann", first_name="Ann")
+    statements.clear()
+
+    # Act
+    unchanged = upsert_user(session_factory(), id=1, username="ann", touch=False)
+    unchanged_statements = list(statements)
+    renamed = upsert_user(session_factory(), id=1, username="anna", touch=False)
+    bare = upsert_user(session_factory(), id=1, touch=False)
+
+    # Assert
+    assert created.lang == "ru"
+    assert unchanged.username == "ann"
+    assert unchanged.first_name == "Ann"
+    # The upsert skipped the unchanged row, it was read back
+    assert [statement.split()[0] for statement in unchanged_statements] == ["INSERT", "SELECT"]
+    assert "IS NOT" in unchanged_statements[0]
+    assert renamed.username == "anna"
+    assert renamed.first_name == "Ann"
+    assert bare.username == "anna"
+
+
+def test_upsert_user_evaluates_callable_defaults_and_rejects_context_ones(session_factory, monkeypatch):
+    # Arrange
+    languages = iter(["en", "de"])
+    monkeypatch.setattr(service, "_upsert_statements", {})
+    monkeypatch.setattr(User.__table__.c.lang, "default", ColumnDefault(lambda: next(languages)))
+
+    # Act
+    first = upsert_user(session_factory(), id=1)
+    second = upsert_user(session_factory(), id=2)
+    monkeypatch.setattr(service, "_upsert_statements", {})
+    monkeypatch.setattr(User.__table__.c.lang, "default", ColumnDefault(lambda context: "en"))
+
+    # Assert
+    assert (first.lang, second.lang) == ("en", "de")
+    with pytest.raises(ValueError):
+        upsert_user(session_factory(), id=3)
@@ -0,0 +1,34 @@
+import asyncio
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.auth.service import upsert_user_async
+from app.models import Base
+
+
+def test_upsert_user_async_inserts_then_updates(tmp_path):
+    # Arrange
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path}/test.db")
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+
+    async def run():
+        async with engine.begin() as connection:
+            await connection.run_sync(Base.metadata.create_all)
+        async with session_factory() as session:
+            created = await upsert_user_async(session, id=1, username="old", first_name="Ann")
+        async with session_factory() as session:
+            updated = await upsert_user_async(session, id=1, username="new", touch=False)
+        async with session_factory() as session:
+            unchanged = await upsert_user_async(session, id=1, username="new", touch=False)
+        await engine.dispose()
+        return created, updated, unchanged
+
+    # Act
+    created, updated, unchanged = asyncio.run(run())
+
+    # Assert
+    assert created.username == "old"
+    assert created.lang is not None
+    assert updated.username == "new"
+    assert updated.first_name == "Ann"
+    assert (unchanged.username, unchanged.first_name) == ("new", "Ann")
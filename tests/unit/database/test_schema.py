@@ -0,0 +1,107 @@
+from sqlalchemy import create_engine, inspect, text
+from sqlalchemy.orm import sessionmaker
+
+from app.auth.service import read_user_ids, upsert_user
+from app.auth.models import User
+from app.events.service import read_event_render, read_events_page, search_events
+from app.middleware.audit import LogEventWriter
+from app.models import Base
+from app.public_message.models import Broadcast
+from app.public_message.segments import segment_conditions
+
+
+def test_create_all_adds_columns_and_indexes_to_existing_tables(tmp_path):
+    # Arrange
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    with engine.begin() as connection:
+        # Tables as created before the unreachable flag and the broadcast outcomes
+        connection.execute(text(
+            "CREATE TABLE users (id BIGINT PRIMARY KEY, first_message_timestamp DATETIME, "
+            "last_message_timestamp DATETIME, username VARCHAR, first_name VARCHAR, last_name VARCHAR, "
+            "phone_number VARCHAR, lang VARCHAR, role_id INTEGER, is_blocked BOOLEAN)"
+        ))
+        connection.execute(text("INSERT INTO users (id, lang) VALUES (1, 'ru')"))
+        connection.execute(text(
+            "CREATE TABLE broadcasts (id INTEGER PRIMARY KEY, media_type VARCHAR NOT NULL, content VARCHAR, "
+            "photo VARCHAR, scheduled_at DATETIME NOT NULL)"
+        ))
+
+    # Act
+    Base.metadata.create_all(engine)
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    user = upsert_user(session_factory(), id=1, username="ann", touch=False)
+    with session_factory() as session:
+        reachable = read_user_ids(session, reachable_only=True)
+
+    # Assert
+    assert user.is_unreachable is False
+    assert reachable == [1]
+    inspector = inspect(engine)
+    assert "ix_users_is_unreachable_id" in {index["name"] for index in inspector.get_indexes("users")}
+    broadcast_columns = {column["name"] for column in inspector.get_columns("broadcasts")}
+    assert broadcast_columns == set(Broadcast.__table__.columns.keys())
+
+
+def test_create_all_upgrades_events_table_of_existing_database(tmp_path):
+    # Arrange
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    with engine.begin() as connection:
+        # Events table as created before the image file id, paging index and search index
+        connection.execute(text(
+            "CREATE TABLE events (id INTEGER PRIMARY KEY, name VARCHAR NOT NULL, description VARCHAR, "
+            "image VARCHAR, qtickets_link VARCHAR, datetime DATETIME)"
+        ))
+        connection.execute(text("INSERT INTO events (id, name, image) VALUES (1, 'Jazz', 'https://example.com/a.jpg')"))
+
+    # Act
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as session:
+        page = read_events_page(session)
+        found = search_events(session, "jaz")
+        render = read_event_render(session, 1, "ru")
+
+    # Assert
+    assert [event.name for event in page.events] == ["Jazz"]
+    assert [event.id for event in found] == [1]
+    assert render.photo == "https://example.com/a.jpg"
+    assert "ix_events_datetime_id" in {index["name"] for index in inspect(engine).get_indexes("events")}
+
+
+def test_long_messages_are_logged_and_only_callbacks_are_indexed(tmp_path):
+    # Arrange
+    engine = create_engine(f"sqlite:///{tmp_path}/test.db")
+    with engine.begin() as connection:
+        # Index of every log event content, as created before it was limited to callbacks
+        connection.execute(text(
+            "CREATE TABLE log_events (id INTEGER PRIMARY KEY, user_id BIGINT, event_type VARCHAR, "
+            "state VARCHAR, content_type VARCHAR, content VARCHAR, created_at DATETIME, updated_at DATETIME)"
+        ))
+        connection.execute(text("CREATE INDEX ix_log_events_content_user_id ON log_events (content, user_id)"))
+    Base.metadata.create_all(engine)
+    session_factory = sessionmaker(bind=engine)
+    with session_factory() as session:
+        session.add_all([User(id=1), User(id=2)])
+        session.commit()
+    writer = LogEventWriter(session_factory, batch_size=200, flush_interval_seconds=0.01)
+
+    # Act
+    writer.start()
+    # The longest Telegram message, about 8 KB in UTF-8
+    writer.submit(1, "text", "Ж" * 4096, "message")
+    writer.submit(2, "callback_data", "event_5", "callback")
+    writer.stop()
+    with session_factory() as session:
+        clicked = read_user_ids(session, conditions=segment_conditions({"event": 5}))
+    with engine.connect() as connection:
+        index_sql = connection.execute(text(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'index' AND tbl_name = 'log_events'"
+        )).all()
+
+    # Assert
+    assert writer.stats()["written"] == 2
+    assert writer.stats()["failed"] == 0
+    assert clicked == [2]
+    assert [name for name, _ in index_sql] == ["ix_log_events_callback_content_user_id"]
+    assert "WHERE event_type = 'callback'" in index_sql[0][1]
@@ -0,0 +1,67 @@
+import json
+
+from app.events.catalog import EventCatalog, event_catalog
+from app.events.models import Event
+from app.events.pagination import EventPage
+from app.events.service import create_event, read_catalog_page, remove_event
+
+
+def test_catalog_serves_keyboards_per_language_until_invalidated():
+    # Arrange
+    catalog = EventCatalog(ttl_seconds=60, page_size=10, max_pages=10)
+    page = EventPage([Event(id=1, name="Concert")], None, "n.1")
+    catalog.load(None, page, catalog.version)
+
+    # Act
+    ru = catalog.keyboard("ru")
+    en = catalog.keyboard("en")
+    catalog.invalidate()
+    invalidated = catalog.keyboard("ru")
+
+    # Assert
+    buttons = [button for row in json.loads(ru)["inline_keyboard"] for button in row]
+    assert [button["callback_data"] for button in buttons] == ["event_1", "events_page:n.1", "contact"]
+    assert json.loads(en)["inline_keyboard"][1][0]["text"] == "Next »"
+    assert invalidated is None
+    assert catalog.stats()["hits"] == 2
+    assert catalog.stats()["invalidations"] == 1
+
+
+def test_catalog_discards_load_started_before_invalidation_and_evicts_pages():
+    # Arrange
+    catalog = EventCatalog(ttl_seconds=60, page_size=10, max_pages=1)
+    version = catalog.version
+    catalog.invalidate()
+
+    # Act
+    loaded = catalog.load(None, EventPage([Event(id=1, name="Removed meanwhile")], None, None), version)
+    catalog.load("n.1", EventPage([], None, None), catalog.version)
+    catalog.load("n.2", EventPage([], None, None), catalog.version)
+
+    # Assert
+    assert loaded.events[0].name == "Removed meanwhile"
+    assert catalog.page(None) is None
+    assert catalog.page("n.1") is None
+    assert catalog.page("n.2") is not None
+    assert catalog.stats()["evictions"] == 1
+
+
+def test_event_changes_invalidate_catalog(session_factory):
+    # Arrange
+    with session_factory() as session:
+        read_catalog_page(session)
+
+    # Act
+    with session_factory() as session:
+        event = create_event(session, {"name": "Festival"})
+    after_create = event_catalog.keyboard("ru")
+    with session_factory() as session:
+        read_catalog_page(session)
+        loaded = event_catalog.keyboard("ru")
+        remove_event(session, event.id)
+    after_remove = event_catalog.keyboard("ru")
+
+    # Assert
+    assert after_create is None
+    assert "Festival" in loaded
+    assert after_remove is None
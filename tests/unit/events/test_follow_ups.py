@@ -0,0 +1,80 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import select
+
+from app.events.follow_ups import FollowUpDispatcher, claim_due_follow_ups, schedule_follow_ups
+from app.events.models import FollowUp
+
+
+class FakeBot:
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, user_id, text):
+        self.sent.append((user_id, text))
+
+
+def test_repeated_schedules_coalesce_and_claims_do_not_overlap(session_factory):
+    # Arrange
+    now = datetime(2024, 1, 1, 12, 0)
+    for clicked_at in (now, now + timedelta(seconds=30)):
+        schedule_follow_ups(session_factory(), 1, [("check_spam", "Check spam", 300)], now=clicked_at)
+    schedule_follow_ups(session_factory(), 2, [("check_spam", "Check spam", 60)], now=now)
+
+    # Act
+    first = claim_due_follow_ups(session_factory(), 10, 60, now=now + timedelta(seconds=400))
+    second = claim_due_follow_ups(session_factory(), 10, 60, now=now + timedelta(seconds=401))
+
+    # Assert
+    assert sorted(follow_up.user_id for follow_up in first) == [1, 2]
+    assert second == []
+    with session_factory() as session:
+        assert session.scalar(select(FollowUp.due_at).where(FollowUp.user_id == 1)) == now + timedelta(seconds=330)
+
+
+def test_dispatcher_sends_and_deletes_due_follow_ups(session_factory):
+    # Arrange
+    now = datetime.now()
+    schedule_follow_ups(
+        session_factory(), 1, [("email_confirmation", "Confirm", 0), ("check_spam", "Spam", 300)], now=now
+    )
+    dispatcher = FollowUpDispatcher(session_factory)
+    bot = FakeBot()
+    dispatcher.bot = bot
+
+    # Act
+    claimed = dispatcher.dispatch(now=now + timedelta(seconds=1))
+
+    # Assert
+    assert claimed == 1
+    assert bot.sent == [(1, "Confirm")]
+    with session_factory() as session:
+        assert session.scalars(select(FollowUp.template)).all() == ["check_spam"]
+
+
+def test_one_dispatcher_thread_sends_many_due_follow_ups(session_factory):
+    # Arrange
+    now = datetime.now()
+    for user_id in range(1, 126):
+        schedule_follow_ups(
+            session_factory(), user_id, [("email_confirmation", "Confirm", 0), ("check_spam", "Spam", 0)], now=now
+        )
+    dispatcher = FollowUpDispatcher(session_factory, poll_interval_seconds=0.01, batch_size=50, send_workers=2)
+    bot = FakeBot()
+
+    # Act
+    dispatcher.start(bot)
+    deadline = time.monotonic() + 10
+    while dispatcher.stats()["sent"] < 250 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    dispatchers = [thread for thread in threading.enumerate() if thread.name == "follow-up-dispatcher"]
+    dispatcher.stop()
+
+    # Assert
+    assert len(dispatchers) == 1
+    assert len(bot.sent) == 250
+    assert len(set(bot.sent)) == 250
+    with session_factory() as session:
+        assert session.scalars(select(FollowUp.id)).all() == []
@@ -0,0 +1,54 @@
+from telebot.types import Message
+
+from app.events.render import is_image_url, sent_photo_file_id
+from app.events.service import create_event, read_event_render, set_event_image_file_id
+
+
+def photo_message(*file_ids):
+    sizes = [
+        {"file_id": file_id, "file_unique_id": file_id, "width": width, "height": width}
+        for width, file_id in enumerate(file_ids, start=1)
+    ]
+    return Message.de_json(
+        {"message_id": 1, "date": 0, "chat": {"id": 1, "type": "private"}, "photo": sizes}
+    )
+
+
+def test_url_image_is_sent_by_file_id_once_captured(session_factory):
+    # Arrange
+    url = "https://example.com/poster.jpg"
+    with session_factory() as session:
+        event_id = create_event(session, {"name": "Jazz", "image_url": url}).id
+        first = read_event_render(session, event_id, "ru")
+
+    # Act
+    file_id = sent_photo_file_id(photo_message("small", "large"))
+    with session_factory() as session:
+        set_event_image_file_id(session, event_id, first.photo, file_id)
+        # A concurrent first send captured another id, the first one is kept
+        set_event_image_file_id(session, event_id, first.photo, "other")
+        later = read_event_render(session, event_id, "ru")
+
+    # Assert
+    assert first.photo == url
+    assert is_image_url(first.photo)
+    assert later.photo == "large"
+    assert not is_image_url(later.photo)
+
+
+def test_prewarmed_and_uploaded_images_are_not_urls(session_factory):
+    # Arrange
+
+    # Act
+    with session_factory() as session:
+        event_id = create_event(
+            session,
+            {"name": "Jazz", "image_url": "https://example.com/poster.jpg", "image_file_id": "prewarmed"},
+        ).id
+        render = read_event_render(session, event_id, "ru")
+
+    # Assert
+    assert render.photo == "prewarmed"
+    assert not is_image_url("AgACAgIAAxkBAAIB")
+    assert not is_image_url(None)
+    assert sent_photo_file_id(None) is None
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert
+
+from app.events.models import Event
+from app.events.pagination import decode_cursor, encode_cursor
+from app.events.service import read_events_page
+
+
+def test_pages_follow_datetime_order_both_ways(session_factory):
+    # Arrange
+    start = datetime(2025, 1, 1, 18, 0)
+    # Two events share each date, every fifth event has no date
+    rows = [
+        {"id": id, "name": f"Event {id}", "datetime": None if id % 5 == 0 else start + timedelta(days=(25 - id) // 2)}
+        for id in range(1, 26)
+    ]
+    with session_factory() as session:
+        session.execute(insert(Event), rows)
+        session.commit()
+    expected = sorted(rows, key=lambda row: (row["datetime"] is None, row["datetime"] or start, row["id"]))
+
+    # Act
+    forward, cursor = [], None
+    with session_factory() as session:
+        while True:
+            page = read_events_page(session, cursor, limit=4)
+            forward.append([event.id for event in page.events])
+            if page.next_cursor is None:
+                break
+            cursor = page.next_cursor
+        backward, cursor = [], page.prev_cursor
+        while cursor is not None:
+            page = read_events_page(session, cursor, limit=4)
+            backward.append([event.id for event in page.events])
+            cursor = page.prev_cursor
+
+    # Assert
+    assert [id for ids in forward for id in ids] == [row["id"] for row in expected]
+    assert [len(ids) for ids in forward] == [4, 4, 4, 4, 4, 4, 1]
+    assert backward == forward[-2::-1]
+
+
+def test_cursor_round_trip_and_malformed_cursor(session_factory):
+    # Arrange
+    event_datetime = datetime(2025, 5, 17, 19, 30, 0, 250)
+
+    # Act
+    cursor = encode_cursor("n", event_datetime, 1234)
+
+    # Assert
+    assert decode_cursor(cursor) == ("n", event_datetime, 1234)
+    assert decode_cursor(encode_cursor("p", None, 7)) == ("p", None, 7)
+    assert len(cursor) < 20
+    with session_factory() as session, pytest.raises(ValueError):
+        read_events_page(session, "x.zz")
+    with pytest.raises(ValueError):
+        decode_cursor("nzzzzzzzzzzzzzzzzzz.1")
+    with pytest.raises(ValueError):
+        decode_cursor("n-zzzzzzzzzzzz.1")
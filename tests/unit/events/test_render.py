@@ -0,0 +1,67 @@
+import json
+
+from app.events.models import Event
+from app.events.render import RenderCache, render_event
+from app.events.service import create_event, read_event_render, remove_event
+
+
+def test_render_event_formats_each_language():
+    # Arrange
+    event = Event(id=1, name="Jazz", description="Live", qtickets_link="https://example.com/jazz")
+    no_link = Event(id=2, name="Talk", description="Free entry", image="photo-file-id")
+    no_description = Event(id=3, name="Quiz")
+
+    # Act
+    ru = render_event("ru", event)
+    en = render_event("en", event)
+    without_link = render_event("ru", no_link)
+    without_link_en = render_event("en", no_link)
+    without_description = render_event("ru", no_description)
+
+    # Assert
+    assert ru.text == "**Jazz**\n\nLive"
+    assert "Registration: https://example.com/jazz" in en.text
+    assert json.loads(ru.reply_markup)["inline_keyboard"][0][0]["url"] == "https://example.com/jazz"
+    assert without_link.reply_markup is None
+    assert without_link_en.text.endswith("Registration: ")
+    assert "None" not in without_link_en.text
+    assert without_link.photo == "photo-file-id"
+    assert without_description.text == "**Quiz**\n\n"
+
+
+def test_render_cache_ignores_renders_of_previous_versions():
+    # Arrange
+    cache = RenderCache(max_size=10, ttl_seconds=60)
+    render = render_event("ru", Event(id=1, name="Jazz", description="Live"))
+    version = cache.version(1)
+    cache.invalidate(1)
+
+    # Act
+    cache.put(1, "ru", render, version)
+    stale = cache.get(1, "ru")
+    cache.put(1, "ru", render, cache.version(1))
+    fresh = cache.get(1, "ru")
+
+    # Assert
+    assert stale is None
+    assert fresh == render
+
+
+def test_clicks_are_rendered_once_until_the_event_changes(session_factory):
+    # Arrange
+    with session_factory() as session:
+        event_id = create_event(session, {"name": "Jazz", "description": "Live"}).id
+        read_event_render(session, event_id, "ru")
+
+    # Act
+    with session_factory() as session:
+        cached = read_event_render(session, event_id, "ru")
+        # A session begins a transaction on its first query
+        queried = session.in_transaction()
+        remove_event(session, event_id)
+        removed = read_event_render(session, event_id, "ru")
+
+    # Assert
+    assert cached.text == "**Jazz**\n\nLive"
+    assert queried is False
+    assert removed is None
@@ -0,0 +1,53 @@
+import asyncio
+from types import SimpleNamespace
+
+from app.events.render import EventRender
+from app.events.replies import captured_image_file_id, event_details_reply, send_reply
+
+
+class RecordingBot:
+    def __init__(self):
+        self.calls = []
+
+    def send_photo(self, chat_id, photo, **kwargs):
+        self.calls.append(("send_photo", chat_id, photo, kwargs["caption"]))
+        return SimpleNamespace(photo=[SimpleNamespace(file_id="small"), SimpleNamespace(file_id="large")])
+
+
+class RecordingAsyncBot(RecordingBot):
+    async def send_photo(self, chat_id, photo, **kwargs):
+        return RecordingBot.send_photo(self, chat_id, photo, **kwargs)
+
+
+def test_event_details_reply_is_sent_the_same_way_by_both_bots():
+    # Arrange
+    user = SimpleNamespace(id=7, lang="ru")
+    call = SimpleNamespace(message=SimpleNamespace(message_id=3))
+    render = EventRender("**Concert**", "Markdown", None, "https://example.com/concert.jpg")
+    reply = event_details_reply(user, call, render)
+    bot, async_bot = RecordingBot(), RecordingAsyncBot()
+
+    # Act
+    sent = send_reply(bot, reply)
+    async_sent = asyncio.run(send_reply(async_bot, reply))
+
+    # Assert
+    assert bot.calls == async_bot.calls == [("send_photo", 7, "https://example.com/concert.jpg", "**Concert**")]
+    assert captured_image_file_id(render, sent) == captured_image_file_id(render, async_sent) == "large"
+
+
+def test_event_details_reply_edits_the_message_without_image_and_reports_missing_events():
+    # Arrange
+    user = SimpleNamespace(id=7, lang="ru")
+    call = SimpleNamespace(message=SimpleNamespace(message_id=3))
+    render = EventRender("**Concert**", "Markdown", None, "file-id")
+
+    # Act
+    edited = event_details_reply(user, call, render._replace(photo=None))
+    missing = event_details_reply(user, call, None)
+
+    # Assert
+    assert edited.method == "edit_message_text"
+    assert edited.kwargs["message_id"] == 3
+    assert missing.method == "send_message"
+    assert captured_image_file_id(render, None) is None
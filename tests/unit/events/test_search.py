@@ -0,0 +1,50 @@
+from app.events.search import next_offset, search_cache
+from app.events.service import create_event, remove_event, search_events
+
+
+def test_search_matches_word_prefixes_in_name_and_description(session_factory):
+    # Arrange
+    with session_factory() as session:
+        create_event(session, {"name": "Джазовый вечер", "description": "Живая музыка в клубе"})
+        create_event(session, {"name": "Tech Conference", "description": "Talks about music software"})
+        create_event(session, {"name": "Книжная ярмарка", "description": None})
+
+    # Act
+    with session_factory() as session:
+        jazz = search_events(session, "джаз")
+        music = search_events(session, "MUSIC")
+        both_words = search_events(session, "живая муз")
+        everything = search_events(session, "")
+        nothing = search_events(session, "opera")
+
+    # Assert
+    assert [event.name for event in jazz] == ["Джазовый вечер"]
+    assert [event.name for event in music] == ["Tech Conference"]
+    assert [event.name for event in both_words] == ["Джазовый вечер"]
+    assert len(everything) == 3
+    assert nothing == []
+
+
+def test_search_results_are_cached_until_events_change(session_factory):
+    # Arrange
+    with session_factory() as session:
+        first_id = create_event(session, {"name": "Open air 1"}).id
+        create_event(session, {"name": "Open air 2"})
+        create_event(session, {"name": "Open air 3"})
+
+    # Act
+    with session_factory() as session:
+        page = search_events(session, "open air", offset=0, limit=2)
+        hits = search_cache.stats()["hits"]
+        search_events(session, "Open, AIR!", offset=0, limit=2)
+        cached_hits = search_cache.stats()["hits"]
+        remove_event(session, first_id)
+        after_remove = search_events(session, "open air", offset=0, limit=2)
+
+    # Assert
+    assert [event.name for event in page] == ["Open air 1", "Open air 2"]
+    assert cached_hits == hits + 1
+    assert [event.name for event in after_remove] == ["Open air 2", "Open air 3"]
+    assert next_offset(0, len(page), page_size=2, max_results=200) == "2"
+    assert next_offset(2, 1, page_size=2, max_results=200) == ""
+    assert next_offset(198, 2, page_size=2, max_results=200) == ""
@@ -0,0 +1,58 @@
+import asyncio
+import json
+
+from telebot import TeleBot
+from telebot.types import Update
+
+from app.async_main import BridgedAsyncTeleBot
+from app.executor import ShardedExecutor
+
+
+def command(update_id, chat_id, text):
+    return Update.de_json(
+        json.dumps(
+            {
+                "update_id": update_id,
+                "message": {
+                    "message_id": update_id,
+                    "date": 0,
+                    "chat": {"id": chat_id, "type": "private"},
+                    "from": {"id": chat_id, "is_bot": False, "first_name": "User"},
+                    "text": text,
+                    "entities": [{"type": "bot_command", "offset": 0, "length": len(text)}],
+                },
+            }
+        )
+    )
+
+
+def test_updates_of_a_chat_keep_their_order_across_native_and_bridged_handlers():
+    # Arrange
+    processed = []
+    sync_bot = TeleBot("1:token")
+    sync_bot.worker_pool.close()
+    sync_bot.worker_pool = ShardedExecutor(sync_bot, shards=2)
+    sync_bot.worker_pool.start()
+    sync_bot.message_handler(commands=["menu"])(lambda message: processed.append((message.chat.id, "menu")))
+    bot = BridgedAsyncTeleBot("1:token", sync_bot)
+
+    @bot.message_handler(commands=["start"])
+    async def start(message):
+        # Slower than the bridged handler, which must still wait for it
+        await asyncio.sleep(0.05)
+        processed.append((message.chat.id, "start"))
+
+    async def receive():
+        first = asyncio.create_task(bot.process_new_updates([command(1, 7, "/start"), command(2, 8, "/menu")]))
+        await asyncio.sleep(0)
+        second = asyncio.create_task(bot.process_new_updates([command(3, 7, "/menu"), command(4, 7, "/start")]))
+        await asyncio.gather(first, second)
+
+    # Act
+    asyncio.run(receive())
+    sync_bot.worker_pool.close()
+
+    # Assert
+    assert [name for chat_id, name in processed if chat_id == 7] == ["start", "menu", "start"]
+    assert processed[0] == (8, "menu")
+    assert bot.stats() == {"native": 2, "bridged": 2}
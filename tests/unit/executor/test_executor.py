@@ -0,0 +1,95 @@
+import threading
+from types import SimpleNamespace
+
+from app.executor import ShardedExecutor
+
+
+def make_message(chat_id, number):
+    return SimpleNamespace(chat=SimpleNamespace(id=chat_id), number=number)
+
+
+def test_updates_of_a_chat_run_in_order():
+    # Arrange
+    executor = ShardedExecutor(shards=4, max_queue_size=100)
+    processed = {}
+    lock = threading.Lock()
+
+    def handle(message):
+        with lock:
+            processed.setdefault(message.chat.id, []).append(message.number)
+
+    # Act
+    executor.start()
+    for number in range(50):
+        for chat_id in range(10):
+            executor.put(handle, make_message(chat_id, number))
+    executor.close()
+
+    # Assert
+    assert all(numbers == list(range(50)) for numbers in processed.values())
+    assert len(processed) == 10
+    assert executor.stats()["queued"] == 0
+
+
+def test_try_submit_rejects_when_shard_is_full():
+    # Arrange
+    executor = ShardedExecutor(shards=1, max_queue_size=1)
+    message = make_message(1, 0)
+
+    # Act
+    accepted = executor.try_submit(1, lambda message: None, message)
+    rejected = executor.try_submit(1, lambda message: None, message)
+
+    # Assert
+    assert accepted is True
+    assert rejected is False
+    assert executor.stats()["rejected"] == 1
+
+
+def test_tasks_queued_by_a_worker_run_in_order_in_that_worker():
+    # Arrange
+    executor = ShardedExecutor(shards=2, max_queue_size=1)
+    processed = []
+
+    def handle(message):
+        processed.append((message.number, threading.current_thread().name))
+
+    def process_update(message):
+        # What telebot's process_new_updates does with each handler of the update
+        for number in range(3):
+            executor.put(handle, make_message(message.chat.id, number))
+
+    # Act
+    executor.start()
+    submitted = executor.try_submit(1, process_update, make_message(1, 0))
+    executor.close()
+
+    # Assert
+    assert submitted is True
+    assert [number for number, _ in processed] == [0, 1, 2]
+    assert len({thread for _, thread in processed}) == 1
+
+
+def test_task_errors_are_given_to_the_bot_exception_handler():
+    # Arrange
+    handled = []
+    exception_handler = SimpleNamespace(handle=lambda e: handled.append(e) or isinstance(e, KeyError))
+    executor = ShardedExecutor(SimpleNamespace(exception_handler=exception_handler), shards=1)
+
+    def fail(message):
+        raise message.error
+
+    # Act
+    executor.start()
+    executor.put(fail, SimpleNamespace(chat=SimpleNamespace(id=1), error=KeyError("handled")))
+    executor.close()
+    handled_event = executor.exception_event.is_set()
+    executor.start()
+    executor.put(fail, SimpleNamespace(chat=SimpleNamespace(id=1), error=ValueError("unhandled")))
+    executor.close()
+
+    # Assert
+    assert [type(e) for e in handled] == [KeyError, ValueError]
+    assert handled_event is False
+    assert isinstance(executor.exception_info, ValueError)
+    assert executor.stats()["shards"][0]["failed"] == 2
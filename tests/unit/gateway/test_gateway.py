@@ -0,0 +1,116 @@
+import asyncio
+import io
+import json
+import time
+from types import SimpleNamespace
+
+from telebot.apihelper import ApiTelegramException
+
+from app.gateway import SendGateway
+
+URL = "https://api.telegram.org/bot1:x/sendMessage"
+
+
+def make_sender(statuses):
+    """Return a request sender answering with the given status codes, then 200"""
+    calls = []
+
+    def sender(method, url, files=None, **kwargs):
+        calls.append(time.monotonic())
+        if files:
+            # Keep what an upload would read
+            sender.uploads.append({name: value[1].read() for name, value in files.items()})
+        status = statuses.pop(0) if statuses else 200
+        body = {"ok": False, "parameters": {"retry_after": 0.05}} if status == 429 else {"ok": True}
+        return SimpleNamespace(status_code=status, text=json.dumps(body))
+
+    sender.uploads = []
+    return sender, calls
+
+
+def test_chat_bucket_throttles_deliveries_to_one_chat():
+    # Arrange
+    gateway = SendGateway(chat_rate_per_second=20, chat_burst=1)
+    gateway._sender, calls = make_sender([])
+
+    # Act
+    for _ in range(3):
+        gateway.request("post", URL, params={"chat_id": 1, "text": "hi"})
+    gateway.request("post", URL, params={"chat_id": 2, "text": "hi"})
+
+    # Assert
+    assert calls[2] - calls[0] >= 0.09
+    assert gateway.stats()["interactive_sent"] == 4
+    assert gateway.stats()["interactive_throttled"] == 2
+
+
+def test_rate_limited_call_is_retried_after_retry_after():
+    # Arrange
+    gateway = SendGateway()
+    gateway._sender, calls = make_sender([429])
+
+    # Act
+    with gateway.broadcast() as broadcast_calls:
+        response = gateway.request("post", URL, params={"chat_id": 1, "text": "hi"})
+
+    # Assert
+    assert response.status_code == 200
+    assert broadcast_calls["retries"] == 1
+    assert calls[1] - calls[0] >= 0.05
+    assert gateway.stats()["rate_limited"] == 1
+    assert gateway.stats()["retries"] == 1
+    assert gateway.stats()["broadcast_sent"] == 1
+
+
+class UnseekableStream(io.BytesIO):
+    def seekable(self):
+        return False
+
+
+def test_rate_limited_upload_is_resent_whole_or_not_retried():
+    # Arrange
+    gateway = SendGateway()
+    photo_url = "https://api.telegram.org/bot1:x/sendPhoto"
+    gateway._sender, calls = make_sender([429, 200, 429])
+    sender = gateway._sender
+
+    # Act
+    retried = gateway.request(
+        "post", photo_url, params={"chat_id": 1}, files={"photo": ("photo.jpg", io.BytesIO(b"jpeg"))}
+    )
+    not_retried = gateway.request(
+        "post", photo_url, params={"chat_id": 2}, files={"photo": ("photo.jpg", UnseekableStream(b"jpeg"))}
+    )
+
+    # Assert
+    assert retried.status_code == 200
+    assert not_retried.status_code == 429
+    assert sender.uploads == [{"photo": b"jpeg"}, {"photo": b"jpeg"}, {"photo": b"jpeg"}]
+    assert gateway.stats()["retries"] == 1
+
+
+def test_async_replies_share_the_chat_buckets_and_are_retried_on_429():
+    # Arrange
+    gateway = SendGateway(chat_rate_per_second=20, chat_burst=1)
+    gateway._sender, calls = make_sender([])
+    rate_limited = [{"error_code": 429, "description": "Too Many Requests", "parameters": {"retry_after": 0.05}}]
+
+    async def async_sender(token, url, method, params, files, **kwargs):
+        calls.append(time.monotonic())
+        if rate_limited:
+            raise ApiTelegramException(url, None, rate_limited.pop())
+        return {"message_id": 1}
+
+    gateway._async_sender = async_sender
+
+    # Act
+    gateway.request("post", URL, params={"chat_id": 1, "text": "hi"})
+    result = asyncio.run(gateway.request_async("1:x", "sendMessage", "post", params={"chat_id": 1, "text": "hi"}))
+
+    # Assert
+    assert result == {"message_id": 1}
+    assert calls[1] - calls[0] >= 0.045
+    assert calls[2] - calls[1] >= 0.05
+    assert gateway.stats()["interactive_sent"] == 2
+    assert gateway.stats()["rate_limited"] == 1
+    assert gateway.stats()["retries"] == 1
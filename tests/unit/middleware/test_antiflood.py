@@ -0,0 +1,83 @@
+from datetime import datetime
+
+import pytz
+from telebot import TeleBot
+from telebot.types import Update
+
+from app.middleware.antiflood import AntifloodMiddleware, TokenBucketLimiter
+from app.middleware.database import DatabaseMiddleware
+from app.public_message.handlers import album_broadcasts, register_handlers
+from app.public_message.models import Broadcast
+from app.public_message.service import create_broadcast
+
+
+def test_token_bucket_burst_and_refill():
+    # Arrange
+    limiter = TokenBucketLimiter(burst=2, refill_per_second=0.5)
+
+    # Act
+    allowed = [limiter.consume(1, now=0.0) for _ in range(3)]
+    refilled = limiter.consume(1, now=2.0)
+
+    # Assert
+    assert allowed == [True, True, False]
+    assert refilled is True
+
+
+def test_token_bucket_memory_is_bounded():
+    # Arrange
+    limiter = TokenBucketLimiter(burst=1, refill_per_second=1, max_keys=2, idle_ttl_seconds=60)
+
+    # Act
+    for user_id in range(5):
+        limiter.consume(user_id, now=0.0)
+    limiter.consume(10, now=120.0)
+
+    # Assert
+    assert len(limiter) == 1
+    assert limiter.evictions == 5
+
+
+def album_update(update_id, message_id):
+    return Update.de_json(
+        {
+            "update_id": update_id,
+            "message": {
+                "message_id": message_id,
+                "date": 0,
+                "chat": {"id": 7, "type": "private"},
+                "from": {"id": 7, "is_bot": False, "first_name": "Admin"},
+                "media_group_id": "album",
+                "photo": [
+                    {"file_id": f"photo-{message_id}", "file_unique_id": str(message_id), "width": 1, "height": 1, "file_size": 10}
+                ],
+            },
+        }
+    )
+
+
+def test_every_item_of_an_album_is_recorded_with_the_antiflood_active(session_factory, monkeypatch):
+    # Arrange
+    bot = TeleBot("1:token", threaded=False, use_class_middlewares=True)
+    antiflood = AntifloodMiddleware(bot, limit=2, burst=3)
+    bot.setup_middleware(DatabaseMiddleware(bot, session_factory))
+    bot.setup_middleware(antiflood)
+    register_handlers(bot)
+    # The first item of the album creates the broadcast, the others are added to it
+    first = album_update(1, 1)
+    broadcast = create_broadcast(
+        session_factory(), "album", None, None, datetime.now(pytz.utc), source_message_ids=[1], media_bytes=10
+    )
+    monkeypatch.setitem(album_broadcasts, "album", broadcast.id)
+
+    # Act
+    charged = antiflood.pre_process(first.message, {})
+    bot.process_new_updates([album_update(message_id, message_id) for message_id in range(2, 11)])
+
+    # Assert
+    with session_factory() as session:
+        recorded = session.get(Broadcast, broadcast.id)
+    assert charged is None
+    assert recorded.source_message_ids == ",".join(map(str, range(1, 11)))
+    assert recorded.media_bytes == 100
+    assert antiflood.stats()["rejected_message"] == 0
@@ -0,0 +1,40 @@
+from types import SimpleNamespace
+
+from sqlalchemy import event, text
+
+from app.middleware.database import DatabaseMiddleware, _count_checkout
+
+
+def test_updates_that_never_query_check_out_no_connection(db_engine, session_factory):
+    # Arrange
+    middleware = DatabaseMiddleware(SimpleNamespace(), session_factory)
+    message = SimpleNamespace()
+
+    # Act
+    cached, querying = {}, {}
+    middleware.pre_process(message, cached)
+    middleware.post_process(message, cached, None)
+    middleware.pre_process(message, querying)
+    querying["db_session"].execute(text("SELECT 1"))
+    middleware.post_process(message, querying, None)
+
+    # Assert
+    assert middleware.stats() == {"updates": 2, "updates_without_connection": 1, "checkouts": 1}
+    assert db_engine.pool.checkedout() == 0
+
+
+def test_middlewares_of_one_engine_share_a_single_checkout_listener(db_engine, session_factory):
+    # Arrange
+    middlewares = [DatabaseMiddleware(SimpleNamespace(), session_factory) for _ in range(3)]
+    data = {}
+
+    # Act
+    middlewares[0].pre_process(SimpleNamespace(), data)
+    data["db_session"].execute(text("SELECT 1"))
+    middlewares[0].post_process(SimpleNamespace(), data, None)
+
+    # Assert
+    assert len(db_engine.pool.dispatch.checkout) == 1
+    assert event.contains(db_engine, "checkout", _count_checkout)
+    assert middlewares[0].stats()["checkouts"] == 1
+    assert middlewares[1].stats()["checkouts"] == 0
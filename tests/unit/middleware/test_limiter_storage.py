@@ -0,0 +1,77 @@
+import fakeredis
+import pytest
+
+from app.middleware.limiter_storage import (
+    BucketRequest,
+    LimiterStorage,
+    MemoryLimiterStorage,
+    RedisLimiterStorage,
+    SQLiteLimiterStorage,
+)
+
+
+def _request(key):
+    return BucketRequest(key, burst=2, refill_per_second=0.5, idle_ttl_seconds=60)
+
+
+def test_memory_and_sqlite_storages_agree(tmp_path):
+    # Arrange
+    storages = [MemoryLimiterStorage(), SQLiteLimiterStorage(str(tmp_path / "limits.db"))]
+
+    for storage in storages:
+        # Act
+        burst = [storage.consume(_request("user"), now=100.0) for _ in range(3)]
+        refilled = storage.consume(_request("user"), now=102.0)
+        batch = storage.consume_many([_request("a"), _request("a"), _request("a")], now=100.0)
+
+        # Assert
+        assert burst == [True, True, False]
+        assert refilled is True
+        assert batch == [True, True, False]
+
+
+def test_sqlite_storage_is_shared_between_instances(tmp_path):
+    # Arrange
+    path = str(tmp_path / "limits.db")
+    first_replica = SQLiteLimiterStorage(path)
+    second_replica = SQLiteLimiterStorage(path)
+
+    # Act
+    first = first_replica.consume(_request("user"), now=100.0)
+    second = second_replica.consume(_request("user"), now=100.0)
+    third = first_replica.consume(_request("user"), now=100.0)
+
+    # Assert
+    assert [first, second, third] == [True, True, False]
+
+
+def test_redis_storage_runs_the_script_in_pipelines_and_reloads_it_after_a_flush():
+    # Arrange
+    client = fakeredis.FakeRedis()
+    storage = RedisLimiterStorage(prefix="test:", client=client)
+
+    # Act
+    burst = [storage.consume(_request("user"), now=1700000000.0) for _ in range(3)]
+    refilled = storage.consume(_request("user"), now=1700000002.0)
+    client.script_flush()
+    batch = storage.consume_many([_request("a"), _request("a"), _request("a")], now=1700000000.0)
+    keys = len(storage)
+    ttl = client.pttl("test:user")
+
+    # Assert
+    assert burst == [True, True, False]
+    assert refilled is True
+    assert batch == [True, True, False]
+    assert keys == 2
+    assert 0 < ttl <= 60000
+
+
+def test_limiter_storage_requires_the_whole_interface():
+    # Arrange
+    class PartialStorage(LimiterStorage):
+        def consume_many(self, requests, now=None):
+            return [True for _ in requests]
+
+    # Act / Assert
+    with pytest.raises(TypeError):
+        PartialStorage()
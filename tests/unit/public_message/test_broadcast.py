@@ -0,0 +1,199 @@
+from datetime import datetime, timedelta
+
+import pytz
+from apscheduler.schedulers.background import BackgroundScheduler
+from sqlalchemy import select
+from telebot.apihelper import ApiTelegramException
+
+from app.auth.models import User
+from app.public_message.broadcast import BroadcastEngine
+from app.public_message.models import Broadcast, BroadcastRecipient
+from app.public_message.service import add_album_message, create_broadcast
+
+
+def add_users(session_factory, n_users):
+    with session_factory() as session:
+        session.add_all(User(id=user_id) for user_id in range(1, n_users + 1))
+        session.commit()
+
+
+def make_broadcast(session_factory, scheduled_at=None):
+    scheduled_at = scheduled_at or datetime.now(pytz.utc)
+    return create_broadcast(session_factory(), "text", "Hello", None, scheduled_at)
+
+
+class FakeBot:
+    def __init__(self, failing=(), blocked=()):
+        self.sent = []
+        self.failing = failing
+        self.blocked = blocked
+
+    def send_message(self, user_id, text):
+        if user_id in self.failing:
+            raise RuntimeError("Forbidden")
+        if user_id in self.blocked:
+            result = {"ok": False, "error_code": 403, "description": "Forbidden: bot was blocked by the user"}
+            raise ApiTelegramException("sendMessage", None, result)
+        self.sent.append((user_id, text))
+
+    def copy_message(self, user_id, from_chat_id, message_id):
+        self.sent.append((user_id, [message_id]))
+
+    def copy_messages(self, user_id, from_chat_id, message_ids):
+        self.sent.append((user_id, message_ids))
+
+
+def test_broadcast_is_sent_to_every_user_page_by_page(session_factory):
+    # Arrange
+    add_users(session_factory, 25)
+    broadcast = make_broadcast(session_factory)
+    engine = BroadcastEngine(session_factory, BackgroundScheduler(), page_size=10, send_workers=3)
+    bot = FakeBot(failing={7})
+
+    # Act
+    engine.run(bot, broadcast.id)
+
+    # Assert
+    assert sorted(user_id for user_id, _ in bot.sent) == [i for i in range(1, 26) if i != 7]
+    with session_factory() as session:
+        stored = session.get(Broadcast, broadcast.id)
+        assert (stored.status, stored.last_user_id) == ("done", 25)
+        assert (stored.sent_count, stored.failed_count, stored.recipient_count) == (24, 1, 25)
+        outcome = session.get(BroadcastRecipient, (broadcast.id, 7))
+        assert (outcome.status, outcome.error) == ("failed", "Forbidden")
+
+
+def test_cancelled_broadcast_is_not_sent(session_factory):
+    # Arrange
+    add_users(session_factory, 5)
+    broadcast = make_broadcast(session_factory)
+    engine = BroadcastEngine(session_factory, BackgroundScheduler(), page_size=2)
+    bot = FakeBot()
+
+    # Act
+    cancelled = engine.cancel(broadcast.id)
+    engine.run(bot, broadcast.id)
+
+    # Assert
+    assert cancelled
+    assert bot.sent == []
+    assert not engine.cancel(broadcast.id)
+
+
+def test_interrupted_broadcast_resumes_without_sending_twice(session_factory):
+    # Arrange
+    add_users(session_factory, 6)
+    broadcast = make_broadcast(session_factory)
+    with session_factory() as session:
+        # Stopped after the page of users 1-2, while sending to users 3 and 4
+        stored = session.get(Broadcast, broadcast.id)
+        stored.status, stored.last_user_id, stored.sent_count = "sending", 2, 2
+        session.add_all(
+            BroadcastRecipient(broadcast_id=broadcast.id, user_id=user_id, status=status)
+            for user_id, status in [(1, "sent"), (2, "sent"), (3, "sent"), (4, "pending")]
+        )
+        session.commit()
+    scheduler = BackgroundScheduler()
+    engine = BroadcastEngine(session_factory, scheduler, page_size=2)
+    bot = FakeBot()
+
+    # Act
+    resumed = engine.resume(bot)
+    engine.run(bot, broadcast.id)
+
+    # Assert
+    assert resumed == 1 and scheduler.get_job(f"broadcast-{broadcast.id}") is not None
+    assert sorted(bot.sent) == [(5, "Hello"), (6, "Hello")]
+    with session_factory() as session:
+        stored = session.get(Broadcast, broadcast.id)
+        assert (stored.status, stored.sent_count, stored.failed_count) == ("done", 5, 1)
+        assert session.get(BroadcastRecipient, (broadcast.id, 4)).status == "interrupted"
+
+
+def test_broadcasts_missed_during_downtime_are_not_resumed(session_factory):
+    # Arrange
+    add_users(session_factory, 1)
+    broadcast = make_broadcast(session_factory, datetime.now(pytz.utc) - timedelta(hours=1))
+    scheduler = BackgroundScheduler()
+    engine = BroadcastEngine(session_factory, scheduler, misfire_grace_time_seconds=600)
+
+    # Act
+    resumed = engine.resume(FakeBot())
+
+    # Assert
+    assert resumed == 0
+    assert scheduler.get_jobs() == []
+    with session_factory() as session:
+        assert session.scalar(select(Broadcast.status).where(Broadcast.id == broadcast.id)) == "missed"
+
+
+def test_users_who_blocked_the_bot_are_flagged_and_skipped(session_factory):
+    # Arrange
+    add_users(session_factory, 4)
+    first, second = make_broadcast(session_factory), make_broadcast(session_factory)
+    engine = BroadcastEngine(session_factory, BackgroundScheduler())
+
+    # Act
+    engine.run(FakeBot(blocked={2}), first.id)
+    bot = FakeBot()
+    engine.run(bot, second.id)
+
+    # Assert
+    assert sorted(user_id for user_id, _ in bot.sent) == [1, 3, 4]
+    with session_factory() as session:
+        assert session.get(User, 2).is_unreachable
+        stored = session.get(Broadcast, first.id)
+        assert (stored.sent_count, stored.forbidden_count, stored.failed_count) == (3, 1, 0)
+        assert stored.latency_p50_ms is not None
+        assert session.get(Broadcast, second.id).recipient_count == 3
+
+
+def test_album_is_copied_to_every_user_from_the_source_messages(session_factory):
+    # Arrange
+    add_users(session_factory, 3)
+    broadcast = create_broadcast(
+        session_factory(),
+        "album",
+        "Caption",
+        "photo-file-id",
+        datetime.now(pytz.utc),
+        source_chat_id=100,
+        source_message_ids=[11],
+        media_bytes=2048,
+    )
+    add_album_message(session_factory(), broadcast.id, 12, 1024)
+    engine = BroadcastEngine(session_factory, BackgroundScheduler())
+    bot = FakeBot()
+
+    # Act
+    engine.run(bot, broadcast.id)
+
+    # Assert
+    assert sorted(bot.sent) == [(1, [11, 12]), (2, [11, 12]), (3, [11, 12])]
+    with session_factory() as session:
+        stored = session.get(Broadcast, broadcast.id)
+        assert (stored.media_bytes, stored.sent_count) == (3072, 3)
+
+
+def test_cancelling_a_running_broadcast_stops_it_at_the_next_page(session_factory):
+    # Arrange
+    add_users(session_factory, 10)
+    broadcast = make_broadcast(session_factory)
+    engine = BroadcastEngine(session_factory, BackgroundScheduler(), page_size=3, send_workers=1)
+    bot = FakeBot()
+    send_message = bot.send_message
+
+    def send_and_cancel(user_id, text):
+        send_message(user_id, text)
+        if user_id == 2:
+            engine.cancel(broadcast.id)
+
+    bot.send_message = send_and_cancel
+
+    # Act
+    engine.run(bot, broadcast.id)
+
+    # Assert
+    assert [user_id for user_id, _ in bot.sent] == [1, 2, 3]
+    with session_factory() as session:
+        assert session.get(Broadcast, broadcast.id).status == "cancelled"
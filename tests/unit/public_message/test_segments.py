@@ -0,0 +1,66 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.auth.models import Role, User
+from app.auth.service import count_users, read_user_ids
+from app.middleware.models import LogEvent
+from app.public_message.segments import parse_segment, segment_conditions
+
+
+@pytest.fixture
+def session(session_factory):
+    session = session_factory()
+    now = datetime.now()
+    session.add_all([Role(id=1, name="admin"), Role(id=2, name="user")])
+    session.add_all(
+        [
+            User(id=1, lang="ru", role_id=2, last_message_timestamp=now),
+            User(id=2, lang="en", role_id=2, last_message_timestamp=now - timedelta(days=60)),
+            User(id=3, lang="ru", role_id=1, last_message_timestamp=now - timedelta(days=2)),
+            User(id=4, lang="ru", role_id=2, last_message_timestamp=now, is_blocked=True),
+        ]
+    )
+    session.add_all(
+        [
+            LogEvent(user_id=1, event_type="callback", content="event_5"),
+            LogEvent(user_id=3, event_type="message", content="event_5"),
+        ]
+    )
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_parse_segment():
+    # Act
+    segment = parse_segment("lang=RU active=30, event=5 not_blocked")
+
+    # Assert
+    assert segment == {"lang": "ru", "active": 30, "event": 5, "not_blocked": True}
+    assert parse_segment("all") == {}
+    with pytest.raises(ValueError, match="active=soon"):
+        parse_segment("active=soon")
+
+
+@pytest.mark.parametrize(
+    "text, expected",
+    [
+        ("all", [1, 2, 3, 4]),
+        ("lang=ru", [1, 3, 4]),
+        ("role=admin", [3]),
+        ("active=30", [1, 3, 4]),
+        ("event=5", [1]),
+        ("lang=ru not_blocked active=7", [1, 3]),
+    ],
+)
+def test_segment_selects_matching_users(session, text, expected):
+    # Arrange
+    conditions = segment_conditions(parse_segment(text))
+
+    # Act
+    user_ids = read_user_ids(session, limit=10, reachable_only=True, conditions=conditions)
+
+    # Assert
+    assert user_ids == expected
+    assert count_users(session, reachable_only=True, conditions=conditions) == len(expected)
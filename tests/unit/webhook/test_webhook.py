@@ -0,0 +1,110 @@
+import http.client
+import json
+import threading
+
+import pytest
+
+from app.webhook import UpdateDispatcher
+from health_check import HealthCheckServer
+
+UPDATE = {
+    "update_id": 1,
+    "message": {
+        "message_id": 2,
+        "date": 0,
+        "chat": {"id": 7, "type": "private"},
+        "from": {"id": 7, "is_bot": False, "first_name": "Ann"},
+        "text": "/start",
+    },
+}
+
+
+class RecordingBot:
+    def process_new_updates(self, updates):
+        pass
+
+
+class RecordingExecutor:
+    def __init__(self):
+        self.submitted = []
+        self.full = False
+
+    def try_submit(self, key, process, *args):
+        self.submitted.append((key, process, args))
+        return not self.full
+
+    def stats(self):
+        return {"queued": 0}
+
+
+@pytest.fixture
+def webhook():
+    bot, executor = RecordingBot(), RecordingExecutor()
+    dispatcher = UpdateDispatcher(bot, executor)
+    server = HealthCheckServer(("127.0.0.1", 0))
+    server.set_webhook_handler("/webhook", dispatcher.submit, "secret")
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, bot, executor, dispatcher
+    server.shutdown()
+    server.server_close()
+
+
+def post(server, body: bytes, secret=None, path="/webhook") -> int:
+    connection = http.client.HTTPConnection(*server.server_address, timeout=5)
+    headers = {"Content-Type": "application/json"}
+    if secret is not None:
+        headers["X-Telegram-Bot-Api-Secret-Token"] = secret
+    connection.request("POST", path, body=body, headers=headers)
+    status = connection.getresponse().status
+    connection.close()
+    return status
+
+
+def test_webhook_refuses_requests_without_the_secret_token(webhook):
+    # Arrange
+    server, _, executor, _ = webhook
+    body = json.dumps(UPDATE).encode()
+
+    # Act
+    missing = post(server, body)
+    wrong = post(server, body, secret="guess")
+    unknown_path = post(server, body, secret="secret", path="/other")
+
+    # Assert
+    assert (missing, wrong, unknown_path) == (403, 403, 404)
+    assert executor.submitted == []
+
+
+def test_webhook_acknowledges_malformed_bodies_without_submitting_them(webhook):
+    # Arrange
+    server, _, executor, dispatcher = webhook
+
+    # Act
+    malformed = post(server, b"{not json", secret="secret")
+    empty = post(server, b"", secret="secret")
+
+    # Assert
+    assert (malformed, empty) == (200, 400)
+    assert executor.submitted == []
+    assert dispatcher.stats()["failed"] == 1
+
+
+def test_webhook_hands_valid_updates_to_the_executor(webhook):
+    # Arrange
+    server, bot, executor, dispatcher = webhook
+    body = json.dumps(UPDATE).encode()
+
+    # Act
+    accepted = post(server, body, secret="secret")
+    executor.full = True
+    rejected = post(server, body, secret="secret")
+
+    # Assert
+    assert (accepted, rejected) == (200, 503)
+    key, process, (updates,) = executor.submitted[0]
+    assert key == 7
+    assert process == bot.process_new_updates
+    assert updates[0].update_id == 1
+    assert updates[0].message.chat.id == 7
+    assert dispatcher.stats() == {"accepted": 1, "rejected": 1, "failed": 0, "queued": 0}